@@ -2,13 +2,20 @@ from __future__ import print_function
 
 import logging
 import argparse
+import itertools
 import math
+import multiprocessing
+import os
 import sys
 import time
 import numpy as np
 
 from extensive_form_game import blsp_reader
-from extensive_form_game import libef_reader # this line can be commented in in order to get the libgg reader
+from extensive_form_game import cfr
+from extensive_form_game import extensive_form_game as efg
+from extensive_form_game import game_cache
+from extensive_form_game import shared_arrays
+from extensive_form_game import libef_reader
 from poker import kuhn
 from poker import leduc
 from poker import nlhe_river
@@ -27,34 +34,216 @@ algs = {
     'CP': lambda args: cp.ChambollePock,
     'EGT': lambda args: egt.excessive_gap_technique_init(
         aggressive_stepsizes=args.aggressive_stepsizes,
-        init_gap=init_gap, init_update_x=init_update_x,
-        allowed_eps_increase=allowed_eps_increase),
+        init_gap=args.init_gap, init_update_x=args.init_update_x,
+        allowed_eps_increase=args.allowed_eps_increase),
     'MP': lambda args: mp.mirror_prox_init(
         aggressive_stepsizes=args.aggressive_stepsizes),
     'HEDGE': lambda args: eqm_regret.regret_minimization_initializer(
-        matrix_regret.hedge_initializer(
-            1.0 / math.sqrt(num_iterations))),
+        cfr.flat_regret_minimizer_initializer(
+            'hedge', alpha=1.0 / math.sqrt(args.num_iterations),
+            threads=args.threads),
+        workspace=args.workspace, parallel=args.parallel),
     'RM': lambda args: eqm_regret.regret_minimization_initializer(
-        matrix_regret.regret_matching_initializer()),
+        cfr.flat_regret_minimizer_initializer('rm', threads=args.threads),
+        workspace=args.workspace, parallel=args.parallel),
     'RM+': lambda args: eqm_regret.regret_minimization_initializer(
-        matrix_regret.regret_matching_plus_initializer(),
-        alternate=False, linear_averaging=False),
+        cfr.flat_regret_minimizer_initializer('rm+', threads=args.threads),
+        alternate=False, linear_averaging=False, workspace=args.workspace,
+        parallel=args.parallel),
     'CFR+': lambda args: eqm_regret.regret_minimization_initializer(
-        matrix_regret.regret_matching_plus_initializer(),
-        alternate=True, linear_averaging=True, name='CFR+'),
+        cfr.flat_regret_minimizer_initializer('rm+', threads=args.threads),
+        alternate=True, linear_averaging=True, name='CFR+',
+        workspace=args.workspace),
+    'DCFR': lambda args: eqm_regret.regret_minimization_initializer(
+        cfr.flat_regret_minimizer_initializer('dcfr', threads=args.threads),
+        alternate=True, averaging_power=2.0, name='DCFR',
+        workspace=args.workspace),
+    'PCFR+': lambda args: eqm_regret.regret_minimization_initializer(
+        cfr.flat_regret_minimizer_initializer('pcfr+', threads=args.threads),
+        alternate=True, averaging_power=2.0, name='PCFR+',
+        workspace=args.workspace),
+    'MCCFR': lambda args: eqm_regret.regret_minimization_initializer(
+        cfr.flat_regret_minimizer_initializer('rm', threads=args.threads),
+        alternate=True, name='MCCFR', workspace=args.workspace,
+        num_samples=args.samples),
     'CBA+': lambda args: eqm_regret.regret_minimization_initializer(
         matrix_regret.conic_blackwell_plus_initializer(),
-        alternate=True, linear_averaging=True, name='CBA+'),
+        alternate=True, linear_averaging=True, name='CBA+',
+        workspace=args.workspace),
     'RM+_LINEAR': lambda args: eqm_regret.regret_minimization_initializer(
-        matrix_regret.regret_matching_plus_initializer(),
-        alternate=False, linear_averaging=True, name='CFR+'),
+        cfr.flat_regret_minimizer_initializer('rm+', threads=args.threads),
+        alternate=False, linear_averaging=True, name='CFR+',
+        workspace=args.workspace, parallel=args.parallel),
     'EGT_WARM': lambda args: egt.egt_warm_start_initializer(
         alg=eqm_regret.regret_minimization_initializer(
-            matrix_regret.regret_matching_plus_initializer(),
+            cfr.flat_regret_minimizer_initializer(
+                'rm+', threads=args.threads),
             alternate=True, linear_averaging=True),
         aggressive_stepsizes=args.aggressive_stepsizes),
 }
 
+def make_game(args):
+    # the generated games, with their parameters other than the prox ones
+    generators = {
+        'river': (nlhe_river.init_efg, {'kronecker': args.kronecker}),
+        'river_big': (nlhe_river.init_efg_big,
+                      {'kronecker': args.kronecker}),
+        'kuhn': (kuhn.init_efg, {}),
+        'leduc': (leduc.init_efg, {'num_ranks': args.num_ranks}),
+        'ri': (ri.init_efg, {'num_ranks': args.num_ranks}),
+    }
+    if args.game in generators:
+        generator, params = generators[args.game]
+        if args.cache_dir is not None:
+            return game_cache.load(
+                generator, args.cache_dir,
+                prox_infoset_weights=args.prox_infoset_weights,
+                prox_scalar=args.prox_scalar, **params)
+        game = generator(
+            prox_infoset_weights=args.prox_infoset_weights,
+            prox_scalar=args.prox_scalar, **params)
+    elif args.game == 'kuhn_matrix':
+        game = kuhn.init_matrix()
+    elif '.blsp' in args.game:
+        game = blsp_reader.make_efg_from_file(
+            args.game,
+            prox_infoset_weights=args.prox_infoset_weights,
+            prox_scalar=args.prox_scalar)
+    elif '.game' in args.game:
+        game = libef_reader.make_efg_from_file(
+            args.game,
+            prox_infoset_weights=args.prox_infoset_weights,
+            prox_scalar=args.prox_scalar,
+            cache_dir=args.cache_dir)
+    else:
+        assert False, 'unknown game %s' % args.game
+    return game
+
+
+def output_iterations(args):
+    """ The iteration counts at which results are output. """
+    if args.log_scale:
+        # print_seq = np.logspace(
+        #     1, np.log10(num_iterations), num_outputs, dtype=int)
+        return np.unique(
+            np.insert(
+                np.geomspace(1, args.num_iterations, args.num_outputs,
+                             dtype=int), 0, 0))
+    return np.linspace(0, args.num_iterations, args.num_outputs, dtype=int)
+
+
+# Parameters --sweep can vary, with their types. Those in SWEEP_GAME_PARAMS
+# change the game itself; one game is built per distinct combination of
+# them, all others only change how the algorithms are set up.
+SWEEP_PARAMS = {
+    'prox_scalar': float,
+    'prox_infoset_weights': str,
+    'init_gap': float,
+    'allowed_eps_increase': float,
+    'num_ranks': int,
+}
+SWEEP_GAME_PARAMS = ('num_ranks',)
+
+
+def parse_sweep(sweep):
+    """
+    'prox_scalar=0.1,1;num_ranks=3,5' -> [('prox_scalar', [0.1, 1.0]),
+    ('num_ranks', [3, 5])]
+    """
+    grid = []
+    for entry in sweep.split(';'):
+        name, values = entry.split('=')
+        name = name.strip()
+        if name not in SWEEP_PARAMS:
+            raise ValueError('cannot sweep over %s; options: %s' %
+                             (name, ', '.join(sorted(SWEEP_PARAMS))))
+        grid.append((name, [SWEEP_PARAMS[name](value.strip())
+                            for value in values.split(',')]))
+    return grid
+
+
+# the games of a sweep, attached by every worker process: game key ->
+# (shared memory blocks, arrays)
+_sweep_games = None
+
+
+def _init_sweep_worker(specs):
+    global _sweep_games
+    _sweep_games = {
+        key: shared_arrays.attach(spec) for key, spec in specs.items()
+    }
+
+
+def _run_sweep_configuration(configuration):
+    args, alg, game_key, values = configuration
+    _, arrays = _sweep_games[game_key]
+    game = efg.from_arrays(
+        arrays,
+        prox_infoset_weights=args.prox_infoset_weights,
+        prox_scalar=args.prox_scalar)
+    t0 = time.time()
+    opt = algs[alg](args)(game)
+    total_time = time.time() - t0
+    rows = []
+    print_seq = output_iterations(args)
+    for i in range(len(print_seq)):
+        delta = print_seq[i] - print_seq[i - 1] if i > 0 else print_seq[0]
+        t0 = time.time()
+        opt.iterate(delta)
+        total_time += time.time() - t0
+        eps, eps_nonzero = opt.epsilon()
+        rows.append(','.join(str(value) for value in [
+            print_seq[i], opt.gradient_computations(), eps, eps_nonzero,
+            opt.profile_value(), opt, total_time] + values))
+        if eps < args.eps_threshold:
+            break
+    return rows
+
+
+def run_sweep(args, algs_to_run):
+    """
+    Runs every algorithm of algs_to_run under every combination of the
+    parameters in args.sweep, in a pool of args.processes worker
+    processes, and prints their merged CSV output in grid order. Each
+    distinct game is built once and shared with the workers through shared
+    memory.
+    """
+    grid = parse_sweep(args.sweep)
+    names = [name for name, _ in grid]
+    configurations = []
+    specs = {}
+    blocks = []
+    try:
+        for values in itertools.product(*[values for _, values in grid]):
+            run_args = argparse.Namespace(**vars(args))
+            vars(run_args).update(zip(names, values))
+            game_key = tuple(getattr(run_args, name)
+                             for name in SWEEP_GAME_PARAMS)
+            if game_key not in specs:
+                game = make_game(run_args)
+                assert isinstance(game, efg.ExtensiveFormGame), \
+                    'sweeps need an extensive-form game'
+                game_blocks, specs[game_key] = shared_arrays.share(
+                    game.to_arrays())
+                blocks += game_blocks
+            configurations += [(run_args, alg, game_key, list(values))
+                               for alg in algs_to_run]
+
+        print(','.join(['iters', 'gradients', 'eps', 'eps_nonzero',
+                        'profile_val', 'algorithm', 'time'] + names))
+        # workers are forked, so that they see the algorithms defined in
+        # this script
+        context = multiprocessing.get_context('fork')
+        with context.Pool(args.processes, initializer=_init_sweep_worker,
+                          initargs=(specs,)) as pool:
+            for rows in pool.imap(_run_sweep_configuration, configurations):
+                for row in rows:
+                    print(row)
+                sys.stdout.flush()
+    finally:
+        shared_arrays.release(blocks, unlink=True)
+
+
 parser = argparse.ArgumentParser()
 # Game params
 parser.add_argument(
@@ -69,6 +258,20 @@ parser.add_argument(
     type=int,
     default=3,
     help='Number of ranks in the deck. Only works for Leduc.')
+parser.add_argument(
+    '--cache_dir',
+    default=None,
+    dest='cache_dir',
+    help='Store the generated games (kuhn, leduc, ri, river) and converted ' +
+    '.game files in this directory on first use and memory-map them on ' +
+    'later runs.')
+parser.add_argument(
+    '--kronecker',
+    action='store_true',
+    default=False,
+    dest='kronecker',
+    help='Keep the payoff matrix of the river games as its Kronecker ' +
+    'factors (betting x hand pairs) instead of building it explicitly.')
 
 # Algorithm params
 parser.add_argument('-a', '--algorithm',
@@ -91,6 +294,45 @@ parser.add_argument(
     default=False,
     dest='aggressive_stepsizes',
     help='use aggressive stepsizing in EGT and Mirror Prox')
+parser.add_argument(
+    '--workspace',
+    action='store_true',
+    default=False,
+    dest='workspace',
+    help='run the regret minimization algorithms in preallocated arrays')
+parser.add_argument(
+    '--parallel',
+    action='store_true',
+    default=False,
+    dest='parallel',
+    help='update the two players concurrently in the non-alternating ' +
+    'regret minimization algorithms (HEDGE, RM, RM+, RM+_LINEAR)')
+parser.add_argument(
+    '--threads',
+    type=int,
+    default=1,
+    dest='threads',
+    help='number of threads for the CFR updates, each handling a group ' +
+    'of the subtrees below the root')
+parser.add_argument(
+    '--samples',
+    type=int,
+    default=1,
+    dest='samples',
+    help='number of chance outcomes MCCFR samples per utility estimate')
+parser.add_argument(
+    '--sweep',
+    default=None,
+    dest='sweep',
+    help='run the algorithms under every combination of a grid of ' +
+    'parameters, e.g. \'prox_scalar=0.1,1,10;num_ranks=3,5\', and print ' +
+    'the results as CSV. Parameters: %s' % ', '.join(sorted(SWEEP_PARAMS)))
+parser.add_argument(
+    '--processes',
+    type=int,
+    default=os.cpu_count(),
+    dest='processes',
+    help='number of worker processes for --sweep')
 
 # DGF params
 parser.add_argument(
@@ -160,6 +402,16 @@ parser.add_argument(
 
 args = parser.parse_args()
 
+algs_arg = set(args.alg.upper().split(','))
+for alg in algs_arg:
+    if alg not in algs:
+        print('Unknown algorithm "%s"' % alg)
+        sys.exit(1)
+
+if args.sweep:
+    run_sweep(args, sorted(algs_arg))
+    sys.exit(0)
+
 num_iterations = args.num_iterations
 num_outputs = args.num_outputs
 eps_threshold = args.eps_threshold
@@ -168,9 +420,6 @@ to_csv = args.to_csv
 pretty_print = args.pretty_print
 log_scale = args.log_scale
 gnuplot_out = open(args.gnuplot, 'wt')
-init_gap = args.init_gap
-init_update_x = args.init_update_x
-allowed_eps_increase = args.allowed_eps_increase
 if to_csv:
     print('iters,gradients,eps,profile_val,algorithm,time')
 elif debug:
@@ -178,63 +427,13 @@ elif debug:
 else:
     logging.getLogger().setLevel(logging.INFO)
 
-if args.game == 'river':
-    game = nlhe_river.init_efg(
-        prox_infoset_weights=args.prox_infoset_weights,
-        prox_scalar=args.prox_scalar)
-elif args.game == 'river_big':
-    game = nlhe_river.init_efg_big(
-        prox_infoset_weights=args.prox_infoset_weights,
-        prox_scalar=args.prox_scalar)
-elif args.game == 'kuhn_matrix':
-    game = kuhn.init_matrix()
-elif args.game == 'kuhn':
-    game = kuhn.init_efg(
-        prox_infoset_weights=args.prox_infoset_weights,
-        prox_scalar=args.prox_scalar)
-elif args.game == 'leduc':
-    game = leduc.init_efg(
-        num_ranks=args.num_ranks,
-        prox_infoset_weights=args.prox_infoset_weights,
-        prox_scalar=args.prox_scalar)
-elif args.game == 'ri':
-    game = ri.init_efg(
-        num_ranks=args.num_ranks,
-        prox_infoset_weights=args.prox_infoset_weights,
-        prox_scalar=args.prox_scalar)
-elif '.blsp' in args.game:
-    game = blsp_reader.make_efg_from_file(
-        args.game,
-        prox_infoset_weights=args.prox_infoset_weights,
-        prox_scalar=args.prox_scalar)
-elif '.game' in args.game: # this if condition can be commented in for the libgg reader
-    game = libef_reader.make_efg_from_file(
-        args.game,
-        prox_infoset_weights=args.prox_infoset_weights,
-        prox_scalar=args.prox_scalar)
-else:
-    assert False, 'unknown game %s' % args.game
+game = make_game(args)
 
-algs_to_run = []
-
-algs_arg = set(args.alg.upper().split(','))
-for alg in algs_arg:
-    if alg not in algs:
-        print('Unknown algorithm "%s"' % alg)
-        sys.exit(1)
-    else:
-        algs_to_run += [algs[alg](args)]
+algs_to_run = [algs[alg](args) for alg in algs_arg]
 
 alg_names = []
 
-if log_scale:
-    # print_seq = np.logspace(
-    #     1, np.log10(num_iterations), num_outputs, dtype=int)
-    print_seq = np.unique(
-        np.insert(
-            np.geomspace(1, num_iterations, num_outputs, dtype=int), 0, 0))
-else:
-    print_seq = np.linspace(0, num_iterations, num_outputs, dtype=int)
+print_seq = output_iterations(args)
 for alg_idx, alg in enumerate(algs_to_run):
     t0 = time.time() # start timer
     opt = alg(game)
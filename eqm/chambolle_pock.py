@@ -1,6 +1,6 @@
 import numpy as np
 
-from .eqm import EquilibriumAlgorithm
+from .eqm import EquilibriumAlgorithm, SequenceFormAverage
 
 class ChambollePock(EquilibriumAlgorithm):
     def __init__(self, game, prox_x=None, prox_y=None, L=1.0):
@@ -16,9 +16,14 @@ class ChambollePock(EquilibriumAlgorithm):
         self._p_x = np.copy(self._x)
         self._c_y = np.copy(self._y)
 
-        self._w = 1.0
+        self._average_x = SequenceFormAverage(game.domain(0), self._x, 1.0)
+        self._average_y = SequenceFormAverage(game.domain(1), self._y, 1.0)
+
         self._L = L
 
+    def profile(self):
+        return self._average_x.strategy(), self._average_y.strategy()
+
     def iterate(self, num_iterations=1):
         for t in range(num_iterations):
             u_py = self._game.utility_for(1, self._p_x)
@@ -31,8 +36,7 @@ class ChambollePock(EquilibriumAlgorithm):
             self._p_x = self._c_x
             self._c_x = c_x
             
-            alpha = 1.0/(1.0 + self._w); self._w += 1.0
-            self._x = self._game.domain(0).combine(self._x, alpha, self._c_x)
-            self._y = self._game.domain(1).combine(self._y, alpha, self._c_y)
+            self._average_x.add(self._c_x, 1.0)
+            self._average_y.add(self._c_y, 1.0)
 
             self._gradient_computations += 3
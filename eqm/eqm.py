@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class EquilibriumAlgorithm:
     def __init__(self, game, name=None):
         self._game = game
@@ -12,12 +15,12 @@ class EquilibriumAlgorithm:
 
     def epsilon(self):
         # eps, _, _, _ = self._game.profile_epsilon(self._x, self._y)
-        eps_zero_sum, saddle_x, saddle_y, _, _ = self._game.profile_epsilon(self._x, self._y)
+        eps_zero_sum, saddle_x, saddle_y, _, _ = self._game.profile_epsilon(*self.profile())
         eps_nonzero = saddle_x + saddle_y
         return eps_zero_sum, eps_nonzero
 
     def profile_value(self):
-        val = self._game.profile_value(self._x, self._y)
+        val = self._game.profile_value(*self.profile())
         return val
 
     def iterate(self, num_iterations=1):
@@ -29,3 +32,37 @@ class EquilibriumAlgorithm:
     def __repr__(self):
         return self._name
 
+
+class SequenceFormAverage:
+    """
+    Weighted running average of strategies on a domain. The sum of
+    weight*sequence_form(x) is accumulated directly, which matches
+    repeatedly calling domain.combine(average, weight/total_weight, x), but
+    only converts back to behavioral form when strategy() is called.
+
+    The initial strategy x enters the average with the given weight; with
+    weight 0 it is only returned until the first call to add().
+
+    The returned strategies are frozen by domain.freeze(), which lets the
+    domains cache their sequence forms across epsilon(), profile_value()
+    and friends.
+    """
+    def __init__(self, domain, x, weight):
+        self._domain = domain
+        self._sum    = weight*domain.sequence_form(x)
+        self._weight = weight
+        self._buffer = np.empty(domain.dimension())
+        self._strategy = domain.freeze(x)
+
+    def add(self, x, weight):
+        seq = self._domain.sequence_form(x, out=self._buffer)
+        np.multiply(seq, weight, out=seq)
+        self._sum += seq
+        self._weight += weight
+        self._strategy = None
+
+    def strategy(self):
+        if self._strategy is None:
+            self._strategy = self._domain.freeze(
+                self._domain.behavioral_form(self._sum/self._weight))
+        return self._strategy
@@ -169,10 +169,9 @@ class ExcessiveGapTechnique(EquilibriumAlgorithm):
             self._gradient_computations += 3
 
     def excessive_gap(self):
-        u_y = self._game.utility_for(1, self._x)
+        u_x, u_y = self._game.utilities(self._x, self._y)
         val_f = -self._smooth_br_y(-1.0, u_y, self._mu[1])[0]
 
-        u_x = self._game.utility_for(0, self._y)
         val_phi = self._smooth_br_x(-1.0, u_x, self._mu[0])[0]
 
         return val_phi - val_f
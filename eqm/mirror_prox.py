@@ -1,8 +1,7 @@
-import math
 import logging
 import numpy as np
 
-from .eqm import EquilibriumAlgorithm
+from .eqm import EquilibriumAlgorithm, SequenceFormAverage
 
 
 class MirrorProx(EquilibriumAlgorithm):
@@ -42,10 +41,14 @@ class MirrorProx(EquilibriumAlgorithm):
         self._gamma_safe = 0.5 / (game.payoff_max_norm() *
                                   np.sqrt(game.domain(0).diameter() * game.domain(1).diameter()))
         self._gamma = 1.0 * self._gamma_safe
-        self._w = 0.0
+        self._average_x = SequenceFormAverage(game.domain(0), self._x, 0.0)
+        self._average_y = SequenceFormAverage(game.domain(1), self._y, 0.0)
 
         self._aggressive_stepsizes = aggressive_stepsizes
 
+    def profile(self):
+        return self._average_x.strategy(), self._average_y.strategy()
+
     def iterate(self, num_iterations=2):
         for _ in range(num_iterations):
             self.take_step()
@@ -65,8 +68,7 @@ class MirrorProx(EquilibriumAlgorithm):
                 self._gamma = max(self._gamma_safe, self._gamma / 2.0)
             cur_w_x = next_w_x
             cur_w_y = next_w_y
-            u_x = self._game.utility_for(0, cur_w_y)
-            u_y = self._game.utility_for(1, cur_w_x)
+            u_x, u_y = self._game.utilities(cur_w_x, cur_w_y)
 
             _, next_w_x = self._prox_x(-self._gamma, u_x,
                                        self._prox_weights[0], self._c_x)
@@ -83,10 +85,8 @@ class MirrorProx(EquilibriumAlgorithm):
         self._c_x = next_w_x
         self._c_y = next_w_y
 
-        self._w += self._gamma
-        gamma = self._gamma / self._w
-        self._x = self._game.domain(0).combine(self._x, gamma, self._c_x)
-        self._y = self._game.domain(1).combine(self._y, gamma, self._c_y)
+        self._average_x.add(self._c_x, self._gamma)
+        self._average_y.add(self._c_y, self._gamma)
 
         # if we only needed two fixed point iters then we can be more aggressive
         if self._aggressive_stepsizes and fixed_point_iters < 3:
@@ -1,8 +1,10 @@
 import math
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
-from .eqm import EquilibriumAlgorithm
+from .eqm import EquilibriumAlgorithm, SequenceFormAverage
 from extensive_form_game.cfr import CounterfactualRegretMinimizer
+from extensive_form_game.chance_sampling import ChanceSampledGame
 from extensive_form_game.treeplex import TreeplexDomain
 """
 returns the sequence {alpha + beta*sqrt(t) + gamma*t}_{t=1}^\inf
@@ -16,6 +18,17 @@ def step_size_generator(alpha, beta, gamma):
         yield alpha + beta * math.sqrt(t - 1) + gamma * (t - 1)
 
 
+def power_step_size_generator(gamma):
+    r"""
+    returns the sequence {t^gamma}_{t=1}^\inf, the average strategy weights
+    of DCFR and PCFR+ (gamma = 2 for quadratic averaging)
+    """
+    t = 0
+    while True:
+        t += 1
+        yield float(t)**gamma
+
+
 class RegretMinimization(EquilibriumAlgorithm):
     def __init__(self,
                  game,
@@ -23,9 +36,29 @@ class RegretMinimization(EquilibriumAlgorithm):
                  rm_y=None,
                  alternate=False,
                  step=step_size_generator(1.0, 0.0, 0.0),
-                 name=None):
+                 name=None,
+                 workspace=False,
+                 parallel=False,
+                 num_samples=None,
+                 seed=None):
+        """
+        If workspace is set, utilities are written into arrays allocated
+        once here, so that steady-state iterations do not allocate.
+
+        If parallel is set and the players do not alternate, the two
+        players' utilities, and then their regret updates, run
+        concurrently on a thread pool. The sparse products, the NumPy
+        traversals and the compiled kernels release the GIL.
+
+        If num_samples is set, the players regret-match on unbiased
+        estimates of their utilities from num_samples sampled chance
+        outcomes per utility (see ChanceSampledGame), i.e. chance-sampled
+        Monte Carlo CFR; epsilon() is still measured on the game.
+        """
         def _init_rm(domain, rm):
-            if isinstance(domain, TreeplexDomain):
+            if getattr(rm, 'flat', False):
+                regret_matcher = rm(domain, name)
+            elif isinstance(domain, TreeplexDomain):
                 regret_matcher = CounterfactualRegretMinimizer(
                     domain, rm, name)
             else:
@@ -40,40 +73,93 @@ class RegretMinimization(EquilibriumAlgorithm):
 
         EquilibriumAlgorithm.__init__(self, game, name=self._name)
 
+        # where the utilities come from
+        self._utilities = game
+        if num_samples is not None:
+            self._utilities = ChanceSampledGame(game, num_samples, seed)
+
         self._step = step
         self._alpha = next(step)
-        self._weight = self._alpha
+        self._average_x = SequenceFormAverage(game.domain(0), self._x,
+                                              self._alpha)
+        self._average_y = SequenceFormAverage(game.domain(1), self._y,
+                                              self._alpha)
+
+        self._u = None
+        self._u_x = None
+        self._u_y = None
+        if workspace:
+            dimension_x = game.domain(0).dimension()
+            self._u = np.empty(dimension_x + game.domain(1).dimension())
+            self._u_x = self._u[:dimension_x]
+            self._u_y = self._u[dimension_x:]
+
+        # the calling thread handles the second player
+        self._executor = None
+        if parallel and not alternate:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def profile(self):
+        return self._average_x.strategy(), self._average_y.strategy()
 
     def iterate(self, num_iterations=1):
         for t in range(num_iterations):
-            u_x = self._game.utility_for(0, self._rm_y.strategy)
-            if not self._alternate:
-                u_y = self._game.utility_for(1, self._rm_x.strategy)
+            if self._executor is not None:
+                self._iterate_parallel()
+                continue
+
+            if self._alternate:
+                u_x = self._utilities.utility_for(
+                    0, self._rm_y.strategy, out=self._u_x)
+            else:
+                u_x, u_y = self._utilities.utilities(
+                    self._rm_x.strategy, self._rm_y.strategy, out=self._u)
 
             self._gradient_computations += 2
 
             self._rm_x(u_x)
 
             if self._alternate:
-                u_y = self._game.utility_for(1, self._rm_x.strategy)
+                u_y = self._utilities.utility_for(
+                    1, self._rm_x.strategy, out=self._u_y)
 
             self._rm_y(u_y)
 
             self._alpha = next(self._step)
-            self._weight += self._alpha
-            alpha = self._alpha / self._weight
-            self._x = self._game.domain(0).combine(self._x, alpha,
-                                                   self._rm_x.strategy)
-            self._y = self._game.domain(1).combine(self._y, alpha,
-                                                   self._rm_y.strategy)
+            self._average_x.add(self._rm_x.strategy, self._alpha)
+            self._average_y.add(self._rm_y.strategy, self._alpha)
+
+    def _iterate_parallel(self):
+        # both utilities are computed from the current strategies before
+        # either player updates its strategy
+        future = self._executor.submit(self._utilities.utility_for, 0,
+                                       self._rm_y.strategy, self._u_x)
+        u_y = self._utilities.utility_for(1, self._rm_x.strategy,
+                                          out=self._u_y)
+        u_x = future.result()
+
+        self._gradient_computations += 2
+
+        self._alpha = next(self._step)
+        future = self._executor.submit(self._update, self._rm_x, u_x,
+                                       self._average_x)
+        self._update(self._rm_y, u_y, self._average_y)
+        future.result()
+
+    def _update(self, rm, u, average):
+        rm(u)
+        average.add(rm.strategy, self._alpha)
 
 
 def regret_minimization_initializer(rm_x,
                                     rm_y=None,
                                     linear_averaging=False,
+                                    averaging_power=None,
                                     **kwargs):
     def init(game, name=None):
-        if linear_averaging:
+        if averaging_power is not None:
+            step = power_step_size_generator(averaging_power)
+        elif linear_averaging:
             step = step_size_generator(1.0, 0.0, 1.0)
         else:
             step = step_size_generator(1.0, 0.0, 0.0)
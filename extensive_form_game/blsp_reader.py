@@ -1,9 +1,40 @@
 from __future__ import print_function
-import sys
-from collections import defaultdict
 import numpy as np
 import scipy.sparse as sparse
-import extensive_form_game as efg
+from .extensive_form_game import ExtensiveFormGame
+
+# characters of a line parsed at a time
+CHUNK_SIZE = 1 << 24
+
+
+def _read_array(blsp_file, count, dtype, chunk_size=CHUNK_SIZE):
+    """
+    Parses the next line of blsp_file, count whitespace-separated numbers,
+    into an array of dtype. The line is read and parsed chunk_size
+    characters at a time, so it never has to fit in memory as text.
+    """
+    out = np.empty(count, dtype=dtype)
+    filled = 0
+    rest = ''
+    while True:
+        chunk = blsp_file.readline(chunk_size)
+        done = chunk == '' or chunk.endswith('\n')
+        text = rest + chunk
+        rest = ''
+        if not done:
+            # the last number may continue in the next chunk
+            cut = text.rfind(' ') + 1
+            text, rest = text[:cut], text[cut:]
+        # np.fromstring parses a string with no numbers as a single 0
+        if text.strip():
+            values = np.fromstring(text, dtype=dtype, sep=' ')
+            assert filled + len(values) <= count, 'too many values in line'
+            out[filled:filled + len(values)] = values
+            filled += len(values)
+        if done:
+            break
+    assert filled == count, 'expected %d values, found %d' % (count, filled)
+    return out
 
 
 def make_efg_from_file(filename, prox_infoset_weights=False, prox_scalar=-1):
@@ -16,29 +47,31 @@ def make_efg_from_file(filename, prox_infoset_weights=False, prox_scalar=-1):
                 int, blsp_file.readline().strip().split())
 
         # get p1 treeplex
-        first_p1 = map(int, blsp_file.readline().strip().split())
-        end_p1 = map(lambda x: int(x) + 1,
-                     blsp_file.readline().strip().split())
-        parent_p1 = map(int, blsp_file.readline().strip().split())
+        first_p1 = _read_array(blsp_file, num_infosets_p1, np.int32)
+        end_p1 = _read_array(blsp_file, num_infosets_p1, np.int32)
+        end_p1 += 1
+        parent_p1 = _read_array(blsp_file, num_infosets_p1, np.int32)
 
         # get p2 treeplex
-        first_p2 = map(int, blsp_file.readline().strip().split())
-        end_p2 = map(lambda x: int(x) + 1,
-                     blsp_file.readline().strip().split())
-        parent_p2 = map(int, blsp_file.readline().strip().split())
+        first_p2 = _read_array(blsp_file, num_infosets_p2, np.int32)
+        end_p2 = _read_array(blsp_file, num_infosets_p2, np.int32)
+        end_p2 += 1
+        parent_p2 = _read_array(blsp_file, num_infosets_p2, np.int32)
 
         # get payoff matrix
-        payoff_indptr = map(int, blsp_file.readline().strip().split())
-        payoff_indices = map(int, blsp_file.readline().strip().split())
-        payoff_values = map(lambda x: -float(x),
-                            blsp_file.readline().strip().split())
+        payoff_indptr = _read_array(blsp_file, num_sequences_p1 + 1,
+                                    np.int32)
+        payoff_indices = _read_array(blsp_file, num_payoffs_p1, np.int32)
+        payoff_values = _read_array(blsp_file, num_payoffs_p1, float)
+        np.negative(payoff_values, out=payoff_values)
 
         A = sparse.csr_matrix(
             (payoff_values, payoff_indices, payoff_indptr),
             shape=(num_sequences_p1, num_sequences_p2))
 
-    return efg.ExtensiveFormGame(
+    return ExtensiveFormGame(
         "BLSP EFG",
-        A, (first_p1, first_p2), (end_p1, end_p2), (parent_p1, parent_p2),
+        A, A, (first_p1, first_p2), (end_p1, end_p2), (parent_p1, parent_p2),
         prox_infoset_weights=prox_infoset_weights,
-        prox_scalar=prox_scalar)
+        prox_scalar=prox_scalar,
+        zero_sum=True)
@@ -1,4 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import numpy as np
 from matrix_game.simplex import SimplexDomain
+from matrix_game import regret as matrix_regret
+from . import kernels
+from .treeplex import TreeplexDomain, _gather, _make_buffers
 
 
 class CounterfactualRegretMinimizer:
@@ -28,3 +34,283 @@ class CounterfactualRegretMinimizer:
             return 'CFR(%s)' % self.rms[0]
         else:
             return self.name
+
+
+class FlatCounterfactualRegretMinimizer:
+    """
+    CFR with the regrets and strategies of all information sets stored in
+    one array each, indexed by sequence. Instead of one regret minimizer
+    object per infoset, every infoset runs the same local rule, selected by
+    mode:
+
+    'rm':    regret matching
+    'rm+':   regret matching+
+    'hedge': Hedge with learning rate alpha
+    'dcfr':  discounted regret matching (DCFR); discount holds the
+             exponents (alpha, beta) of the positive and negative regret
+             discounts
+    'pcfr+': predictive regret matching+ (PCFR+): each infoset predicts
+             its next utilities to be its last ones, with the values of its
+             child infosets under their new strategies
+
+    Counterfactual values are computed bottom-up one depth level at a time;
+    the regret update, projection and normalization are then a single
+    segmented pass over all infosets.
+
+    With threads > 1, the subtrees below the root sequence (e.g. one per
+    private card in Leduc or RI) are split into up to that many groups,
+    which are updated concurrently on a thread pool. The groups touch
+    disjoint sequences, and the compiled kernels and the NumPy traversals
+    release the GIL.
+    """
+
+    def __init__(self, domain, mode='rm+', alpha=1.0, name=None, threads=1,
+                 discount=(1.5, 0.0)):
+        assert mode in _SIMPLEX_REGRET_MINIMIZERS
+        self.domain = domain
+        self.mode = mode
+        self.name = name
+        self._alpha = alpha
+        self._discount = discount
+        self._discount_factors = (1.0, 1.0)
+        self._iteration = 0
+        self._infoset_values = np.zeros(domain.num_information_sets())
+        self.regret = np.zeros(domain.dimension())
+        self.strategy = domain.center()
+        # see kernels.cfr_update
+        self._prediction = np.zeros(
+            domain.dimension() if mode == 'pcfr+' else 0)
+        self._executor = None
+        if threads > 1:
+            subtrees = domain.subtrees(threads)
+            self._subtrees = [
+                _SubtreeWorkspace(domain, subtree.levels, subtree.infosets,
+                                  subtree.order) for subtree in subtrees
+            ]
+            if len(self._subtrees) > 1:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=len(self._subtrees))
+        else:
+            self._subtrees = [
+                _SubtreeWorkspace(domain, domain._levels,
+                                  domain._all_infosets, domain._kernel_order)
+            ]
+
+    def __call__(self, utility):
+        root = self.domain.root_sequence()
+        root_utility = utility[root]
+        self._iteration += 1
+        if self.mode == 'dcfr':
+            self._discount_factors = matrix_regret.discount_factors(
+                self._iteration, *self._discount)
+        if self._executor is None:
+            self._update(self._subtrees[0], utility)
+        else:
+            # the subtrees only share the root sequence, which is restored
+            # below
+            for _ in self._executor.map(
+                    partial(self._update, utility=utility), self._subtrees):
+                pass
+        utility[root] = root_utility
+
+    def _update(self, subtree, utility):
+        if self.domain.backend == 'numba':
+            kernels.cfr_update(
+                utility, self.strategy, self.regret, self._infoset_values,
+                self._prediction, subtree.order, self.domain._begin,
+                self.domain._end, self.domain._parent,
+                self.domain.root_sequence(),
+                _KERNEL_MODES[self.mode], self._alpha,
+                *self._discount_factors)
+            return
+
+        values = self._infoset_values
+        for level, buffers, (parent_values, parent_utility) in zip(
+                subtree.levels, subtree.level_buffers,
+                subtree.parent_buffers):
+            _gather(self.strategy, level.sequences, buffers.values)
+            _gather(utility, level.sequences, buffers.expanded)
+            np.multiply(buffers.values, buffers.expanded, out=buffers.values)
+            np.add.reduceat(buffers.values, level.offsets, out=buffers.sums)
+            np.put(values, level.infosets, buffers.sums)
+            np.add.reduceat(buffers.sums, level.parent_offsets,
+                            out=parent_values)
+            _gather(utility, level.parent_sequences, parent_utility)
+            parent_utility += parent_values
+            np.put(utility, level.parent_sequences, parent_utility)
+
+        segments = subtree.segments
+        buffers = subtree.buffers
+        sequences = segments.sequences
+        regret = buffers.values
+        strategy = buffers.expanded
+        _gather(self.regret, sequences, regret)
+        _gather(utility, sequences, strategy)
+        regret += strategy
+        _gather(values, segments.infosets, buffers.gathered)
+        _gather(buffers.gathered, segments.segments, strategy)
+        regret -= strategy
+
+        Z = buffers.sums
+        if self.mode == 'hedge':
+            np.maximum.reduceat(regret, segments.offsets, out=buffers.scale)
+            _gather(buffers.scale, segments.segments, strategy)
+            np.subtract(regret, strategy, out=strategy)
+            strategy *= self._alpha
+            np.exp(strategy, out=strategy)
+            np.add.reduceat(strategy, segments.offsets, out=Z)
+        else:
+            if self.mode == 'dcfr':
+                positive, negative = self._discount_factors
+                np.maximum(regret, 0, out=strategy)
+                np.minimum(regret, 0, out=regret)
+                regret *= negative
+                strategy *= positive
+                regret += strategy
+            elif self.mode in ('rm+', 'pcfr+'):
+                np.maximum(regret, 0, out=regret)
+            if self.mode == 'pcfr+':
+                np.put(self.regret, sequences, regret)
+                self._predict(subtree, utility)
+                return
+            np.maximum(regret, 0, out=strategy)
+            np.add.reduceat(strategy, segments.offsets, out=Z)
+            # infosets without positive regret play uniformly
+            no_regret = np.less_equal(Z, 0.0, out=buffers.mask)
+            _gather(no_regret, segments.segments, subtree.sequence_mask)
+            np.copyto(strategy, 1.0, where=subtree.sequence_mask)
+            np.copyto(Z, subtree.sizes, where=no_regret)
+        _gather(Z, segments.segments, subtree.sequence_sums)
+        strategy /= subtree.sequence_sums
+
+        np.put(self.regret, sequences, regret)
+        np.put(self.strategy, sequences, strategy)
+
+    def _predict(self, subtree, utility):
+        """
+        The PCFR+ strategies, bottom-up one level at a time, as in
+        kernels.cfr_update: with the predicted utilities m = utility +
+        prediction, an infoset plays the positive part of
+        regret + m - <strategy, m>.
+        """
+        prediction = self._prediction
+        for level, buffers, (parent_values, parent_prediction), \
+                (predicted, mask), sizes in zip(
+                    subtree.levels, subtree.level_buffers,
+                    subtree.parent_buffers, subtree.prediction_buffers,
+                    subtree.level_sizes):
+            _gather(utility, level.sequences, predicted)
+            _gather(prediction, level.sequences, buffers.values)
+            predicted += buffers.values
+            np.put(prediction, level.sequences, 0.0)
+
+            _gather(self.strategy, level.sequences, buffers.values)
+            np.multiply(buffers.values, predicted, out=buffers.values)
+            np.add.reduceat(buffers.values, level.offsets, out=buffers.sums)
+            _gather(buffers.sums, level.segments, buffers.expanded)
+            strategy = buffers.values
+            _gather(self.regret, level.sequences, strategy)
+            strategy += predicted
+            strategy -= buffers.expanded
+            np.maximum(strategy, 0, out=strategy)
+
+            Z = buffers.sums
+            np.add.reduceat(strategy, level.offsets, out=Z)
+            # infosets without positive regret play uniformly
+            no_regret = np.less_equal(Z, 0.0, out=buffers.mask)
+            _gather(no_regret, level.segments, mask)
+            np.copyto(strategy, 1.0, where=mask)
+            np.copyto(Z, sizes, where=no_regret)
+            _gather(Z, level.segments, buffers.expanded)
+            strategy /= buffers.expanded
+            np.put(self.strategy, level.sequences, strategy)
+
+            # the change of the infosets' values, into their parents'
+            # predictions
+            strategy *= predicted
+            np.add.reduceat(strategy, level.offsets, out=buffers.sums)
+            _gather(self._infoset_values, level.infosets, buffers.scale)
+            np.subtract(buffers.sums, buffers.scale, out=buffers.sums)
+            np.add.reduceat(buffers.sums, level.parent_offsets,
+                            out=parent_values)
+            _gather(prediction, level.parent_sequences, parent_prediction)
+            parent_prediction += parent_values
+            np.put(prediction, level.parent_sequences, parent_prediction)
+        prediction[self.domain.root_sequence()] = 0.0
+
+    def __str__(self):
+        if self.name is None:
+            if self.mode == 'hedge':
+                return 'CFR(Hedge(%f))' % self._alpha
+            if self.mode == 'dcfr':
+                return 'CFR(DiscountedRegretMatching(%g, %g))' % \
+                    self._discount
+            if self.mode == 'pcfr+':
+                return 'PCFR+'
+            return 'CFR(%s)' % _MODE_NAMES[self.mode]
+        else:
+            return self.name
+
+
+class _SubtreeWorkspace:
+    """
+    The traversal plan of a group of subtrees (or of the whole treeplex)
+    and scratch arrays for it, so that an update allocates nothing.
+    """
+
+    def __init__(self, domain, levels, segments, order):
+        self.levels = levels
+        self.segments = segments
+        self.order = order
+        self.sizes = domain._sizes[segments.infosets]
+        self.level_buffers = [_make_buffers(level) for level in levels]
+        self.buffers = _make_buffers(segments)
+        self.parent_buffers = [
+            (np.empty(len(level.parent_sequences)),
+             np.empty(len(level.parent_sequences)))
+            for level in levels
+        ]
+        self.sequence_mask = np.empty(len(segments.sequences), dtype=bool)
+        self.sequence_sums = np.empty(len(segments.sequences))
+        self.level_sizes = [domain._sizes[level.infosets].astype(float)
+                            for level in levels]
+        self.prediction_buffers = [
+            (np.empty(len(level.sequences)),
+             np.empty(len(level.sequences), dtype=bool))
+            for level in levels
+        ]
+
+
+_MODE_NAMES = {'rm': 'RegretMatching', 'rm+': 'RegretMatching+'}
+
+_KERNEL_MODES = {'rm': kernels.RM, 'rm+': kernels.RM_PLUS, 'hedge': kernels.HEDGE,
+                 'dcfr': kernels.DCFR, 'pcfr+': kernels.PCFR_PLUS}
+
+_SIMPLEX_REGRET_MINIMIZERS = {
+    'rm': lambda alpha, discount:
+        matrix_regret.regret_matching_initializer(),
+    'rm+': lambda alpha, discount:
+        matrix_regret.regret_matching_plus_initializer(),
+    'hedge': lambda alpha, discount: matrix_regret.hedge_initializer(alpha),
+    'dcfr': lambda alpha, discount:
+        matrix_regret.discounted_regret_matching_initializer(*discount),
+    'pcfr+': lambda alpha, discount:
+        matrix_regret.predictive_regret_matching_plus_initializer(),
+}
+
+
+def flat_regret_minimizer_initializer(mode, alpha=1.0, threads=1,
+                                      discount=(1.5, 0.0)):
+    """
+    Initializer for RegretMinimization that runs FlatCounterfactualRegretMinimizer
+    on treeplexes, and the matching per-simplex regret minimizer on simplexes.
+    """
+    def init(domain, name=None):
+        if isinstance(domain, TreeplexDomain):
+            return FlatCounterfactualRegretMinimizer(domain, mode, alpha, name,
+                                                     threads=threads,
+                                                     discount=discount)
+        return _SIMPLEX_REGRET_MINIMIZERS[mode](alpha, discount)(domain)
+
+    init.flat = True
+    return init
@@ -0,0 +1,156 @@
+import numpy as np
+import scipy.sparse as sparse
+from .kronecker import KroneckerPayoff
+
+
+def _magnitudes(M):
+    """ The entries of a dense or sparse factor in absolute value, dense. """
+    return np.abs(M.toarray() if sparse.issparse(M) else np.asarray(M))
+
+
+class ChanceSampledGame:
+    """
+    Monte Carlo estimates of the utilities of an ExtensiveFormGame, for
+    chance-sampled CFR. The payoff entries are grouped by chance outcome,
+    the pair of chance labels of their sequences (see
+    ExtensiveFormGame.chance_labels). Each utility call draws num_samples
+    outcomes g with probability q_g, proportional to the payoff mass of the
+    outcome's entries, which folds in its chance probability, and uses only
+    those entries, weighted by 1 / (num_samples * q_g). The estimates are
+    unbiased, and a call touches a fraction of the payoff matrix.
+
+    For KroneckerPayoff games the outcomes are the blocks kron(H, L) of
+    the operator, i.e. the pairs of private hands, whose masses and
+    products come from the factors, so the explicit matrix is never built.
+
+    Only utility_for, utilities and domain are provided, which is what
+    RegretMinimization needs; exploitability is measured on the game.
+    """
+
+    def __init__(self, game, num_samples=1, seed=None):
+        self._game = game
+        self._num_samples = num_samples
+        self._random = np.random.RandomState(seed)
+        self._blocks = None
+        if isinstance(game._A_0, KroneckerPayoff):
+            self._init_blocks(game)
+            return
+
+        A_0 = game._A_0.tocsr().tocoo()
+        if game.zero_sum:
+            # utility_for(0) = -A_0 y and utility_for(1) = A_0' x
+            products = [(A_0.row, A_0.col, -A_0.data),
+                        (A_0.col, A_0.row, A_0.data)]
+        else:
+            A_1_T = game._A_1_T.tocsr().tocoo()
+            products = [(A_0.row, A_0.col, -A_0.data),
+                        (A_1_T.row, A_1_T.col, A_1_T.data)]
+
+        # chance outcome of every entry, from the labels of its sequences
+        labels = [np.asarray(labels, dtype=np.int64) + 1
+                  for labels in game.chance_labels()]
+        width = labels[1].max() + 1
+        keys = [labels[0][products[0][0]] * width + labels[1][products[0][1]],
+                labels[0][products[1][1]] * width + labels[1][products[1][0]]]
+        _, groups = np.unique(np.concatenate(keys), return_inverse=True)
+        groups = np.split(groups, [len(keys[0])])
+        num_groups = max(group.max(initial=-1) for group in groups) + 1
+
+        mass = sum(np.bincount(group, weights=np.abs(values),
+                               minlength=num_groups)
+                   for group, (_, _, values) in zip(groups, products))
+        self._probability = mass / mass.sum()
+
+        # each player's product entries sorted by outcome, the entries of
+        # outcome g being [indptr[g], indptr[g + 1])
+        self._products = []
+        for group, (out_index, in_index, values) in zip(groups, products):
+            order = np.argsort(group, kind='stable')
+            indptr = np.zeros(num_groups + 1, dtype=np.int64)
+            np.cumsum(np.bincount(group, minlength=num_groups),
+                      out=indptr[1:])
+            self._products.append((out_index[order], in_index[order],
+                                   values[order], indptr))
+
+    def _init_blocks(self, game):
+        # utility_for(0) = -A_0 y block by block, and utility_for(1) =
+        # A_1^T x, whose block (j, i) belongs to the outcome (i, j)
+        self._blocks = [(game._A_0, -1.0), (game._A_1_T, 1.0)]
+        mass = sum(_magnitudes(H) * abs(L).sum()
+                   for H, L in game._A_0.terms)
+        mass = mass + sum(_magnitudes(H).T * abs(L).sum()
+                          for H, L in game._A_1_T.terms)
+        # outcome g is the pair of hands divmod(_outcomes[g], num_hands_y)
+        self._outcomes = np.flatnonzero(mass)
+        self._num_hands_y = mass.shape[1]
+        mass = mass.ravel()[self._outcomes]
+        self._probability = mass / mass.sum()
+
+    def _block_product(self, player, outcomes, weights, seq, out):
+        operator, sign = self._blocks[player]
+        (_, _), (m_L, n_L) = operator._shapes
+        out_padding, in_padding = operator.padding
+        hands = divmod(self._outcomes[outcomes], self._num_hands_y)
+        if player == 1:
+            hands = hands[::-1]
+        estimate = np.zeros(self.domain(player).dimension())
+        for row, col, weight in zip(hands[0], hands[1], weights):
+            block = estimate[out_padding + row * m_L:
+                             out_padding + (row + 1) * m_L]
+            x = seq[in_padding + col * n_L:in_padding + (col + 1) * n_L]
+            for H, L in operator.terms:
+                h = H[row, col]
+                if h != 0:
+                    block += (sign * weight * h) * L.dot(x)
+        if out is None:
+            return estimate
+        out[:] = estimate
+        return out
+
+    def domain(self, player):
+        return self._game.domain(player)
+
+    def _sample(self):
+        outcomes = self._random.choice(len(self._probability),
+                                       size=self._num_samples,
+                                       p=self._probability)
+        return outcomes, 1.0 / (self._num_samples *
+                                self._probability[outcomes])
+
+    def _product(self, player, outcomes, weights, seq, out):
+        if self._blocks is not None:
+            return self._block_product(player, outcomes, weights, seq, out)
+        out_index, in_index, values, indptr = self._products[player]
+        starts = indptr[outcomes]
+        counts = indptr[outcomes + 1] - starts
+        # positions of the sampled outcomes' entries, outcome after outcome
+        entries = np.arange(counts.sum()) + np.repeat(
+            starts - np.cumsum(counts) + counts, counts)
+        contributions = values[entries] * seq[in_index[entries]] * \
+            np.repeat(weights, counts)
+        estimate = np.bincount(out_index[entries], weights=contributions,
+                               minlength=self.domain(player).dimension())
+        if out is None:
+            return estimate
+        out[:] = estimate
+        return out
+
+    def utility_for(self, player, opponent_strategy, out=None):
+        """ An estimate of game.utility_for from a fresh sample. """
+        seq = self.domain(1 - player).sequence_form(opponent_strategy)
+        outcomes, weights = self._sample()
+        return self._product(player, outcomes, weights, seq, out)
+
+    def utilities(self, x, y, out=None):
+        """
+        Estimates of game.utilities, both from the same sampled outcomes.
+        """
+        seq_x = self.domain(0).sequence_form(x)
+        seq_y = self.domain(1).sequence_form(y)
+        outcomes, weights = self._sample()
+        if out is None:
+            out = np.empty(len(seq_x) + len(seq_y))
+        u_x, u_y = out[:len(seq_x)], out[len(seq_x):]
+        self._product(0, outcomes, weights, seq_y, u_x)
+        self._product(1, outcomes, weights, seq_x, u_y)
+        return u_x, u_y
@@ -1,9 +1,83 @@
 from __future__ import print_function
 import sys
-from collections import defaultdict
 import numpy as np
-from scipy.sparse import isspmatrix_lil, isspmatrix_csr
+from scipy.sparse import csr_matrix, isspmatrix_lil, isspmatrix_csr, \
+    isspmatrix_csc
 from .treeplex import TreeplexDomain
+from .kronecker import KroneckerPayoff
+
+try:
+    from scipy.sparse._sparsetools import csr_matvec, csc_matvec
+except ImportError:
+    csr_matvec = csc_matvec = None
+
+
+def _matvec(A, x, out):
+    """
+    out = A.dot(x) for a CSR or CSC matrix A, accumulated directly into out
+    with SciPy's sparsetools kernels when they are available, or for a
+    KroneckerPayoff.
+    """
+    if isinstance(A, KroneckerPayoff):
+        return A.dot(x, out=out)
+    if csr_matvec is None or A.dtype != out.dtype:
+        out[:] = A.dot(x)
+        return out
+    out.fill(0.0)
+    n_row, n_col = A.shape
+    if isspmatrix_csr(A):
+        csr_matvec(n_row, n_col, A.indptr, A.indices, A.data, x, out)
+    else:
+        assert isspmatrix_csc(A)
+        csc_matvec(n_row, n_col, A.indptr, A.indices, A.data, x, out)
+    return out
+
+
+def _same_matrix(A, B):
+    if isinstance(A, KroneckerPayoff) or isinstance(B, KroneckerPayoff):
+        return False
+    return A.shape == B.shape and A.nnz == B.nnz and (A != B).nnz == 0
+
+
+def _put_csr(arrays, name, A):
+    arrays[name + '_data'] = A.data
+    arrays[name + '_indices'] = A.indices
+    arrays[name + '_indptr'] = A.indptr
+    arrays[name + '_shape'] = np.array(A.shape)
+
+
+def _get_csr(arrays, name):
+    return csr_matrix((arrays[name + '_data'], arrays[name + '_indices'],
+                       arrays[name + '_indptr']),
+                      shape=tuple(arrays[name + '_shape']), copy=False)
+
+
+def _put_payoff(arrays, name, A):
+    """ _put_csr, or the factors of a KroneckerPayoff. """
+    if not isinstance(A, KroneckerPayoff):
+        return _put_csr(arrays, name, A)
+    arrays[name + '_padding'] = np.array(A.padding)
+    arrays[name + '_terms'] = np.array(len(A.terms))
+    for k, term in enumerate(A.terms):
+        for factor, M in zip('HL', term):
+            key = '%s_%s%d' % (name, factor, k)
+            if isspmatrix_csc(M):
+                M = M.tocsr()
+            if isspmatrix_csr(M):
+                _put_csr(arrays, key, M)
+            else:
+                arrays[key] = M
+
+
+def _get_payoff(arrays, name):
+    if name + '_terms' not in arrays:
+        return _get_csr(arrays, name)
+    terms = []
+    for k in range(int(arrays[name + '_terms'])):
+        keys = ['%s_%s%d' % (name, factor, k) for factor in 'HL']
+        terms.append([_get_csr(arrays, key) if key + '_data' in arrays
+                      else arrays[key] for key in keys])
+    return KroneckerPayoff(terms, tuple(arrays[name + '_padding']))
 
 
 class ExtensiveFormGame:
@@ -14,7 +88,19 @@ class ExtensiveFormGame:
     i.e., x, the first player, is the minimizer
 
     Expects A and reach to be of type scipy.sparse.lil_matrix or
-    scipy.sparse.csr_matrix
+    scipy.sparse.csr_matrix. A_0 and A_1 may also be KroneckerPayoff
+    operators, which are kept as they are, and A_1 may be a
+    scipy.sparse.csc_matrix, the transpose of a CSR A_1^T, whose arrays
+    are then used for A_1^T without copying them.
+
+    With zero_sum=True, A_1 must equal A_0 (ValueError otherwise) and only
+    that one matrix is stored. With zero_sum=False both are kept as given.
+    If zero_sum is None, games given the same matrix for both players are
+    detected as zero-sum, which compares the two matrices entry by entry.
+
+    chance optionally labels each player's sequences with the chance
+    outcomes the player has observed there (e.g. private and board cards),
+    as two integer arrays of length dimension; see chance_labels().
     """
 
     def __init__(self,
@@ -30,43 +116,60 @@ class ExtensiveFormGame:
                  reach=None,
                  all_negative=False,
                  offset=0,
-                 B=None):
+                 B=None,
+                 zero_sum=None,
+                 chance=None):
         if seq_to_str is None:
-            seq_to_str = [defaultdict(), defaultdict()]
+            seq_to_str = (None, None)
         self._name = name
-        assert isspmatrix_lil(A_0) or isspmatrix_csr(A_0)
-        assert isspmatrix_lil(A_1) or isspmatrix_csr(A_1)
-        if isspmatrix_csr(A_0):
+        assert isspmatrix_lil(A_0) or isspmatrix_csr(A_0) or \
+            isinstance(A_0, KroneckerPayoff)
+        assert isspmatrix_lil(A_1) or isspmatrix_csr(A_1) or \
+            isspmatrix_csc(A_1) or isinstance(A_1, KroneckerPayoff)
+        # Only the layout each player's gradient needs is kept: A_0 as CSR
+        # for utility_for(0), and A_1^T for utility_for(1). In a zero-sum
+        # game (A_1 == A_0) A_1^T is the transpose view of A_0, i.e. the
+        # single matrix is read as CSR for Ay and as CSC for x'A; otherwise
+        # A_1^T is materialized as CSR and A_1 itself is not kept.
+        if isspmatrix_csr(A_0) or isinstance(A_0, KroneckerPayoff):
             self._A_0 = A_0
         else:
             self._A_0 = A_0.tocsr()
-        if isspmatrix_csr(A_1):
-            self._A_1 = A_1
+        if zero_sum and not (A_1 is A_0 or _same_matrix(self._A_0, A_1)):
+            raise ValueError('zero_sum requires A_1 to equal A_0')
+        if zero_sum is None:
+            zero_sum = A_1 is A_0 or _same_matrix(self._A_0, A_1)
+        self.zero_sum = zero_sum
+        if self.zero_sum:
+            self._A_1_T = self._A_0.transpose()
+        elif isinstance(A_1, KroneckerPayoff) or isspmatrix_csc(A_1):
+            self._A_1_T = A_1.transpose()
         else:
-            self._A_1 = A_1.tocsr()
+            self._A_1_T = A_1.transpose().tocsr()
+        self._reach = None
         if reach is not None:
             if isspmatrix_csr(reach[0]):
                 self._reach = reach
             else:
                 self._reach = (reach[0].tocsr(), reach[1].tocsr())
-        self._A_0_T = self._A_0.transpose()
-        self._A_1_T = self._A_1.transpose()
         # print(A, first, end, parent)
         self._domains = (TreeplexDomain(
-            self._A_0.get_shape()[0],
+            self._A_0.shape[0],
             first[0],
             end[0],
             parent[0],
             seq_to_str[0],
             prox_infoset_weights=prox_infoset_weights,
             prox_scalar=prox_scalar), TreeplexDomain(
-                self._A_0.get_shape()[1],
+                self._A_0.shape[1],
                 first[1],
                 end[1],
                 parent[1],
                 seq_to_str[1],
                 prox_infoset_weights=prox_infoset_weights,
                 prox_scalar=prox_scalar))
+        self._seq_buffers = (np.empty(self._domains[0].dimension()),
+                             np.empty(self._domains[1].dimension()))
         self.all_negative = all_negative
         self.offset = offset
         if B is not None:
@@ -76,19 +179,89 @@ class ExtensiveFormGame:
                 self._B = B.tocsr()
         else:
             self._B = None
+        self._chance = None
+        if chance is not None:
+            self._chance = tuple(np.asarray(labels) for labels in chance)
+            assert all(len(self._chance[player]) ==
+                       self.domain(player).dimension() for player in range(2))
 
     def domain(self, player):
         return self._domains[player]
 
+    def chance_labels(self):
+        """
+        Per-sequence chance labels of both players: payoff entries whose
+        sequences carry the same pair of labels belong to the same chance
+        outcome. Without the chance argument, a sequence is labelled with
+        its subtree below the root sequence, which in the card games
+        separates the private cards but not later chance events.
+        """
+        if self._chance is not None:
+            return self._chance
+        return tuple(self.domain(player).sequence_roots()
+                     for player in range(2))
+
+    def to_arrays(self):
+        """
+        The game as a dict of flat arrays: the CSR parts of the payoff
+        matrices, the treeplex arrays, the reach matrices, B and the chance
+        labels if set, and the scalar attributes. from_arrays rebuilds the game from them, so
+        they can be saved, memory-mapped or put in shared memory.
+        """
+        arrays = {
+            'name': np.array(self._name),
+            'zero_sum': np.array(self.zero_sum),
+            'all_negative': np.array(self.all_negative),
+            'offset': np.array(self.offset),
+        }
+        _put_payoff(arrays, 'A_0', self._A_0)
+        if not self.zero_sum:
+            _put_payoff(arrays, 'A_1_T', self._A_1_T)
+        for player in range(2):
+            domain = self.domain(player)
+            arrays['begin_%d' % player] = domain._begin
+            arrays['end_%d' % player] = domain._end
+            arrays['parent_%d' % player] = domain._parent
+            if self._reach is not None:
+                _put_csr(arrays, 'reach_%d' % player, self._reach[player])
+        if self._B is not None:
+            _put_csr(arrays, 'B', self._B)
+        if self._chance is not None:
+            arrays['chance_0'], arrays['chance_1'] = self._chance
+        return arrays
+
     def profile_epsilon(self, x, y):
-        value_x = self.profile_value_x(x, y)
-        value_y = self.profile_value_y(x, y)
-        br_x, _ = self.domain(0).support(self.utility_for(0, y))
-        br_y, _ = self.domain(1).support(self.utility_for(1, x))
+        seq_x = self.domain(0).sequence_form(x)
+        seq_y = self.domain(1).sequence_form(y)
+        u_x, u_y = self._utilities(
+            seq_x, seq_y, np.empty(len(seq_x) + len(seq_y)))
+        value_x = np.dot(seq_x, u_x)
+        if self.zero_sum:
+            value_y = -value_x
+        else:
+            value_y = np.dot(seq_y, u_y)
+        br_x, _ = self.domain(0).support(u_x)
+        br_y, _ = self.domain(1).support(u_y)
         # return br_x + br_y, br_x - value, br_y + value, value
         # print(value_y) # y dot A_1_T dot x
         return br_x + br_y, br_x - value_x, -value_y + br_y, value_x, value_y
 
+    def profile_epsilon_many(self, xs, ys):
+        """
+        profile_epsilon for a sequence of profiles (xs[k], ys[k]), e.g. a
+        history of checkpointed strategies. Returns the same tuple as
+        profile_epsilon, with one array entry per profile.
+        """
+        seq_x = np.array([self.domain(0).sequence_form(x) for x in xs])
+        seq_y = np.array([self.domain(1).sequence_form(y) for y in ys])
+        u_x = -self._A_0.dot(seq_y.T).T
+        u_y = self._A_1_T.dot(seq_x.T).T
+        value_x = np.sum(seq_x * u_x, axis=1)
+        value_y = np.sum(seq_y * u_y, axis=1)
+        br_x, _ = self.domain(0).support_many(u_x)
+        br_y, _ = self.domain(1).support_many(u_y)
+        return br_x + br_y, br_x - value_x, -value_y + br_y, value_x, value_y
+
     # original
     def profile_value(self, x, y):
         seq = self.domain(0).sequence_form(x)
@@ -99,6 +272,8 @@ class ExtensiveFormGame:
         return np.dot(seq, self.utility_for(0, y))
     
     def profile_value_y(self, x, y):
+        if self.zero_sum:
+            return -self.profile_value_x(x, y)
         seq = self.domain(1).sequence_form(y)
         return np.dot(seq, self.utility_for(1, x))
 
@@ -118,7 +293,22 @@ class ExtensiveFormGame:
         regrets = self.domain(player).infoset_regrets(g, strategy)
         return np.sum(regrets * self.reach(player, opponent_strategy))
 
-    def utility_for(self, player, opponent_strategy):
+    def utility_for(self, player, opponent_strategy, out=None):
+        """
+        If out is given, the utility vector is written into it and the
+        opponent's sequence form goes to a buffer owned by the game, so
+        no arrays are allocated.
+        """
+        if out is not None:
+            seq = self.domain(1 - player).sequence_form(
+                opponent_strategy, out=self._seq_buffers[1 - player])
+            if player == 0:
+                _matvec(self._A_0, seq, out)
+                return np.negative(out, out=out)
+
+            assert player == 1
+            return _matvec(self._A_1_T, seq, out)
+
         seq = self.domain(1 - player).sequence_form(opponent_strategy)
         if player == 0:
             return -self._A_0.dot(seq)
@@ -126,8 +316,46 @@ class ExtensiveFormGame:
         assert player == 1
         return self._A_1_T.dot(seq) # is this supposed to be transposed
 
+    def utilities(self, x, y, out=None):
+        """
+        Returns (utility_for(0, y), utility_for(1, x)) as two separate
+        sparse products, one per player. Fusing them into a single pass
+        over a combined block matrix would need a copy of both payoff
+        matrices, so it is not done.
+
+        Without out, all arrays are allocated per call and the method is
+        safe to call concurrently. If out (of length dimension(0) +
+        dimension(1)) is given, the utilities are views into it and the
+        sequence forms go to buffers owned by the game, so nothing is
+        allocated, but, as with utility_for(out=...), concurrent calls on
+        the same game are not safe.
+        """
+        if out is None:
+            seq_x = self.domain(0).sequence_form(x)
+            seq_y = self.domain(1).sequence_form(y)
+            out = np.empty(len(seq_x) + len(seq_y))
+        else:
+            seq_x = self.domain(0).sequence_form(
+                x, out=self._seq_buffers[0])
+            seq_y = self.domain(1).sequence_form(
+                y, out=self._seq_buffers[1])
+        return self._utilities(seq_x, seq_y, out)
+
+    def _utilities(self, seq_x, seq_y, out):
+        u_x, u_y = self._split(out)
+        _matvec(self._A_0, seq_y, u_x)
+        np.negative(u_x, out=u_x)
+        _matvec(self._A_1_T, seq_x, u_y)
+        return u_x, u_y
+
+    def _split(self, u):
+        dimension_x = self.domain(0).dimension()
+        return u[:dimension_x], u[dimension_x:]
+
     def payoff_max_norm(self):
-        return max(self._A_0.max(), -self._A_1.min()) # not sure if this is right
+        if self.zero_sum:
+            return max(self._A_0.max(), -self._A_0.min())
+        return max(self._A_0.max(), -self._A_1_T.min()) # not sure if this is right
 
     def reach(self, player, opponent_strategy):
         if self._reach is None:
@@ -141,16 +369,17 @@ class ExtensiveFormGame:
                             f=sys.stdout,
                             negate=False,
                             all_negative=False):
+        A_0 = self._A_0.tocsr()
         constant_term = 0
         if all_negative:
-            constant_term = np.max(np.absolute(self._A_0)) + 1
+            constant_term = np.max(np.absolute(A_0)) + 1
         if negate:
             if self._B is None:
-                B = -np.copy(self._A_0)
+                B = -np.copy(A_0)
             else:
                 B = self._B
         else:
-            B = np.transpose(self._A_0).copy()
+            B = np.transpose(A_0).copy()
         if self._B is None:
             B.data -= constant_term
         for row in B.todense():
@@ -171,3 +400,39 @@ class ExtensiveFormGame:
         return 'ExtensiveFormGame(%s, %dx%d)' % (self._name, self._A_0.shape[0],
                                                  self._A_0.shape[1])
 
+
+def from_arrays(arrays, prox_infoset_weights=False, prox_scalar=1):
+    """
+    Rebuilds an ExtensiveFormGame from the output of to_arrays, or from a
+    mapping with the same keys (e.g. an np.load of it). The sparse
+    matrices are built around the given arrays without copying them, and
+    the stored zero_sum flag is used as is rather than detected again.
+    """
+    A_0 = _get_payoff(arrays, 'A_0')
+    zero_sum = bool(arrays['zero_sum'])
+    if zero_sum:
+        A_1 = A_0
+    elif isinstance(A_0, KroneckerPayoff):
+        A_1 = _get_payoff(arrays, 'A_1_T').transpose()
+    else:
+        A_1 = _get_csr(arrays, 'A_1_T').transpose()
+    reach = None
+    if 'reach_0_data' in arrays:
+        reach = (_get_csr(arrays, 'reach_0'), _get_csr(arrays, 'reach_1'))
+    B = _get_csr(arrays, 'B') if 'B_data' in arrays else None
+    chance = None
+    if 'chance_0' in arrays:
+        chance = (arrays['chance_0'], arrays['chance_1'])
+    return ExtensiveFormGame(
+        str(arrays['name']), A_0, A_1,
+        (arrays['begin_0'], arrays['begin_1']),
+        (arrays['end_0'], arrays['end_1']),
+        (arrays['parent_0'], arrays['parent_1']),
+        prox_infoset_weights=prox_infoset_weights,
+        prox_scalar=prox_scalar,
+        reach=reach,
+        all_negative=bool(arrays['all_negative']),
+        offset=arrays['offset'].item(),
+        B=B,
+        zero_sum=zero_sum,
+        chance=chance)
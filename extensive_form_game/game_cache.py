@@ -0,0 +1,98 @@
+"""
+On-disk cache of generated games.
+
+A game generator such as leduc.init_efg is run once per combination of
+parameters; the arrays of the game (see ExtensiveFormGame.to_arrays) are
+stored as one .npy file each in a directory named after the generator and a
+hash of its parameters. Later runs open the files with
+np.load(mmap_mode='r'), so they start without rebuilding the game, and
+concurrent runs share the page cache.
+
+The prox parameters are not part of the key: they do not change the arrays,
+and are applied when the game is loaded.
+
+Nor is the generator's code, so a change to what a generator builds must be
+recorded by bumping GAME_VERSION, a module-level integer in the generator's
+module (0 if the module does not define it). Each version gets its own
+entries, so stale games are rebuilt rather than loaded. FORMAT_VERSION
+below is for changes to the stored layout shared by all generators.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+from .extensive_form_game import from_arrays
+
+# bump when the layout of the stored arrays changes; the version is part of
+# the entry names, so entries of other layouts are never looked up
+# 2: chance_0 and chance_1 labels
+FORMAT_VERSION = 2
+
+
+def default_cache_dir():
+    return os.environ.get(
+        'EFG_CACHE_DIR',
+        os.path.join(os.path.expanduser('~'), '.cache', 'efg'))
+
+
+def entry_name(generator, params):
+    """ The directory name of the cache entry of generator(**params). """
+    name = '%s.%s' % (generator.__module__, generator.__name__)
+    generator_version = getattr(sys.modules[generator.__module__],
+                                'GAME_VERSION', 0)
+    key = json.dumps({'generator': name, 'params': params,
+                      'generator_version': generator_version,
+                      'version': FORMAT_VERSION}, sort_keys=True)
+    return '%s-%s' % (name, hashlib.sha256(key.encode()).hexdigest()[:16])
+
+
+def load(generator, cache_dir=None, prox_infoset_weights=False,
+         prox_scalar=1, **params):
+    """
+    generator(prox_infoset_weights=..., prox_scalar=..., **params), built
+    and stored on the first call and memory-mapped from cache_dir
+    afterwards. params must be JSON-serializable.
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    path = os.path.join(cache_dir, entry_name(generator, params))
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        _store(path, generator(**params).to_arrays())
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('version') != FORMAT_VERSION:
+        raise ValueError('game cache entry %s has format version %s, '
+                         'expected %d; delete it to rebuild the game' %
+                         (path, meta.get('version'), FORMAT_VERSION))
+    arrays = {
+        key: np.load(os.path.join(path, key + '.npy'), mmap_mode='r')
+        for key in meta['arrays']
+    }
+    return from_arrays(arrays, prox_infoset_weights=prox_infoset_weights,
+                       prox_scalar=prox_scalar)
+
+
+def _store(path, arrays):
+    # write everything to a temporary directory and rename it into place,
+    # so that concurrent runs never see a partial entry
+    cache_dir = os.path.dirname(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=cache_dir, prefix='.tmp-')
+    try:
+        for key, array in arrays.items():
+            np.save(os.path.join(tmp, key + '.npy'), array,
+                    allow_pickle=False)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'version': FORMAT_VERSION,
+                       'arrays': sorted(arrays)}, f)
+        os.rename(tmp, path)
+    except OSError:
+        # another run stored the same entry first
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            raise
+    finally:
+        if os.path.exists(tmp):
+            shutil.rmtree(tmp)
@@ -0,0 +1,172 @@
+"""
+Compiled treeplex traversals.
+
+Every kernel walks the information sets one at a time in `order`, an
+array of the nonempty infosets in bottom-up order (children before their
+parents, as in TreeplexDomain._levels), and reads the flat begin/end/parent
+arrays directly. They are compiled with Numba when it is importable;
+TreeplexDomain only selects them then, and otherwise uses its vectorized
+NumPy traversals.
+"""
+import math
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+available = numba is not None
+
+# local rules of the flat CFR update
+RM, RM_PLUS, HEDGE, DCFR, PCFR_PLUS = 0, 1, 2, 3, 4
+
+
+def _jit(f):
+    if numba is None:
+        return f
+    return numba.njit(cache=True, nogil=True)(f)
+
+
+@_jit
+def sequence_form(seq, order, begin, end, parent):
+    for k in range(len(order) - 1, -1, -1):
+        i = order[k]
+        Z = 0.0
+        for s in range(begin[i], end[i]):
+            Z += seq[s]
+        scale = seq[parent[i]] / Z if Z > 0.0 else 1.0
+        for s in range(begin[i], end[i]):
+            seq[s] *= scale
+
+
+@_jit
+def behavioral_form(x, order, begin, end):
+    for k in range(len(order)):
+        i = order[k]
+        Z = 0.0
+        for s in range(begin[i], end[i]):
+            Z += x[s]
+        # infosets with no mass are scaled by their size
+        scale = 1.0 / Z if Z != 0.0 else float(end[i] - begin[i])
+        for s in range(begin[i], end[i]):
+            x[s] *= scale
+
+
+@_jit
+def support(g, response, order, begin, end, parent, root):
+    g[root] = 0.0
+    response[root] = 1.0
+    for k in range(len(order)):
+        i = order[k]
+        best = begin[i]
+        for s in range(begin[i] + 1, end[i]):
+            if g[s] > g[best]:
+                best = s
+        response[best] = 1.0
+        g[parent[i]] += g[best]
+    return g[root]
+
+
+@_jit
+def infoset_regrets(got, could, x, regrets, response, order, begin, end,
+                    parent):
+    for k in range(len(order)):
+        i = order[k]
+        best = begin[i]
+        ev = 0.0
+        for s in range(begin[i], end[i]):
+            if could[s] > could[best]:
+                best = s
+            ev += x[s] * got[s]
+        response[best] = 1.0
+        regrets[i] = could[best] - ev
+        got[parent[i]] += ev
+        could[parent[i]] += could[best]
+
+
+@_jit
+def smooth_br(g, z, order, begin, end, parent, weights, beta, root):
+    for k in range(len(order)):
+        i = order[k]
+        dgf_weight = beta * weights[i]
+        offset = g[begin[i]]
+        for s in range(begin[i] + 1, end[i]):
+            offset = min(offset, g[s])
+        Z = 0.0
+        for s in range(begin[i], end[i]):
+            z[s] = math.exp(-(1.0 / dgf_weight) * (g[s] - offset))
+            Z += z[s]
+        for s in range(begin[i], end[i]):
+            z[s] /= Z
+        g[parent[i]] += offset + dgf_weight * (
+            math.log(1.0 / Z) + math.log(end[i] - begin[i]))
+    return g[root]
+
+
+@_jit
+def cfr_update(utility, strategy, regret, values, prediction, order, begin,
+               end, parent, root, mode, alpha, positive, negative):
+    """
+    For PCFR_PLUS, prediction[s] accumulates, over the child infosets of
+    sequence s, their value under their new strategies minus their value
+    under the old ones, so that utility[s] + prediction[s] is the predicted
+    utility of s. It is reset to 0 as it is read.
+    """
+    root_utility = utility[root]
+    for k in range(len(order)):
+        i = order[k]
+        # the utilities of this infoset's sequences are complete, since
+        # its children came first
+        ev = 0.0
+        for s in range(begin[i], end[i]):
+            ev += strategy[s] * utility[s]
+        values[i] = ev
+        utility[parent[i]] += ev
+
+        Z = 0.0
+        if mode == HEDGE:
+            offset = -np.inf
+            for s in range(begin[i], end[i]):
+                regret[s] += utility[s] - ev
+                offset = max(offset, regret[s])
+            for s in range(begin[i], end[i]):
+                strategy[s] = math.exp(alpha * (regret[s] - offset))
+                Z += strategy[s]
+        else:
+            shift = 0.0
+            if mode == PCFR_PLUS:
+                for s in range(begin[i], end[i]):
+                    shift += strategy[s] * prediction[s]
+            for s in range(begin[i], end[i]):
+                instant = utility[s] - ev
+                regret[s] += instant
+                if mode == DCFR:
+                    regret[s] *= positive if regret[s] > 0.0 else negative
+                elif (mode == RM_PLUS or mode == PCFR_PLUS) and \
+                        regret[s] < 0.0:
+                    regret[s] = 0.0
+                if mode == PCFR_PLUS:
+                    # the predicted instantaneous regret
+                    strategy[s] = max(
+                        regret[s] + instant + prediction[s] - shift, 0.0)
+                else:
+                    strategy[s] = max(regret[s], 0.0)
+                Z += strategy[s]
+            # infosets without positive regret play uniformly
+            if Z <= 0.0:
+                for s in range(begin[i], end[i]):
+                    strategy[s] = 1.0
+                Z = float(end[i] - begin[i])
+        for s in range(begin[i], end[i]):
+            strategy[s] /= Z
+
+        if mode == PCFR_PLUS:
+            predicted = 0.0
+            for s in range(begin[i], end[i]):
+                predicted += strategy[s] * (utility[s] + prediction[s])
+                prediction[s] = 0.0
+            prediction[parent[i]] += predicted - ev
+    utility[root] = root_utility
+    if mode == PCFR_PLUS:
+        prediction[root] = 0.0
@@ -0,0 +1,106 @@
+import numpy as np
+import scipy.sparse as sparse
+
+
+def _factor(M):
+    if sparse.issparse(M):
+        return M if sparse.isspmatrix_csr(M) or sparse.isspmatrix_csc(M) \
+            else M.tocsr()
+    return np.asarray(M)
+
+
+def _extremes(M):
+    # includes the implicit zeros of a sparse matrix, as its max()/min() do
+    return M.min(), M.max()
+
+
+class KroneckerPayoff:
+    """
+    A payoff matrix sum_k kron(H_k, L_k), after padding[0] leading rows and
+    padding[1] leading columns of zeros (the empty sequences). The sequences
+    are numbered factor-major: row padding[0] + i * m + a is row a of L_k
+    within row i of H_k, for L_k of m rows.
+
+    Poker games factor this way with H_k over pairs of private hands and L_k
+    over betting sequences. Only the factors are stored, and dot() computes
+    kron(H, L) vec(X) = vec(H X L') on the vector reshaped to a matrix X.
+    The operator stands in for the CSR payoff matrix of an
+    ExtensiveFormGame; tocsr() builds that matrix.
+    """
+
+    def __init__(self, terms, padding=(1, 1)):
+        self.terms = [(_factor(H), _factor(L)) for H, L in terms]
+        self.padding = tuple(padding)
+        H, L = self.terms[0]
+        self._shapes = H.shape, L.shape
+        assert all((H_k.shape, L_k.shape) == self._shapes
+                   for H_k, L_k in self.terms)
+        self.shape = (self.padding[0] + H.shape[0] * L.shape[0],
+                      self.padding[1] + H.shape[1] * L.shape[1])
+        self.dtype = np.result_type(*[M.dtype for term in self.terms
+                                      for M in term])
+
+    def dot(self, x, out=None):
+        """
+        A x for a vector x, written into out if given, or for a matrix x
+        column by column.
+        """
+        x = np.asarray(x)
+        if x.ndim == 2:
+            return np.stack([self.dot(column) for column in x.T], axis=1)
+        (m_H, n_H), (m_L, n_L) = self._shapes
+        X = x[self.padding[1]:].reshape(n_H, n_L)
+        if out is None:
+            out = np.empty(self.shape[0], np.result_type(self.dtype, x.dtype))
+        out[:self.padding[0]] = 0
+        Y = out[self.padding[0]:].reshape(m_H, m_L)
+        Y.fill(0)
+        for H, L in self.terms:
+            Y += H.dot(L.dot(X.T).T)
+        return out
+
+    def transpose(self):
+        return KroneckerPayoff([(H.T, L.T) for H, L in self.terms],
+                               self.padding[::-1])
+
+    @property
+    def T(self):
+        return self.transpose()
+
+    def tocsr(self):
+        products = [sparse.kron(H, L, format='coo') for H, L in self.terms]
+        return sparse.coo_matrix(
+            (np.concatenate([K.data for K in products]),
+             (np.concatenate([K.row for K in products]) + self.padding[0],
+              np.concatenate([K.col for K in products]) + self.padding[1])),
+            shape=self.shape).tocsr()
+
+    def max(self):
+        if not self._disjoint():
+            return self.tocsr().max()
+        return max(self._extreme_products())
+
+    def min(self):
+        if not self._disjoint():
+            return self.tocsr().min()
+        return min(self._extreme_products())
+
+    def _extreme_products(self):
+        # with disjoint terms every entry is a product from a single term,
+        # and the padding is 0
+        values = [0]
+        for H, L in self.terms:
+            values.extend(h * l for h in _extremes(H) for l in _extremes(L))
+        return values
+
+    def _disjoint(self):
+        """ Whether no two terms have L_k entries in the same place. """
+        n_L = self._shapes[1][1]
+        places = []
+        for _, L in self.terms:
+            L = sparse.coo_matrix(L)
+            nonzero = L.data != 0
+            places.append(L.row[nonzero].astype(np.int64) * n_L +
+                          L.col[nonzero])
+        places = np.concatenate(places)
+        return len(np.unique(places)) == len(places)
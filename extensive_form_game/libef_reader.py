@@ -1,43 +1,108 @@
+import os
 import sys
-from collections import defaultdict
 import numpy as np
 import scipy.sparse as sparse
-# import extensive_form_game as efg
 from .extensive_form_game import ExtensiveFormGame
-import capnp
+from . import game_cache
 
+SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      'game.capnp')
 
-def make_efg_from_file(filename, prox_infoset_weights=False, prox_scalar=-1):
+# words of traversal allowed per word of the file; a valid message is
+# traversed a few times at most by the passes below
+TRAVERSAL_FACTOR = 8
+
+
+def _load_schema():
+    # imported here so that the rest of the package works without pycapnp
+    import capnp
     capnp.remove_import_hook()
-    game_capnp = capnp.load("/Users/christiankroer/git-work/code/sequence-form-py/extensive_form_game/game.capnp", imports=["/usr/local/include"])
-    game_obj = game_capnp.Game.read(open(filename,"rb"), traversal_limit_in_words=2**64-1)
-    # check that the first line says that it's a zero-sum game
+    # game.capnp imports /capnp/c++.capnp, which is installed with capnp
+    imports = [
+        path for path in sys.path + ['/usr/local/include', '/usr/include']
+        if os.path.isdir(path)
+    ]
+    return capnp.load(SCHEMA, imports=imports)
+
+
+def _treeplex_arrays(treeplex):
+    infosets = treeplex.infosets
+    count = len(infosets)
+    first = np.fromiter((infoset.startSequenceId for infoset in infosets),
+                        dtype=np.int64, count=count)
+    end = np.fromiter((infoset.endSequenceId for infoset in infosets),
+                      dtype=np.int64, count=count)
+    end += 1
+    parent = np.fromiter((infoset.parentSequenceId for infoset in infosets),
+                         dtype=np.int64, count=count)
+    return first, end, parent
 
-    num_infosets_p1 = len(game_obj.treeplexes[0].infosets)
-    num_infosets_p2 = len(game_obj.treeplexes[1].infosets)
 
-    # print("Num infosets: ", num_infosets_p1, num_infosets_p2)
+def _payoff_arrays(payoff_matrix):
+    entries = payoff_matrix.entries
+    count = len(entries)
+    p1_ind = np.empty(count, dtype=np.int64)
+    p2_ind = np.empty(count, dtype=np.int64)
+    payoff_values = np.empty(count)
+    # one pass over the entries, each struct being read once
+    for i, entry in enumerate(entries):
+        sequences = entry.sequences
+        p1_ind[i] = sequences[0]
+        p2_ind[i] = sequences[1]
+        payoff_values[i] = entry.chanceFactor * entry.payoffs[1]
+    return p1_ind, p2_ind, payoff_values
 
-    # get p1 treeplex
-    first_p1 = list(map(lambda x: x.startSequenceId, game_obj.treeplexes[0].infosets))
-    first_p2 = list(map(lambda x: x.startSequenceId, game_obj.treeplexes[1].infosets))
-    end_p1 = list(map(lambda x: x.endSequenceId+1, game_obj.treeplexes[0].infosets))
-    end_p2 = list(map(lambda x: x.endSequenceId+1, game_obj.treeplexes[1].infosets))
-    parent_p1 = list(map(lambda x: x.parentSequenceId, game_obj.treeplexes[0].infosets))
-    parent_p2 = list(map(lambda x: x.parentSequenceId, game_obj.treeplexes[1].infosets))
 
-    num_sequences_p1 = max(parent_p1) + 1
-    num_sequences_p2 = max(parent_p2) + 1
+def read_game(filename, size=None, mtime_ns=None, prox_infoset_weights=False,
+              prox_scalar=-1):
+    """
+    Reads the .game file filename into an ExtensiveFormGame. size and
+    mtime_ns are unused; they key game_cache entries on the state of the
+    file.
+    """
+    game_capnp = _load_schema()
+    file_words = os.path.getsize(filename) // 8 + 1
+    with open(filename, 'rb') as game_file:
+        game_obj = game_capnp.Game.read(
+            game_file,
+            traversal_limit_in_words=TRAVERSAL_FACTOR * file_words)
 
-    # get payoff matrix
-    p1_ind = list(map(lambda x: x.sequences[0], game_obj.payoffMatrix.entries))
-    p2_ind = list(map(lambda x: x.sequences[1], game_obj.payoffMatrix.entries))
-    payoff_values = list(map(lambda x: x.chanceFactor * x.payoffs[1], game_obj.payoffMatrix.entries))
+        first_p1, end_p1, parent_p1 = _treeplex_arrays(
+            game_obj.treeplexes[0])
+        first_p2, end_p2, parent_p2 = _treeplex_arrays(
+            game_obj.treeplexes[1])
+        p1_ind, p2_ind, payoff_values = _payoff_arrays(game_obj.payoffMatrix)
 
+    # end is exclusive, and the last infoset holds the last sequences
+    num_sequences_p1 = np.max(end_p1)
+    num_sequences_p2 = np.max(end_p2)
+
+    # duplicate entries are summed
     A = sparse.csr_matrix((payoff_values, (p1_ind, p2_ind)),
-        shape=(num_sequences_p1, num_sequences_p2))
+                          shape=(num_sequences_p1, num_sequences_p2))
     return ExtensiveFormGame(
         "LIBEF EFG",
-        A, (first_p1, first_p2), (end_p1, end_p2), (parent_p1, parent_p2),
+        A, A, (first_p1, first_p2), (end_p1, end_p2), (parent_p1, parent_p2),
         prox_infoset_weights=prox_infoset_weights,
-        prox_scalar=prox_scalar)
+        prox_scalar=prox_scalar,
+        zero_sum=True)
+
+
+def make_efg_from_file(filename, prox_infoset_weights=False, prox_scalar=-1,
+                       cache_dir=None):
+    """
+    If cache_dir is given, the file is converted once into a game_cache
+    entry, keyed on its path, size and modification time, which later calls
+    memory-map instead of parsing the file again.
+    """
+    if cache_dir is not None:
+        filename = os.path.abspath(filename)
+        stat = os.stat(filename)
+        return game_cache.load(
+            read_game, cache_dir,
+            prox_infoset_weights=prox_infoset_weights,
+            prox_scalar=prox_scalar,
+            filename=filename, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+    return read_game(filename, prox_infoset_weights=prox_infoset_weights,
+                     prox_scalar=prox_scalar)
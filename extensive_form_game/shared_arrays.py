@@ -0,0 +1,50 @@
+"""
+Sharing dicts of arrays, such as ExtensiveFormGame.to_arrays(), between
+processes through multiprocessing.shared_memory, so that worker processes
+read a game built once by their parent instead of rebuilding it.
+"""
+from multiprocessing import shared_memory
+import numpy as np
+
+
+def share(arrays):
+    """
+    Copies every array of the dict arrays into its own shared memory block.
+    Returns the blocks, which the caller must close and unlink when done,
+    and a picklable spec that attach() opens in another process.
+    """
+    blocks = []
+    spec = {}
+    for key, array in arrays.items():
+        array = np.require(array, requirements='C')
+        # zero-size blocks are not allowed
+        block = shared_memory.SharedMemory(
+            create=True, size=max(array.nbytes, 1))
+        blocks.append(block)
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+        spec[key] = (block.name, array.dtype.str, array.shape)
+    return blocks, spec
+
+
+def attach(spec):
+    """
+    Opens the blocks described by a spec from share(). Returns the blocks,
+    which must stay open while the arrays are in use, and the dict of
+    read-only arrays backed by them.
+    """
+    blocks = []
+    arrays = {}
+    for key, (name, dtype, shape) in spec.items():
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        array = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        arrays[key] = array
+    return blocks, arrays
+
+
+def release(blocks, unlink=False):
+    for block in blocks:
+        block.close()
+        if unlink:
+            block.unlink()
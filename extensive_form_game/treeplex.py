@@ -1,12 +1,91 @@
 from __future__ import print_function
-import warnings
 import sys
-import math
-from collections import defaultdict
-from functools import partial
+import threading
+import weakref
+from collections import OrderedDict, namedtuple
 from six.moves import zip as izip
-from scipy.stats import entropy
+from scipy.special import entr
 import numpy as np
+from . import kernels
+
+
+# A group of information sets laid out for segmented NumPy reductions.
+#   infosets:         information set ids, sorted by parent sequence
+#   sequences:        the sequences of those infosets, concatenated
+#   offsets:          start of each infoset's segment in `sequences`
+#   segments:         for each entry of `sequences`, the position of its
+#                     infoset in `infosets`
+#   parents:          parent sequence of each infoset
+#   parent_sequences: distinct parent sequences, ascending
+#   parent_offsets:   start of each parent's run of infosets in `infosets`
+_Segments = namedtuple('_Segments', [
+    'infosets', 'sequences', 'offsets', 'segments', 'parents',
+    'parent_sequences', 'parent_offsets'
+])
+
+
+# The information sets below one group of top-level infosets (those whose
+# parent is the root sequence). Distinct subtrees share no sequences, so
+# their bottom-up traversals are independent except at the root.
+#   levels:   _Segments per depth level, bottom-up, as TreeplexDomain._levels
+#   infosets: _Segments of all the subtree's nonempty infosets
+#   order:    the subtree's nonempty infosets bottom-up, for the kernels
+_Subtree = namedtuple('_Subtree', ['levels', 'infosets', 'order'])
+
+
+# Preallocated scratch arrays for one _Segments group, so that traversals
+# given an out= array run without temporaries.
+#   values, expanded:      one entry per sequence of the group
+#   sums, scale, gathered: one entry per infoset of the group
+#   mask:                  boolean, one entry per infoset of the group
+_Buffers = namedtuple('_Buffers', [
+    'values', 'expanded', 'sums', 'scale', 'gathered', 'mask'
+])
+
+
+def _make_buffers(segments):
+    return _Buffers(
+        np.empty(len(segments.sequences)), np.empty(len(segments.sequences)),
+        np.empty(len(segments.infosets)), np.empty(len(segments.infosets)),
+        np.empty(len(segments.infosets)),
+        np.empty(len(segments.infosets), dtype=bool))
+
+
+def _gather(a, indices, out):
+    """
+    out[:] = a[indices]. With the default mode='raise', np.take buffers
+    out internally; the indices here are always in range, so 'clip' lets
+    it write into out directly.
+    """
+    return np.take(a, indices, out=out, mode='clip')
+
+
+def _index_array(values, dtype):
+    """
+    values (an array, a list, or an iterator such as a Python 3 map) as a
+    contiguous array of dtype.
+    """
+    if isinstance(values, np.ndarray) or hasattr(values, '__len__'):
+        return np.ascontiguousarray(values, dtype=dtype)
+    return np.fromiter(values, dtype=dtype)
+
+
+def _make_segments(infosets, begin, end, parent):
+    # NumPy converts gather and reduceat indices to intp on every call, so
+    # the traversal plans are kept as intp rather than in the compact dtype
+    dtype = np.intp
+    infosets = infosets[np.argsort(parent[infosets], kind='stable')].astype(
+        dtype)
+    sizes = end[infosets] - begin[infosets]
+    offsets = np.zeros(len(infosets), dtype=dtype)
+    np.cumsum(sizes[:-1], out=offsets[1:])
+    segments = np.repeat(np.arange(len(infosets), dtype=dtype), sizes)
+    sequences = begin[infosets][segments] + \
+        np.arange(len(segments), dtype=dtype) - offsets[segments]
+    parents = parent[infosets]
+    parent_sequences, parent_offsets = np.unique(parents, return_index=True)
+    return _Segments(infosets, sequences, offsets, segments, parents,
+                     parent_sequences, parent_offsets.astype(dtype))
 
 
 class TreeplexDomain:
@@ -17,22 +96,44 @@ class TreeplexDomain:
                  parent,
                  seq_to_str=None,
                  prox_infoset_weights=False,
-                 prox_scalar=1):
-        if seq_to_str is None:
-            seq_to_str = defaultdict()
-        self._forward_order = False
-        for i in range(0, len(begin)):
-            if parent[i] > begin[i]:
-                self._forward_order = True
-            assert parent[i] != begin[i]
-            assert begin[i] <= end[i]
-        if self._forward_order:
-            for i in range(0, len(begin)):
-                assert parent[i] > begin[i]
+                 prox_scalar=1,
+                 sequence_form_cache_size=8,
+                 backend='auto'):
+        """
+        begin, end and parent may be arrays, lists or iterators; they are
+        stored as contiguous int32 arrays (int64 for treeplexes with 2^31
+        or more sequences), from which the derived per-infoset and
+        per-sequence arrays are built.
+
+        seq_to_str is an optional table of sequence names, or a function
+        returning one, which is then only called on first use.
+
+        backend selects how the traversals run: 'numpy' for the vectorized
+        NumPy code, 'numba' for the compiled kernels in kernels.py, or
+        'auto' for 'numba' whenever Numba is installed.
+        """
+        self._sequence_form_cache = OrderedDict()
+        self._sequence_form_cache_size = sequence_form_cache_size
+        self._sequence_form_cache_lock = threading.Lock()
+        self._frozen = weakref.WeakValueDictionary()
+        dtype = np.int32 if dimension < 2**31 else np.int64
         self._dimension = dimension
-        self._begin = begin
-        self._end = end
-        self._parent = parent
+        self._begin = _index_array(begin, dtype)
+        self._end = _index_array(end, dtype)
+        self._parent = _index_array(parent, dtype)
+        assert np.all(self._parent != self._begin)
+        assert np.all(self._begin <= self._end)
+        self._forward_order = bool(np.any(self._parent > self._begin))
+        if self._forward_order:
+            assert np.all(self._parent > self._begin)
+        self._build_levels()
+        if backend == 'auto':
+            backend = 'numba' if kernels.available else 'numpy'
+        if backend == 'numba' and not kernels.available:
+            raise ImportError('the numba backend requires numba')
+        if backend not in ('numpy', 'numba'):
+            raise ValueError('unknown backend %s' % backend)
+        self.backend = backend
         if prox_scalar == -1:
             if prox_infoset_weights:
                 prox_weight_scalar = 2.0 / np.sqrt(len(begin))
@@ -45,15 +146,79 @@ class TreeplexDomain:
                 weight_scalar=prox_scalar))
         self._seq_to_str = seq_to_str
 
+    def _build_levels(self):
+        """
+        Groups the information sets by depth so that a traversal becomes one
+        segmented NumPy operation per level. Depth 0 holds the infosets
+        whose parent is the root sequence. self._levels is ordered bottom-up,
+        i.e. in the same order as infoset_traversal().
+        """
+        num_infosets = len(self._begin)
+        dtype = self._begin.dtype
+        self._sizes = self._end - self._begin
+        nonempty = self._sizes > 0
+        self._all_infosets = _make_segments(
+            np.flatnonzero(nonempty), self._begin, self._end, self._parent)
+        self._seq_to_infoset = np.full(self._dimension, -1, dtype=dtype)
+        self._seq_to_infoset[self._all_infosets.sequences] = \
+            self._all_infosets.infosets[self._all_infosets.segments]
+        self._infoset_parent = self._seq_to_infoset[self._parent]
+
+        # children adjacency in CSR form: the infosets whose parent is
+        # sequence s are _children[_children_indptr[s]:_children_indptr[s+1]]
+        self._children = np.argsort(self._parent, kind='stable').astype(dtype)
+        self._children_indptr = np.zeros(self._dimension + 1, dtype=dtype)
+        np.cumsum(np.bincount(self._parent, minlength=self._dimension),
+                  out=self._children_indptr[1:])
+
+        # pointer jumping: one vectorized step per level of the tree
+        self._depth = np.zeros(num_infosets, dtype=dtype)
+        ancestor = self._infoset_parent.copy()
+        while np.any(ancestor >= 0):
+            has_ancestor = ancestor >= 0
+            self._depth[has_ancestor] += 1
+            ancestor[has_ancestor] = self._infoset_parent[
+                ancestor[has_ancestor]]
+
+        self._levels = [
+            _make_segments(
+                np.flatnonzero(nonempty & (self._depth == depth)),
+                self._begin, self._end, self._parent)
+            for depth in range(np.max(self._depth, initial=-1), -1, -1)
+        ]
+        self._level_buffers = [_make_buffers(level) for level in self._levels]
+        self._all_buffers = _make_buffers(self._all_infosets)
+        self._all_sizes = self._sizes[self._all_infosets.infosets].astype(
+            float)
+        self._combine_buffer = np.empty(self._dimension)
+        # the nonempty infosets in bottom-up order, for the compiled kernels
+        self._kernel_order = np.concatenate(
+            [level.infosets for level in self._levels] +
+            [np.zeros(0, dtype=dtype)]).astype(dtype)
+
     def dimension(self):
         return self._dimension
 
-    def combine(self, y, alpha, x):
-        assert self.is_behavioral_form(x)
-        assert self.is_behavioral_form(y)
-        seq_y = self.sequence_form(y)
-        seq_x = self.sequence_form(x)
-        return self.behavioral_form((1.0 - alpha) * seq_y + alpha * seq_x)
+    """
+    Returns the behavioral form of the sequence-form mixture
+    (1 - alpha)*y + alpha*x. If out is given, the result is written into it
+    without allocating; out may be y itself.
+    """
+
+    def combine(self, y, alpha, x, out=None):
+        if out is None:
+            assert self.is_behavioral_form(x)
+            assert self.is_behavioral_form(y)
+            seq_y = self.sequence_form(y)
+            seq_x = self.sequence_form(x)
+            return self.behavioral_form((1.0 - alpha) * seq_y + alpha * seq_x)
+
+        seq_x = self.sequence_form(x, out=self._combine_buffer)
+        seq_y = self.sequence_form(y, out=out)
+        seq_y *= 1.0 - alpha
+        seq_x *= alpha
+        seq_y += seq_x
+        return self.behavioral_form(seq_y, out=out)
 
     def prox(self):
         return self._prox
@@ -63,10 +228,9 @@ class TreeplexDomain:
 
     def center(self):
         # set to 1/|A_I| for each infoset
+        segments = self._all_infosets
         center = np.ones(self._dimension)
-        for i in range(0, len(self._begin)):
-            infoset_size = self._end[i] - self._begin[i]
-            center[self._begin[i]:self._end[i]] /= infoset_size
+        center[segments.sequences] /= self._all_sizes[segments.segments]
         return center
 
     def sequence_form_center(self):
@@ -82,7 +246,7 @@ class TreeplexDomain:
         return self._parent[info_set]
 
     def information_set_num_sequences(self, info_set):
-        return self._end[info_set] - self._begin[info_set]
+        return self._sizes[info_set]
 
     def information_set_first_sequence(self, info_set):
         return self._begin[info_set]
@@ -90,68 +254,232 @@ class TreeplexDomain:
     def information_set_last_sequence(self, info_set):
         return self._end[info_set]
 
+    def sequence_children(self, sequence):
+        """ The information sets whose parent is sequence. """
+        return self._children[self._children_indptr[sequence]:
+                              self._children_indptr[sequence + 1]]
+
+    def seq_to_str(self):
+        """ The table of sequence names, loaded on first use. """
+        if callable(self._seq_to_str):
+            self._seq_to_str = self._seq_to_str()
+        if self._seq_to_str is None:
+            self._seq_to_str = {}
+        return self._seq_to_str
+
     """
     support function: argmax_{x\in\Delta} g'x
     Returns support vector in behavioral strategy form.
     """
 
     def support(self, g):
-        response = np.zeros(self._dimension)
-        response[self.root_sequence()] = 1
-        value = 0
-        for i in self.infoset_traversal():
-            begin = self._begin[i]
-            end = self._end[i]
-            parent = self._parent[i]
-            idx = np.argmax(g[begin:end])
-            response[begin + idx] = 1.0
-            if parent == self.root_sequence():
-                value += g[begin + idx]
-            else:
-                g[parent] += g[begin + idx]
-        return value, response
+        if self.backend == 'numba':
+            g = np.array(g, dtype=float)
+            response = np.zeros(self._dimension)
+            value = kernels.support(g, response, self._kernel_order,
+                                    self._begin, self._end, self._parent,
+                                    self.root_sequence())
+            return value, response
+        values, responses = self.support_many(g[np.newaxis, :])
+        return values[0], responses[0]
 
-    def infoset_regrets(self, g, x):
-        response = np.zeros(self._dimension)
-        response[self.root_sequence()] = 1
+    """
+    Batched support function: row k of G is a gradient g_k, and the k'th
+    value and behavioral response are those of support(g_k). G is not
+    modified.
+    """
 
-        what_we_got = g
-        what_we_could_have_gotten = g.copy()
+    def support_many(self, G):
+        # the level-wise NumPy traversal handles all rows at once, so it is
+        # used on either backend
+        G = np.array(G, dtype=float, ndmin=2)
+        rows = np.arange(G.shape[0])[:, np.newaxis]
+        root = self.root_sequence()
+        # root-level infosets add their value to the root column, which
+        # then holds the value of the response
+        G[:, root] = 0.0
+        responses = np.zeros(G.shape)
+        responses[:, root] = 1.0
+        for level in self._levels:
+            values = G[:, level.sequences]
+            best = np.maximum.reduceat(values, level.offsets, axis=1)
+            # position of the first maximizer of each segment, like np.argmax
+            positions = np.where(values == best[:, level.segments],
+                                 np.arange(len(level.sequences)),
+                                 len(level.sequences))
+            first = np.minimum.reduceat(positions, level.offsets, axis=1)
+            responses[rows, level.sequences[first]] = 1.0
+            G[:, level.parent_sequences] += np.add.reduceat(
+                best, level.parent_offsets, axis=1)
+        return G[:, root], responses
 
+    def infoset_regrets(self, g, x):
+        """
+        Returns the regret of every infoset for playing x against the
+        utilities g, compared to the best response at that infoset and
+        below, together with that best response. g is not modified.
+        """
+        what_we_got = np.array(g, dtype=float)
+        what_we_could_have_gotten = what_we_got.copy()
         regrets = np.zeros(len(self._begin))
-        for i in self.infoset_traversal():
-            begin = self._begin[i]
-            end = self._end[i]
-            parent = self._parent[i]
-            idx = np.argmax(what_we_could_have_gotten[begin:end])
-            response[begin + idx] = 1.0
-
-            ev_we_got = x[begin:end].dot(what_we_got[begin:end])
-            ev_we_could_have_gotten = what_we_could_have_gotten[begin + idx]
+        response = np.zeros(self._dimension)
+        response[self.root_sequence()] = 1
 
-            regrets[i] = ev_we_could_have_gotten - ev_we_got
-            if parent != self.root_sequence():
-                what_we_got[parent] += ev_we_got
-                what_we_could_have_gotten[parent] += ev_we_could_have_gotten
+        if self.backend == 'numba':
+            kernels.infoset_regrets(
+                what_we_got, what_we_could_have_gotten,
+                np.asarray(x, dtype=float), regrets, response,
+                self._kernel_order, self._begin, self._end, self._parent)
+            return regrets, response
+
+        # the root sequence accumulates values too, but is never read
+        for level in self._levels:
+            got = x[level.sequences] * what_we_got[level.sequences]
+            ev_we_got = np.add.reduceat(got, level.offsets)
+            could = what_we_could_have_gotten[level.sequences]
+            ev_we_could_have_gotten = np.maximum.reduceat(
+                could, level.offsets)
+            # position of the first maximizer of each segment, like np.argmax
+            positions = np.where(
+                could == ev_we_could_have_gotten[level.segments],
+                np.arange(len(level.sequences)), len(level.sequences))
+            first = np.minimum.reduceat(positions, level.offsets)
+            response[level.sequences[first]] = 1.0
+
+            regrets[level.infosets] = ev_we_could_have_gotten - ev_we_got
+            what_we_got[level.parent_sequences] += np.add.reduceat(
+                ev_we_got, level.parent_offsets)
+            what_we_could_have_gotten[level.parent_sequences] += \
+                np.add.reduceat(ev_we_could_have_gotten, level.parent_offsets)
         return regrets, response
 
-    def sequence_form(self, x):
-        seq = np.copy(x)
-        for i in self.reverse_infoset_traversal():
-            Z = np.sum(seq[self._begin[i]:self._end[i]])
-            if Z > 0.0:
-                seq[self._begin[i]:self._end[i]] *= seq[self._parent[i]] / Z
+    """
+    sequence_form and behavioral_form return a new array, or, if out is
+    given, write the result into out (which may be the input itself) using
+    the domain's preallocated scratch arrays. The out= variants are
+    therefore not safe to call concurrently on the same domain.
+
+    Strategies returned by freeze() (e.g. the averages returned by an
+    algorithm's profile()) can never change, so their sequence forms are
+    kept in a small LRU cache keyed by the array's identity. Any other
+    array, even a read-only one, may be made writeable again or share its
+    memory with something that is, so it is never cached. Cached sequence
+    forms are returned read-only.
+    """
+
+    def freeze(self, x):
+        """
+        Return a read-only copy of the strategy x that can never be made
+        writeable again, and whose sequence form may therefore be cached.
+        """
+        base = np.array(x, dtype=float)
+        base.setflags(write=False)
+        # a view of a read-only base cannot have its write flag set back
+        frozen = base.view()
+        frozen.setflags(write=False)
+        with self._sequence_form_cache_lock:
+            self._frozen[id(frozen)] = frozen
+        return frozen
+
+    def _is_frozen(self, x):
+        with self._sequence_form_cache_lock:
+            return self._frozen.get(id(x)) is x
+
+    def sequence_form(self, x, out=None):
+        if self._is_frozen(x):
+            seq = self._cached_sequence_form(x)
+            if out is None:
+                return seq
+            np.copyto(out, seq)
+            return out
+        return self._sequence_form(x, out)
+
+    def _cached_sequence_form(self, x):
+        key = id(x)
+        with self._sequence_form_cache_lock:
+            entry = self._sequence_form_cache.pop(key, None)
+            # the strategy is stored alongside, so its id cannot be reused
+            if entry is not None and entry[0] is x:
+                self._sequence_form_cache[key] = entry
+                return entry[1]
+
+        seq = self._sequence_form(x, None)
+        seq.setflags(write=False)
+        with self._sequence_form_cache_lock:
+            self._sequence_form_cache[key] = (x, seq)
+            while len(self._sequence_form_cache) > \
+                    self._sequence_form_cache_size:
+                self._sequence_form_cache.popitem(last=False)
         return seq
 
-    def behavioral_form(self, seq):
-        x = np.copy(seq)
-        for begin, end in zip(self._begin, self._end):
-            Z = np.sum(seq[begin:end])
-            if Z == 0:
-                x[begin:end] /= 1.0 / (end - begin)
-            else:
-                x[begin:end] /= Z
-        return x
+    def _sequence_form(self, x, out):
+        if self.backend == 'numba':
+            if out is None:
+                out = np.array(x, dtype=float)
+            elif out is not x:
+                np.copyto(out, x)
+            kernels.sequence_form(out, self._kernel_order, self._begin,
+                                  self._end, self._parent)
+            return out
+
+        if out is None:
+            seq = np.array(x, dtype=float)
+            for level in reversed(self._levels):
+                values = seq[level.sequences]
+                Z = np.add.reduceat(values, level.offsets)
+                scale = np.ones(len(Z))
+                np.divide(seq[level.parents], Z, out=scale, where=Z > 0.0)
+                seq[level.sequences] = values * scale[level.segments]
+            return seq
+
+        if out is not x:
+            np.copyto(out, x)
+        for level, buffers in izip(
+                reversed(self._levels), reversed(self._level_buffers)):
+            _gather(out, level.sequences, buffers.values)
+            np.add.reduceat(buffers.values, level.offsets, out=buffers.sums)
+            _gather(out, level.parents, buffers.gathered)
+            np.greater(buffers.sums, 0.0, out=buffers.mask)
+            buffers.scale.fill(1.0)
+            np.divide(buffers.gathered, buffers.sums, out=buffers.scale,
+                      where=buffers.mask)
+            _gather(buffers.scale, level.segments, buffers.expanded)
+            np.multiply(buffers.values, buffers.expanded, out=buffers.values)
+            np.put(out, level.sequences, buffers.values)
+        return out
+
+    def behavioral_form(self, seq, out=None):
+        if self.backend == 'numba':
+            if out is None:
+                out = np.array(seq, dtype=float)
+            elif out is not seq:
+                np.copyto(out, seq)
+            kernels.behavioral_form(out, self._kernel_order, self._begin,
+                                    self._end)
+            return out
+
+        segments = self._all_infosets
+        if out is None:
+            x = np.array(seq, dtype=float)
+            Z = np.add.reduceat(x[segments.sequences], segments.offsets)
+            # infosets with no mass are scaled by their size, as before
+            scale = self._all_sizes.copy()
+            np.divide(1.0, Z, out=scale, where=Z != 0)
+            x[segments.sequences] *= scale[segments.segments]
+            return x
+
+        if out is not seq:
+            np.copyto(out, seq)
+        buffers = self._all_buffers
+        _gather(out, segments.sequences, buffers.values)
+        np.add.reduceat(buffers.values, segments.offsets, out=buffers.sums)
+        np.not_equal(buffers.sums, 0.0, out=buffers.mask)
+        np.copyto(buffers.scale, self._all_sizes)
+        np.divide(1.0, buffers.sums, out=buffers.scale, where=buffers.mask)
+        _gather(buffers.scale, segments.segments, buffers.expanded)
+        np.multiply(buffers.values, buffers.expanded, out=buffers.values)
+        np.put(out, segments.sequences, buffers.values)
+        return out
 
     # For kroer17 this computes weights that ensure strong convexity
     # modulus 1. In particular, the recursive formulat gives strong
@@ -159,13 +487,13 @@ class TreeplexDomain:
     #
     # In order to get strong convexity modulus 1 we scale by M.
     def _weights(self, infoset_weights=False, weight_scalar=1.0):
-        if infoset_weights == 'kroer15':
-            seq_weights = np.full(self._dimension, 0, np.int)
-        elif infoset_weights == 'all_one':
-            return np.ones(len(self._begin), np.float)
-        else:
-            seq_weights = np.full(self._dimension, 0, np.int)
-        weights = np.zeros(len(self._begin), np.float)
+        if infoset_weights == 'all_one':
+            return np.ones(len(self._begin), float)
+        elif infoset_weights not in ('kroer15', 'kroer17'):
+            # uniform weights do not need the traversal below
+            return np.ones(len(self._begin)) * weight_scalar
+        seq_weights = np.full(self._dimension, 0, int)
+        weights = np.zeros(len(self._begin), float)
         l1_max = np.zeros(self._dimension)
         depth = np.zeros(self._dimension)
         l1_overall = 0
@@ -198,8 +526,6 @@ class TreeplexDomain:
             self._diameter = len(self._begin) * depth_overall * 2**(
                 depth_overall) * l1_overall * np.log(max_simplex_dim)
             return weights * weight_scalar * len(self._begin)
-        else:
-            return np.ones(len(self._begin)) * weight_scalar
 
     def print_sequence_form_constraints(self, f=sys.stdout):
         print(self.num_information_sets(), file=f)
@@ -216,12 +542,9 @@ class TreeplexDomain:
             np.savetxt(f, np.matrix(row), fmt="%i")
 
     def is_behavioral_form(self, x):
-        for i in self.infoset_traversal():
-            begin = self._begin[i]
-            end = self._end[i]
-            if abs(sum(x[begin:end]) - 1) > 1e-8:
-                return False
-        return True
+        segments = self._all_infosets
+        Z = np.add.reduceat(x[segments.sequences], segments.offsets)
+        return not np.any(np.abs(Z - 1) > 1e-8)
 
     def infoset_traversal(self):
         if self._forward_order:
@@ -233,6 +556,66 @@ class TreeplexDomain:
             return range(len(self._begin) - 1, -1, -1)
         return range(len(self._begin))
 
+    def _top_infosets(self):
+        """ The top-level ancestor of every infoset, by pointer jumping. """
+        top = np.arange(len(self._begin))
+        ancestor = self._infoset_parent.copy()
+        while np.any(ancestor >= 0):
+            has_ancestor = ancestor >= 0
+            top[has_ancestor] = ancestor[has_ancestor]
+            ancestor[has_ancestor] = self._infoset_parent[
+                ancestor[has_ancestor]]
+        return top
+
+    def sequence_roots(self):
+        """
+        The top-level infoset above each sequence, i.e. the subtree below
+        the root sequence that holds it, or -1 for the root sequence.
+        """
+        roots = np.full(self._dimension, -1, dtype=np.int64)
+        has_infoset = self._seq_to_infoset >= 0
+        roots[has_infoset] = self._top_infosets()[
+            self._seq_to_infoset[has_infoset]]
+        return roots
+
+    def subtrees(self, num_subtrees):
+        """
+        Partitions the nonempty information sets into at most num_subtrees
+        _Subtree groups, each holding whole subtrees below the root
+        sequence. Subtrees are assigned largest first to the group with
+        the fewest sequences so far, to balance the groups.
+        """
+        top = self._top_infosets()
+        nonempty = self._sizes > 0
+        weights = np.bincount(top[nonempty], weights=self._sizes[nonempty],
+                              minlength=len(self._begin))
+        roots = np.flatnonzero((self._depth == 0) & nonempty)
+        num_subtrees = max(1, min(num_subtrees, len(roots)))
+        group_of_root = np.zeros(len(self._begin), dtype=int)
+        loads = np.zeros(num_subtrees)
+        for i in roots[np.argsort(-weights[roots], kind='stable')]:
+            group = np.argmin(loads)
+            group_of_root[i] = group
+            loads[group] += weights[i]
+
+        group = group_of_root[top]
+        subtrees = []
+        for k in range(num_subtrees):
+            members = nonempty & (group == k)
+            levels = [
+                _make_segments(level.infosets[members[level.infosets]],
+                               self._begin, self._end, self._parent)
+                for level in self._levels
+                if np.any(members[level.infosets])
+            ]
+            order = self._kernel_order[members[self._kernel_order]]
+            subtrees.append(_Subtree(
+                levels,
+                _make_segments(np.flatnonzero(members), self._begin,
+                               self._end, self._parent),
+                order))
+        return subtrees
+
     def root_sequence(self):
         if self._forward_order:
             return self._dimension - 1
@@ -255,22 +638,28 @@ class TreeplexEntropyProx:
 
     def distance_generating_function(self, x):
         assert self._treeplex.is_behavioral_form(x)
+        root = self._treeplex.root_sequence()
+        segments = self._treeplex._all_infosets
+        simplex_dimension = self._treeplex._sizes[segments.infosets]
+
+        # weighted entropy term of every infoset, normalized like
+        # scipy.stats.entropy
+        values = x[segments.sequences]
+        Z = np.add.reduceat(values, segments.offsets)
+        neg_entropy = -np.add.reduceat(
+            entr(values / Z[segments.segments]), segments.offsets)
+        local = np.zeros(len(self._begin))
+        local[segments.infosets] = self._weights[segments.infosets] * (
+            neg_entropy + np.log(simplex_dimension))
+
+        # the root entry accumulates the values of the root-level infosets
         v_vec = np.zeros(self._dimension)
-        total = 0
-        for i in self._treeplex.infoset_traversal():
-            begin = self._begin[i]
-            end = self._end[i]
-            parent = self._parent[i]
-            simplex_dimension = end - begin
-            dgf_weight = self._weights[i]
-
-            v = dgf_weight * (-entropy(x[begin: end]) + np.log(simplex_dimension)) + \
-                np.dot(x[begin: end], v_vec[begin: end])
-            if parent != self._treeplex.root_sequence():
-                v_vec[parent] += v
-            else:
-                total += v
-        return total
+        for level in self._treeplex._levels:
+            v = local[level.infosets] + np.add.reduceat(
+                x[level.sequences] * v_vec[level.sequences], level.offsets)
+            v_vec[level.parent_sequences] += np.add.reduceat(
+                v, level.parent_offsets)
+        return v_vec[root]
 
     def bregman_divergence(self, x, x_center):
         assert self._treeplex.is_behavioral_form(x)
@@ -289,65 +678,65 @@ class TreeplexEntropyProx:
     """
     argmin_{x\in\Delta} alpha*g'x + beta*D(x, y)
 
+    if y is not set, then the prox center is used
     """
 
-    def __call__(self, alpha, g, beta, y):
+    def __call__(self, alpha, g, beta, y=None):
+        if y is None:
+            return self.smooth_br(alpha, g, beta)
         assert self._treeplex.is_behavioral_form(y)
         return self.smooth_br(1., alpha * g - self.gradient(y, beta), beta)
 
     # solves:
     # argmin_{x\in\Delta} alpha*g'x + beta*d(x)
+    #
+    # Each level is handled with segmented reductions: shift every infoset
+    # by its minimum, exponentiate, normalize, and pass the log-sum-exp
+    # value of the infoset up to its parent sequence. g is not modified.
     def smooth_br(self, alpha, g, beta):
+        root = self._treeplex.root_sequence()
         z = np.zeros(self._dimension)
-        z[self._treeplex.root_sequence()] = 1.0
-        g *= alpha
-        smoothed_br_value = g[self._treeplex.root_sequence()]
-        for i in self._treeplex.infoset_traversal():
-            begin = self._begin[i]
-            end = self._end[i]
-            parent = self._parent[i]
-            dgf_weight = beta * self._weights[i]
-
-            offset = np.min(g[begin:end])
-
-            z[begin:end] = np.exp(-(1.0 / dgf_weight) *
-                                  (g[begin:end] - offset))
-
-            Z = np.sum(z[begin:end])
-            z[begin:end] /= Z
-
-            best_idx = 0
-            best_z = 0
-            for idx in range(begin, end):
-                if z[idx] > best_z:
-                    best_idx = idx
-                    best_z = z[idx]
-            v = g[best_idx] + dgf_weight * (
-                np.log(best_z) + np.log(end - begin))
-
-            if parent != self._treeplex.root_sequence():
-                g[parent] += v
-            else:
-                smoothed_br_value += v
+        z[root] = 1.0
+        # the root entry accumulates the values of the root-level infosets
+        g = alpha * np.asarray(g, dtype=float)
+        if self._treeplex.backend == 'numba':
+            value = kernels.smooth_br(
+                g, z, self._treeplex._kernel_order, self._begin, self._end,
+                self._parent, self._weights, beta, root)
+            return value, z
+
+        for level in self._treeplex._levels:
+            values = g[level.sequences]
+            dgf_weight = beta * self._weights[level.infosets]
+            offset = np.minimum.reduceat(values, level.offsets)
+            exp = np.exp(-(1.0 / dgf_weight[level.segments]) *
+                         (values - offset[level.segments]))
+            Z = np.add.reduceat(exp, level.offsets)
+            z[level.sequences] = exp / Z[level.segments]
+
+            # the minimizer of g has the largest probability, exp(0) / Z
+            simplex_dimension = self._treeplex._sizes[level.infosets]
+            v = offset + dgf_weight * (
+                np.log(1.0 / Z) + np.log(simplex_dimension))
+            g[level.parent_sequences] += np.add.reduceat(
+                v, level.parent_offsets)
 
         assert self._treeplex.is_behavioral_form(z)
-        return smoothed_br_value, z
+        return g[root], z
 
     def gradient(self, strategy, mu=1.0):
-        gradient = np.zeros(self._dimension)
-        for i in self._treeplex.infoset_traversal():
-            begin = self._begin[i]
-            end = self._end[i]
-            parent = self._parent[i]
+        segments = self._treeplex._all_infosets
+        weights = mu * self._weights[segments.infosets]
+        simplex_dimension = self._treeplex._sizes[segments.infosets]
 
-            for idx in range(begin, end):
-                # catch log-of-zero warning and stop it from printing
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
-                    gradient[idx] += mu * self._weights[i] * (
-                        1.0 + np.log(strategy[idx]))
-
-            gradient[parent] -= mu * self._weights[i] * (
-                1.0 - np.log(end - begin))
+        gradient = np.zeros(self._dimension)
+        # log of zero is -inf; don't warn about it
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gradient[segments.sequences] = weights[segments.segments] * (
+                1.0 + np.log(strategy[segments.sequences]))
+
+        gradient[segments.parent_sequences] -= np.add.reduceat(
+            weights * (1.0 - np.log(simplex_dimension)),
+            segments.parent_offsets)
 
         return gradient
@@ -28,12 +28,27 @@ class MatrixGame:
     def profile_value_y(self, x, y):
         return np.dot(x, self.utility_for(0, y))
 
-    def utility_for(self, player, opponent_strategy):
+    def utility_for(self, player, opponent_strategy, out=None):
+        if out is not None:
+            if player == 0:
+                np.dot(self._A, opponent_strategy, out=out)
+                return np.negative(out, out=out)
+
+            assert player == 1
+            return np.dot(self._A.T, opponent_strategy, out=out)
+
         if player == 0:
             return -np.dot(self._A, opponent_strategy)
 
         assert player == 1
         return np.dot(self._A.T, opponent_strategy)
 
+    def utilities(self, x, y, out=None):
+        if out is None:
+            return self.utility_for(0, y), self.utility_for(1, x)
+        u_x = out[:self._A.shape[0]]
+        u_y = out[self._A.shape[0]:]
+        return self.utility_for(0, y, out=u_x), self.utility_for(1, x, out=u_y)
+
     def __str__(self):
         return 'MatrixGame(%s, %dx%d)' % (self._name, self._A.shape[0], self._A.shape[1])
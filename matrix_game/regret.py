@@ -83,6 +83,80 @@ class RegretMatchingPlus:
         return 'RegretMatching+'
 
 
+class DiscountedRegretMatching:
+    """
+    Regret matching with discounted regrets (DCFR): after iteration t,
+    positive regrets are multiplied by t^alpha / (t^alpha + 1) and negative
+    ones by t^beta / (t^beta + 1).
+    """
+    def __init__(self, dimension, alpha=1.5, beta=0.0):
+        self._dimension = dimension
+        self._alpha = alpha
+        self._beta = beta
+        self._iteration = 0
+        self.strategy = np.ones(dimension) / dimension
+        self.regret = np.zeros(dimension)
+
+    def __call__(self, utility):
+        value = np.dot(self.strategy, utility)
+
+        self.regret += utility
+        self.regret -= value
+
+        self._iteration += 1
+        positive, negative = discount_factors(self._iteration, self._alpha,
+                                              self._beta)
+        self.regret *= np.where(self.regret > 0, positive, negative)
+
+        np.maximum(self.regret, 0, out=self.strategy)
+
+        Z = np.sum(self.strategy)
+        if Z <= 0.0:
+            self.strategy.fill(1.0)
+            Z = self._dimension
+
+        self.strategy /= Z
+
+        return value
+
+    def __str__(self):
+        return 'DiscountedRegretMatching(%g, %g)' % (self._alpha, self._beta)
+
+
+class PredictiveRegretMatchingPlus:
+    """
+    Regret matching+ that plays as if the next instantaneous regret will
+    equal the last one: the strategy is proportional to the positive part
+    of the regret plus that prediction.
+    """
+    def __init__(self, dimension):
+        self._dimension = dimension
+        self.strategy = np.ones(dimension) / dimension
+        self.regret = np.zeros(dimension)
+
+    def __call__(self, utility):
+        value = np.dot(self.strategy, utility)
+
+        prediction = utility - value
+        self.regret += prediction
+        np.maximum(self.regret, 0, out=self.regret)
+
+        np.add(self.regret, prediction, out=self.strategy)
+        np.maximum(self.strategy, 0, out=self.strategy)
+
+        Z = np.sum(self.strategy)
+        if Z <= 0.0:
+            self.strategy.fill(1.0)
+            Z = self._dimension
+
+        self.strategy /= Z
+
+        return value
+
+    def __str__(self):
+        return 'PredictiveRegretMatching+'
+
+
 class ConicBlackwellPlus:
     def __init__(self, dimension):
         self._dimension = dimension
@@ -151,6 +225,15 @@ class ConicBlackwellPlus:
         return 'ConicBlackwell+'
 
 
+def discount_factors(iteration, alpha, beta):
+    """
+    The DCFR factors of positive and negative regrets after an iteration.
+    """
+    positive = iteration**alpha / (iteration**alpha + 1.0)
+    negative = iteration**beta / (iteration**beta + 1.0)
+    return positive, negative
+
+
 def regret_matching_bound(dimension, payoff, num_iterations):
     return payoff * np.sqrt(dimension * num_iterations)
 
@@ -175,6 +258,21 @@ def regret_matching_plus_initializer():
 
     return init
 
+
+def discounted_regret_matching_initializer(alpha=1.5, beta=0.0):
+    def init(domain):
+        return DiscountedRegretMatching(domain.dimension(), alpha, beta)
+
+    return init
+
+
+def predictive_regret_matching_plus_initializer():
+    def init(domain):
+        return PredictiveRegretMatchingPlus(domain.dimension())
+
+    return init
+
+
 def conic_blackwell_plus_initializer():
     def init(domain):
         return ConicBlackwellPlus(domain.dimension())
@@ -5,16 +5,41 @@ class SimplexDomain:
     def __init__(self, dimension):
         self._dimension = dimension
         self._prox      = SimplexEntropyProx(dimension)
+        self._combine_buffer = np.empty(dimension)
 
     def dimension(self):
         return self._dimension
 
-    def combine(self, y, alpha, x):
-        return (1.0 - alpha)*y + alpha*x
+    def combine(self, y, alpha, x, out=None):
+        if out is None:
+            return (1.0 - alpha)*y + alpha*x
+        # out may alias y, so x is scaled into a scratch array first
+        np.multiply(x, alpha, out=self._combine_buffer)
+        np.multiply(y, 1.0 - alpha, out=out)
+        out += self._combine_buffer
+        return out
 
     def prox(self):
         return self._prox
 
+    """
+    A simplex is a treeplex with a single information set, so sequence and
+    behavioral forms coincide.
+    """
+    def sequence_form(self, x, out=None):
+        if out is None:
+            return np.array(x, dtype=float)
+        np.copyto(out, x)
+        return out
+
+    def behavioral_form(self, seq, out=None):
+        return self.sequence_form(seq, out=out)
+
+    def freeze(self, x):
+        frozen = np.array(x, dtype=float)
+        frozen.setflags(write=False)
+        return frozen
+
     def center(self):
         return np.ones(self._dimension)/self._dimension
 
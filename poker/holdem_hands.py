@@ -1,173 +1,216 @@
-from itertools import combinations
+from itertools import combinations_with_replacement
+from math import comb
 import numpy as np
 
 
-PAIR           = 1000000
-TWO_PAIR       = 2000000
-SET            = 3000000
-STRAIGHT       = 4000000
-FLUSH          = 5000000
-FULL_HOUSE     = 6000000
-QUADS          = 7000000
-STRAIGHT_FLUSH = 8000000
-
-
-"""
-Expects hole_cards to be dimension 2x2.
-Returns 1 if player 1 wins, 0 if draw, -1 if player 2 wins.
-"""
-def compute_winner(hole_cards, board):
-    score_p1 = best_hand(hole_cards[0], board)
-    score_p2 = best_hand(hole_cards[1], board)
-    if score_p1 == score_p2:
-        return 0
-    elif score_p1 > score_p2:
-        return 1
-    else:
-        return -1
-
-
 """
-Expects hole_cards to be the hand for a single player, i.e. length 2.
-Returns 1 if player 1 wins, 0 if draw, -1 if player 2 wins.
+Cards are indexed 0..51 as 4 * (rank - 2) + suit, with ranks 2..14 (ace high)
+and suits 0..3. A score packs the hand category above bit 20 and up to five
+rank indices (0 for a deuce, 12 for an ace), most significant first, in the
+four-bit fields below it, so comparing scores compares hands.
 """
-def best_hand(hole_cards, board):
-    score = 0
-    for board_set in combinations(range(5), 3):
-        board_set = np.array(board_set)
-        hand  = [
-            np.append(hole_cards[0], board[0][board_set]),
-            np.append(hole_cards[1], board[1][board_set]),
-        ]
-        score = max(score, score_hand(hand))
+HIGH_CARD      = 0
+PAIR           = 1 << 20
+TWO_PAIR       = 2 << 20
+SET            = 3 << 20
+STRAIGHT       = 4 << 20
+FLUSH          = 5 << 20
+FULL_HOUSE     = 6 << 20
+QUADS          = 7 << 20
+STRAIGHT_FLUSH = 8 << 20
+
+MAX_CARDS = 7
+
+# (rank mask, high card) of every straight, best first; the last is the wheel
+_STRAIGHTS = [(0x1f << low, low + 4) for low in range(8, -1, -1)] + \
+    [(0x100f, 3)]
+
+# _BINOMIAL[n, k] = n choose k, for the perfect hash of rank multisets
+_BINOMIAL = np.array([[comb(n, k) for k in range(MAX_CARDS + 1)]
+                      for n in range(13 + MAX_CARDS - 1)], dtype=np.intp)
+
+# number of cards -> rank multiset table, built on first use
+_rank_tables = {}
+_flush_table = None
+
+
+def _score(category, ranks):
+    score = category
+    for idx, rank in enumerate(ranks):
+        score |= rank << (16 - 4 * idx)
     return score
 
 
-"""
-hand format: hand[0] is card values, hand[1] is suits
-"""
-def score_hand(hand):
-    h = sorted(hand[0])
-    if is_straight(h) and is_flush(hand):
-        return straight_flush_val(h)
-    elif is_quads(h):
-        return quads_val(h)
-    elif is_full_house(h):
-        return full_house_val(h)
-    elif is_flush(hand):
-        return flush_val(h)
-    elif is_straight(h):
-        return straight_val(h)
-    elif is_set(h):
-        return set_val(h)
-    elif is_two_pair(h):
-        return two_pair_val(h)
-    elif is_pair(h):
-        return pair_val(h)
-    else:
-        return high_card_val(h)
-
+def _straight_high(mask):
+    for straight, high in _STRAIGHTS:
+        if mask & straight == straight:
+            return high
+    return -1
 
-def is_quads(hand):
-    middle_equal = hand[1] == hand[2] and hand[2] == hand[3]
-    return middle_equal and (hand[0] == hand[1] or hand[4] == hand[1])
 
+"""
+Scores the best five cards that can be made from a multiset of ranks, given
+as counts per rank index, ignoring suits.
+"""
+def _rank_value(counts):
+    ranks = [rank for rank in range(12, -1, -1) if counts[rank]]
+    trips = [rank for rank in ranks if counts[rank] == 3]
+    pairs = [rank for rank in ranks if counts[rank] == 2]
+    quads = [rank for rank in ranks if counts[rank] >= 4]
+
+    if quads:
+        kickers = [rank for rank in ranks if rank != quads[0]]
+        return _score(QUADS, quads[:1] + kickers[:1])
+    if trips and len(trips) + len(pairs) >= 2:
+        return _score(FULL_HOUSE, [trips[0], max(trips[1:] + pairs)])
+    high = _straight_high(sum(1 << rank for rank in ranks))
+    if high >= 0:
+        return _score(STRAIGHT, [high])
+    if trips:
+        kickers = [rank for rank in ranks if rank != trips[0]]
+        return _score(SET, [trips[0]] + kickers[:2])
+    if len(pairs) >= 2:
+        kickers = [rank for rank in ranks if rank not in pairs[:2]]
+        return _score(TWO_PAIR, pairs[:2] + kickers[:1])
+    if pairs:
+        kickers = [rank for rank in ranks if rank != pairs[0]]
+        return _score(PAIR, pairs[:1] + kickers[:3])
+    return _score(HIGH_CARD, ranks[:5])
 
-def is_full_house(hand):
-    a1 = hand[0] == hand[1] and\
-         hand[1] == hand[2] and\
-         hand[3] == hand[4]
-
-    a2 = hand[0] == hand[1] and\
-         hand[2] == hand[3] and\
-         hand[3] == hand[4]
 
-    return(a1 or a2);
+"""
+Scores the cards of one suit, given as a mask of rank indices, when they make
+a flush. At most seven cards, a flush rules out quads and full houses, so the
+flush score is the score of the hand.
+"""
+def _flush_value(mask):
+    high = _straight_high(mask)
+    if high >= 0:
+        return _score(STRAIGHT_FLUSH, [high])
+    return _score(FLUSH, [rank for rank in range(12, -1, -1)
+                          if mask >> rank & 1][:5])
 
 
-def is_flush(hand):
-    return len(set(hand[1])) == 1
+"""
+The rank multiset of num_cards sorted ranks r_0 <= ... <= r_{n-1} is
+perfectly hashed to sum_i C(r_i + i, i + 1), its rank in the combinatorial
+number system, so the table has one entry per multiset.
+"""
+def _rank_table(num_cards):
+    table = _rank_tables.get(num_cards)
+    if table is None:
+        table = np.zeros(comb(12 + num_cards, num_cards), dtype=np.int32)
+        for ranks in combinations_with_replacement(range(13), num_cards):
+            counts = np.bincount(ranks, minlength=13)
+            index = sum(comb(rank + i, i + 1) for i, rank in enumerate(ranks))
+            table[index] = _rank_value(counts)
+        _rank_tables[num_cards] = table
+    return table
 
 
-def is_straight(hand):
-    return hand == range(hand[0], hand[4]+1) or \
-        hand[0] == 2 and hand[1] == 3 and hand[2] == 4 and hand[3] == 5 and hand[4] == 14
+"""
+Flush scores indexed by the 13-bit mask of ranks held in one suit; masks of
+fewer than five ranks score 0.
+"""
+def _flush_scores():
+    global _flush_table
+    if _flush_table is None:
+        _flush_table = np.zeros(1 << 13, dtype=np.int32)
+        for mask in range(1 << 13):
+            if bin(mask).count('1') >= 5:
+                _flush_table[mask] = _flush_value(mask)
+    return _flush_table
 
 
 """
-Assumes that we already checked for quads and full house.
+Converts ranks (2..14) and suits (0..3) to card indices.
 """
-def is_set(hand):
-    a1 = hand[0] == hand[1] and hand[1] == hand[2]
-    a2 = hand[1] == hand[2] and hand[2] == hand[3]
-    a3 = hand[2] == hand[3] and hand[3] == hand[4]
-    return a1 or a2 or a3
+def card_index(ranks, suits):
+    return 4 * (np.asarray(ranks) - 2) + np.asarray(suits)
 
 
 """
-Assumes that we already checked for sets, quads and full house.
+Scores hands of 5 to 7 cards. cards is an array of card indices whose last
+axis holds the cards of a hand; the result has the shape of the other axes.
+Each hand costs two table lookups: one for its rank multiset and one for the
+ranks held in each suit.
 """
-def is_two_pair(hand):
-    a1 = hand[0] == hand[1] and hand[2] == hand[3]
-    a2 = hand[0] == hand[1] and hand[3] == hand[4]
-    a3 = hand[1] == hand[2] and hand[3] == hand[4]
-    return a1 or a2 or a3
+def evaluate(cards):
+    cards = np.asarray(cards)
+    num_cards = cards.shape[-1]
+    assert 5 <= num_cards <= MAX_CARDS
+    ranks = cards >> 2
+    suits = cards & 3
+
+    positions = np.arange(num_cards)
+    index = _BINOMIAL[np.sort(ranks, axis=-1) + positions,
+                      positions + 1].sum(axis=-1)
+    score = _rank_table(num_cards)[index]
+
+    flush_table = _flush_scores()
+    bits = np.left_shift(1, ranks)
+    for suit in range(4):
+        mask = np.bitwise_or.reduce(np.where(suits == suit, bits, 0), axis=-1)
+        score = np.maximum(score, flush_table[mask])
+    return score
 
 
 """
-Assumes that we already checked for two pair, sets, quads and full house.
+Scores every hand of a range against one board in a single call. hands is an
+n x 2 array of card indices and board holds 3 to 5 card indices.
 """
-def is_pair(hand):
-    return hand[0] == hand[1] or hand[1] == hand[2] or \
-        hand[2] == hand[3] or hand[3] == hand[4]
+def evaluate_range(hands, board):
+    hands = np.asarray(hands)
+    board = np.broadcast_to(board, (len(hands), len(board)))
+    return evaluate(np.concatenate((hands, board), axis=1))
 
 
-def high_card_val(hand):
-    val = 0
-    for idx, card in enumerate(hand):
-        val += card * (14**idx)
-    return val
+"""
+Showdown outcomes of two ranges on a board: entry (i, j) is 1 if
+hands_p1[i] beats hands_p2[j], 0 for a draw and -1 otherwise. Pairs of hands
+sharing a card are not filtered out.
+"""
+def compare_ranges(hands_p1, hands_p2, board):
+    score_p1 = evaluate_range(hands_p1, board)
+    score_p2 = evaluate_range(hands_p2, board)
+    return np.sign(score_p1[:, None] - score_p2[None, :])
 
 
-def pair_val(hand):
-    for idx, card in enumerate(hand):
-        if hand[idx] == hand[idx+1]:
-            return PAIR + card * (14**3) + high_card_val(hand[0:idx] + hand[idx+2:len(hand)])
+"""
+Card removal between two ranges: entry (i, j) is True if hands_p1[i] and
+hands_p2[j] share a card.
+"""
+def blocked(hands_p1, hands_p2):
+    hands_p1 = np.asarray(hands_p1)
+    hands_p2 = np.asarray(hands_p2)
+    shared = hands_p1[:, None, :, None] == hands_p2[None, :, None, :]
+    return shared.any(axis=(2, 3))
 
 
-def two_pair_val(hand):
-    if hand[0] == hand[1] and hand[2] == hand[3]:
-        return 14**2 * hand[2] + 14 * hand[0] + hand[4] + TWO_PAIR
-    elif hand[0] == hand[1] and hand[3] == hand[4]:
-        return 14**2 * hand[3] + 14 * hand[0] + hand[2] + TWO_PAIR
+"""
+Expects hole_cards to be dimension 2x2.
+Returns 1 if player 1 wins, 0 if draw, -1 if player 2 wins.
+"""
+def compute_winner(hole_cards, board):
+    score_p1 = best_hand(hole_cards[0], board)
+    score_p2 = best_hand(hole_cards[1], board)
+    if score_p1 == score_p2:
+        return 0
+    elif score_p1 > score_p2:
+        return 1
     else:
-        return 14**2 * hand[3] + 14 * hand[2] + hand[0] + TWO_PAIR
-
-
-def set_val(hand):
-    return SET + hand[2]
-
-
-def flush_val(hand):
-    return FLUSH + high_card_val(hand)
-
-
-def straight_val(hand):
-    if hand[4] == 14 and hand[0] == 2: # ace is bottom of straight
-        return STRAIGHT + hand[3]
-    return STRAIGHT + hand[4]
-
-
-def full_house_val(hand):
-    return FULL_HOUSE + hand[2]
-
-
-def quads_val(hand):
-    return QUADS + hand[2]
+        return -1
 
 
-def straight_flush_val(hand):
-    return STRAIGHT_FLUSH + hand[4]
+"""
+Expects hole_cards to be the hand for a single player in the format
+[ranks, suits], and board to be [ranks, suits] of the board cards.
+Returns the score of the best five of the seven cards.
+"""
+def best_hand(hole_cards, board):
+    ranks = np.append(hole_cards[0], board[0])
+    suits = np.append(hole_cards[1], board[1])
+    return int(evaluate(card_index(ranks, suits)))
 
 
 def _test_hands():
@@ -213,7 +256,22 @@ def _test_hands():
     board = [np.array([11, 10, 7, 4, 5]), np.array([0, 2, 1, 0, 1])]
     assert compute_winner(hole_cards, board) == 0
 
-    # p1 high card, p2 high card
+    # both play A-J-10-7-5, the low hole cards do not count
     hole_cards = [[[14, 3], [0, 0]], [[14, 2], [1, 2]]]
     board = [np.array([11, 10, 7, 4, 5]), np.array([0, 2, 1, 0, 1])]
+    assert compute_winner(hole_cards, board) == 0
+
+    # p1 A-J-10-9-7, p2 A-J-10-8-7
+    hole_cards = [[[14, 9], [0, 0]], [[14, 8], [1, 2]]]
+    board = [np.array([11, 10, 7, 4, 2]), np.array([0, 2, 1, 0, 1])]
     assert compute_winner(hole_cards, board) == 1
+
+    # p1 9-high straight, p2 6-high straight
+    hole_cards = [[[9, 8], [0, 0]], [[3, 2], [1, 2]]]
+    board = [np.array([7, 6, 5, 4, 13]), np.array([0, 2, 1, 0, 1])]
+    assert compute_winner(hole_cards, board) == 1
+
+    # p1 wheel, p2 flush using the board
+    hole_cards = [[[14, 2], [0, 1]], [[13, 9], [3, 3]]]
+    board = [np.array([3, 4, 5, 11, 7]), np.array([3, 2, 3, 3, 1])]
+    assert compute_winner(hole_cards, board) == -1
@@ -1,9 +1,9 @@
 from itertools import chain
 from itertools import product
 import numpy as np
-from scipy.sparse import lil_matrix
 import matrix_game
 from extensive_form_game import extensive_form_game as efg
+from poker.matrix_assembly import entries_to_csr
 """
 create Kuhn matrix game
 """
@@ -78,14 +78,12 @@ def init_efg(num_ranks=3,
     parent_p2 = np.array(
         list(chain.from_iterable((0, 0) for i in range(0, num_ranks))))
 
-    if integer:
-        A_0 = lil_matrix(dimension, dtype=int)
-        A_1 = lil_matrix(dimension, dtype=int)
-    else:
-        A_0 = lil_matrix(dimension)
-        A_1 = lil_matrix(dimension)
-    reach = (lil_matrix((len(first_p1), dimension[1])), lil_matrix(
-        (len(first_p2), dimension[0])))
+    dtype = int if integer else float
+    A_0 = []
+    A_1 = []
+    reach = ([], [])
+    for c1 in range(0, num_ranks):
+        reach[0].append((c1 * 2, 0, 1.0 / num_ranks))
     for c1, c2 in product(range(0, num_ranks), repeat=2):
         if c1 == c2:
             continue
@@ -109,23 +107,28 @@ def init_efg(num_ranks=3,
         # utility negative if A_0 wins
 		# so A_0 wins means that value = -2*alpha
 		# winner means the value passed in should be positive
-        A_0[bet_p1, call_p2] = calc_utility(winner * 2, risk_alpha_0)
-        A_0[bet_p1, fold_p2] = calc_utility(-alpha, risk_alpha_0)
-        A_0[check_p1, check_p2] = calc_utility(winner * 1, risk_alpha_0)
-        A_0[call_p1, bet_p2] = calc_utility(winner * 2, risk_alpha_0)
-        A_0[fold_p1, bet_p2] = calc_utility(alpha, risk_alpha_0)
+        # every (c1, c2) deal writes its own entries
+        A_0.append((bet_p1, call_p2, calc_utility(winner * 2, risk_alpha_0)))
+        A_0.append((bet_p1, fold_p2, calc_utility(-alpha, risk_alpha_0)))
+        A_0.append((check_p1, check_p2, calc_utility(winner * 1, risk_alpha_0)))
+        A_0.append((call_p1, bet_p2, calc_utility(winner * 2, risk_alpha_0)))
+        A_0.append((fold_p1, bet_p2, calc_utility(alpha, risk_alpha_0)))
         
 		# A_0 wins means that it is +2 * alpha, so we pass in 0.66
-        A_1[bet_p1, call_p2] = calc_utility(-winner * 2, risk_alpha_1)
-        A_1[bet_p1, fold_p2] = calc_utility(alpha, risk_alpha_1)
-        A_1[check_p1, check_p2] = calc_utility(-winner * 1, risk_alpha_1)
-        A_1[call_p1, bet_p2] = calc_utility(-winner * 2, risk_alpha_1)
-        A_1[fold_p1, bet_p2] = calc_utility(-alpha, risk_alpha_1)
+        A_1.append((bet_p1, call_p2, calc_utility(-winner * 2, risk_alpha_1)))
+        A_1.append((bet_p1, fold_p2, calc_utility(alpha, risk_alpha_1)))
+        A_1.append((check_p1, check_p2, calc_utility(-winner * 1, risk_alpha_1)))
+        A_1.append((call_p1, bet_p2, calc_utility(-winner * 2, risk_alpha_1)))
+        A_1.append((fold_p1, bet_p2, calc_utility(-alpha, risk_alpha_1)))
+
+        reach[0].append((c1 * 2 + 1, bet_p2, alpha))
+        reach[1].append((c2 * 2, bet_p1, alpha))
+        reach[1].append((c2 * 2 + 1, check_p1, alpha))
 
-        reach[0][c1 * 2, 0] = 1.0 / num_ranks
-        reach[0][c1 * 2 + 1, bet_p2] = alpha
-        reach[1][c2 * 2, bet_p1] = alpha
-        reach[1][c2 * 2 + 1, check_p1] = alpha
+    A_0 = entries_to_csr(A_0, dimension, dtype)
+    A_1 = entries_to_csr(A_1, dimension, dtype)
+    reach = (entries_to_csr(reach[0], (len(first_p1), dimension[1])),
+             entries_to_csr(reach[1], (len(first_p2), dimension[0])))
 
     if all_negative:
         return efg.ExtensiveFormGame(
@@ -137,7 +140,7 @@ def init_efg(num_ranks=3,
             (parent_p1, parent_p2),
             prox_infoset_weights=prox_infoset_weights,
             prox_scalar=prox_scalar,
-            reach=(reach[0].tocsr(), reach[1].tocsr()),
+            reach=reach,
             all_negative=all_negative,
             offset=2 * offset * (num_ranks * (num_ranks - 1)), )
     else:
@@ -153,7 +156,7 @@ def init_efg(num_ranks=3,
             (parent_p1, parent_p2),
             prox_infoset_weights=prox_infoset_weights,
             prox_scalar=prox_scalar,
-            reach=(reach[0].tocsr(), reach[1].tocsr()),
+            reach=reach,
             all_negative=all_negative, )
 
 
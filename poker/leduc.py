@@ -3,7 +3,7 @@
 # 3: doing suits (the fast way)
 
 from extensive_form_game import extensive_form_game as efg
-from scipy.sparse import lil_matrix
+from poker.matrix_assembly import entries_to_csr
 
 
 def init_efg(num_ranks=3,
@@ -29,6 +29,8 @@ def init_efg(num_ranks=3,
     payoff = []
     reach = []
     next_s = [1, 1]
+    # chance outcome seen at each sequence: private rank and board card
+    chance = ([-1], [-1])
     # below only used for outputting a payoff-shifted constant-sum game when
     # all_negative is True
     payoff_shift = 0
@@ -103,6 +105,8 @@ def init_efg(num_ranks=3,
             begin[actor].append(next_s[actor])
             next_s[actor] += num_actions
             end[actor].append(next_s[actor])
+            chance[actor].extend([i * (num_ranks + 1) + board + 1] *
+                                 num_actions)
             for j in range(num_ranks):
                 # we can ignore reach -- this is meant to encode probabilities but we can do that in payoffs directly
                 reach.append((actor, info_set + i, previous_seq[opponent][j],
@@ -153,27 +157,20 @@ def init_efg(num_ranks=3,
     # rnd, board, actor, num_bets, pot, previous_seq -- _build is recursive
     _build(0, -1, 0, 0, [1, 1], previous_seq)
 
-    if integer:
-        payoff_matrix = lil_matrix((next_s[0], next_s[1]), dtype=int)
-    else:
-        payoff_matrix = lil_matrix((next_s[0], next_s[1]))
-    for i, j, payoff_value in payoff:
-        payoff_matrix[i, j] += payoff_value
-    reach_matrix = (lil_matrix((len(begin[0]), next_s[1])), lil_matrix(
-        (len(begin[1]), next_s[0])))
-    for player, infoset, opponent_seq, prob in reach:
-        reach_matrix[player][infoset, opponent_seq] += prob
+    dtype = int if integer else float
+    payoff_matrix = entries_to_csr(payoff, (next_s[0], next_s[1]), dtype)
+    reach_matrix = tuple(
+        entries_to_csr([entry[1:] for entry in reach if entry[0] == player],
+                       (len(begin[player]), next_s[1 - player]))
+        for player in range(2))
 
     if all_negative:
-        if integer:
-            payoff_p1_matrix = lil_matrix((next_s[0], next_s[1]), dtype=int)
-        else:
-            payoff_p1_matrix = lil_matrix((next_s[0], next_s[1]))
-        for i, j, payoff_value in payoff_p1:
-            payoff_p1_matrix[i, j] += payoff_value
+        payoff_p1_matrix = entries_to_csr(payoff_p1, (next_s[0], next_s[1]),
+                                          dtype)
         return efg.ExtensiveFormGame(
             'Leduc-%d' % num_ranks,
             payoff_matrix,
+            payoff_matrix,
             begin,
             end,
             parent,
@@ -181,6 +178,8 @@ def init_efg(num_ranks=3,
             prox_scalar=prox_scalar,
             reach=reach_matrix,
             B=payoff_p1_matrix,
+            zero_sum=True,
+            chance=chance,
             offset=2 * payoff_shift * (deck_size * (deck_size - 1) *
                                        (deck_size - 2)))
     else:
@@ -193,4 +192,6 @@ def init_efg(num_ranks=3,
             parent,
             prox_infoset_weights=prox_infoset_weights,
             prox_scalar=prox_scalar,
-            reach=reach_matrix)
+            reach=reach_matrix,
+            zero_sum=True,
+            chance=chance)
@@ -0,0 +1,28 @@
+"""
+Sparse matrix assembly for the game generators: entries are collected as
+index/value arrays and turned into a CSR matrix with one COO->CSR
+conversion, which sums duplicate entries.
+"""
+import numpy as np
+from scipy.sparse import coo_matrix
+
+
+def coo_to_csr(rows, cols, values, shape, dtype=float):
+    """
+    The CSR matrix of the given shape whose (rows[k], cols[k]) entry is the
+    sum of the values[k] at that position.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    values = np.asarray(values, dtype=dtype)
+    return coo_matrix((values, (rows, cols)), shape=shape).tocsr()
+
+
+def entries_to_csr(entries, shape, dtype=float):
+    """
+    coo_to_csr of a list of (row, column, value) tuples.
+    """
+    if len(entries) == 0:
+        return coo_to_csr([], [], [], shape, dtype)
+    rows, cols, values = zip(*entries)
+    return coo_to_csr(rows, cols, values, shape, dtype)
@@ -1,11 +1,11 @@
-from itertools import chain
-from itertools import product
+from itertools import combinations
 import numpy as np
-from scipy.sparse import csr_matrix
+from poker.matrix_assembly import coo_to_csr
 from extensive_form_game import extensive_form_game as efg
-from .holdem_hands import compute_winner
+from extensive_form_game.kronecker import KroneckerPayoff
+from .holdem_hands import blocked, card_index, compare_ranges
 
-def init_efg_big(prox_infoset_weights=False, prox_scalar=1):
+def init_efg_big(prox_infoset_weights=False, prox_scalar=1, kronecker=False):
     return init_efg(pot_size=100,
                     stacks=[100, 100],
                     hands=[
@@ -22,7 +22,8 @@ def init_efg_big(prox_infoset_weights=False, prox_scalar=1):
                     pot_fractions=[0.33, 0.5, 0.66, 1],
                     board=np.array([[2, 7, 4, 5, 6], [2, 3, 0, 0, 1]]),
                     prox_infoset_weights=prox_infoset_weights,
-                    prox_scalar=prox_scalar)
+                    prox_scalar=prox_scalar,
+                    kronecker=kronecker)
 """
 hands should be a length 2 array with the range for each player in the format
 hands[player][0][i] = i'th hand (e.g. [14, 14]),
@@ -35,6 +36,9 @@ pot_fractions is the set of raise sizes as a percentage of current pot size.
 
 cutoff is used in order to ignore fractions of pot size that are above cutoff * all-in
 
+With kronecker=True the payoff matrix is kept as a KroneckerPayoff of the
+factors from payoff_factors instead of being built as a CSR matrix.
+
 The default values create a Kuhn game, since the board is irrelevant and the
 ranges are AA, KK, QQ.
 """
@@ -53,52 +57,136 @@ def init_efg(pot_size=2,
              min_raise=1,
              pot_fractions=[0.33, 0.5, 0.66, 1],
              board=np.array([[2, 7, 4, 5, 6], [2, 3, 0, 0, 1]]),
-             prox_infoset_weights=False, prox_scalar=1):
-    game_creator = GameState(pot_size, stacks, hands, board, min_raise,
-                             pot_fractions)
-    A = _dict_to_csr(game_creator.payoff)
-
-    def make_numpy_array(d):
-        a = np.zeros(len(d), int)
-        for key, val in d.iteritems():
-            a[key] = val
-        return a
-
-    first_p1 = make_numpy_array(game_creator.first[0])
-    end_p1 = make_numpy_array(game_creator.end[0])
-    parent_p1 = make_numpy_array(game_creator.parent[0])
-
-    first_p2 = make_numpy_array(game_creator.first[1])
-    end_p2 = make_numpy_array(game_creator.end[1])
-    parent_p2 = make_numpy_array(game_creator.parent[1])
-
-    return efg.ExtensiveFormGame("River %s EFG" % hands, A, (first_p1, first_p2),
-                             (end_p1, end_p2), (parent_p1, parent_p2), game_creator.seq_to_str,
-                             prox_infoset_weights=prox_infoset_weights,
-                             prox_scalar=prox_scalar)
-
-class GameState:
-    def __init__(self, pot_size, stacks, hands, board, min_raise, pot_fractions):
+             prox_infoset_weights=False, prox_scalar=1, kronecker=False):
+    tree = BettingTree(pot_size, list(stacks), min_raise, pot_fractions)
+    ranges = (_range_cards(hands[0]), _range_cards(hands[1]))
+    board_cards = card_index(board[0], board[1])
+    A = KroneckerPayoff(
+        payoff_factors(tree, ranges[0], ranges[1], board_cards))
+    if not kronecker:
+        A = A.tocsr()
+
+    first, end, parent = zip(*(
+        tree.treeplex(player, len(ranges[player])) for player in range(2)))
+
+    def seq_to_str(player):
+        return lambda: tree.sequence_names(player, _hand_names(hands[player]))
+
+    return efg.ExtensiveFormGame("River %s EFG" % hands, A, A, first, end,
+                                 parent, (seq_to_str(0), seq_to_str(1)),
+                                 prox_infoset_weights=prox_infoset_weights,
+                                 prox_scalar=prox_scalar, zero_sum=True)
+
+
+"""
+Every two-card hand that does not use a board card, in the hands[player]
+format of init_efg.
+"""
+def full_range(board):
+    used = set(card_index(board[0], board[1]).tolist())
+    cards = [card for card in range(52) if card not in used]
+    pairs = np.array(list(combinations(cards, 2)))
+    return [(pairs // 4 + 2).tolist(), (pairs % 4).tolist()]
+
+
+"""
+The payoff matrix of a river game without its empty sequences, as the terms
+(H, L) of sum_k kron(H_k, L_k) for a KroneckerPayoff. Sequences are numbered hand-major: the
+sequence of betting sequence a with hand h is h * S + a, for S betting
+sequences. H_k is the dense hand-pair matrix, the probability of dealing
+each pair of hands times its showdown outcome for showdown leaves, and L_k
+the sparse betting matrix of the fold or showdown leaves.
+"""
+def payoff_factors(tree, hands_p1, hands_p2, board):
+    not_blocked = ~blocked(hands_p1, hands_p2)
+    opponents = not_blocked.sum(axis=1, keepdims=True)
+    prob = np.divide(not_blocked, len(hands_p1) * opponents,
+                     out=np.zeros(not_blocked.shape), where=opponents > 0)
+    showdown = compare_ranges(hands_p1, hands_p2, board)
+    fold_leaves, showdown_leaves = tree.leaf_matrices()
+    return [(prob, fold_leaves), (prob * showdown, showdown_leaves)]
+
+
+def _range_cards(hands):
+    return card_index(np.asarray(hands[0]).reshape(-1, 2),
+                      np.asarray(hands[1]).reshape(-1, 2))
+
+
+def _hand_names(hands):
+    return [str([ranks, suits]) for ranks, suits in zip(hands[0], hands[1])]
+
+
+"""
+The betting of a river game, which is the same for every deal. Each
+player's infosets and sequences are numbered from 0 in the order a
+depth-first traversal of the betting first meets them, with parent -1 for
+the player's first infosets, and every leaf is recorded once with its
+amount and the player who folded, if any.
+"""
+class BettingTree:
+    def __init__(self, pot_size, stacks, min_raise, pot_fractions):
         self.pot_size      = pot_size
         self.initial_pot   = pot_size
         self.stacks        = stacks
-        self.hands         = hands
-        self.board         = board
         self.min_raise     = min_raise
         self.pot_fractions = pot_fractions
         self.raise_allowed = True
         self.player        = 0
         self.actions       = []
         self.infosets      = [{}, {}]
-        self.payoff        = {}
-        self.num_sequences = [1, 1]
-        self.history       = []
+        self.num_sequences = [0, 0]
         self.seq_to_str    = [{}, {}]
 
         self.first  = [{}, {}]
-        self.end   = [{}, {}]
+        self.end    = [{}, {}]
         self.parent = [{}, {}]
-        self.traverse_hands()
+        self.leaves = ([], [])
+        self.leaf_amount = []
+        self.leaf_folder = []
+        self.previous_sequence_id = [-1, -1]
+        self.traverse_betting(-1, -1, last_raise=0)
+
+    def treeplex(self, player, num_hands):
+        """
+        first, end and parent of the player's infosets with num_hands
+        hands: the betting infosets repeated per hand, hand-major, after
+        the empty sequence 0.
+        """
+        offsets = 1 + self.num_sequences[player] * np.arange(num_hands)
+        offsets = offsets[:, None]
+        # infosets are added to the dicts in the order they are numbered
+        first = np.fromiter(self.first[player].values(), dtype=int)
+        end = np.fromiter(self.end[player].values(), dtype=int)
+        parent = np.fromiter(self.parent[player].values(), dtype=int)
+        parent = np.where(parent < 0, 0, offsets + parent)
+        return (offsets + first).ravel(), (offsets + end).ravel(), \
+            parent.ravel()
+
+    def sequence_names(self, player, hand_names):
+        num_sequences = self.num_sequences[player]
+        return {
+            1 + hand * num_sequences + seq: name + '/' + action
+            for hand, name in enumerate(hand_names)
+            for seq, action in self.seq_to_str[player].items()
+        }
+
+    def leaf_matrices(self):
+        """
+        The fold and showdown leaves as betting-sequence matrices. A fold
+        pays the other player; a showdown pays the player the hand-pair
+        matrix picks. Player 1 is minimizing.
+        """
+        shape = tuple(self.num_sequences)
+        seq1, seq2 = np.array(self.leaves[0]), np.array(self.leaves[1])
+        amount = np.array(self.leaf_amount, dtype=float)
+        folder = np.array(self.leaf_folder)
+        fold = folder >= 0
+        fold_leaves = coo_to_csr(seq1[fold], seq2[fold],
+                                 np.where(folder[fold] == 0, 1, -1) *
+                                 amount[fold], shape)
+        showdown_leaves = coo_to_csr(seq1[~fold], seq2[~fold],
+                                     -amount[~fold], shape)
+        return fold_leaves, showdown_leaves
 
     def infoset(self, previous_seq, last_raise):
         if self.sequence(self.player) not in self.infosets[self.player]:
@@ -145,41 +233,10 @@ class GameState:
         # if self.actions[-1] == 'f':
         #     raises_won -= self.last_raise
         # amount += raises_won / 2  # the player made half the raises themself
-        amount = self.pot_size / 2.0
-        return self.prob * amount
+        return self.pot_size / 2.0
 
     def sequence(self, player):
-        return '{hand}/{seq}'.format(
-            hand=self.hand[player],
-            seq='/'.join(self.actions),
-        )
-
-    def game_history(self):
-        return '{hand1}/{hand2}/{seq}'.format(
-            hand1=self.hand[0],
-            hand2=self.hand[1],
-            seq='/'.join(self.actions),
-        )
-
-    def blocking(self, p1_idx, p2_idx):
-        return (self.hands[0][0][p1_idx][0] == self.hands[1][0][p2_idx][0] and
-                self.hands[0][1][p1_idx][0] == self.hands[1][1][p2_idx][0]) or \
-                (self.hands[0][0][p1_idx][1] == self.hands[1][0][p2_idx][1] and
-                 self.hands[0][1][p1_idx][1] == self.hands[1][1][p2_idx][1])
-
-    def traverse_hands(self):
-        for idx1 in range(len(self.hands[0][0])):
-            non_blocking = filter(lambda idx2: not self.blocking(idx1, idx2),
-                                  range(len(self.hands[1][0])))
-            self.prob = 1.0 / (len(self.hands[0][0]) * len(non_blocking))
-            for idx2 in non_blocking:
-                self.hand = [
-                    [self.hands[0][0][idx1], self.hands[0][1][idx1]],
-                    [self.hands[1][0][idx2], self.hands[1][1][idx2]],
-                ]
-                self.previous_sequence_id = [-1, -1]
-                self.showdown_winner = compute_winner(self.hand, self.board)
-                self.traverse_betting(-1, -1, last_raise=0)
+        return '/'.join(self.actions)
 
     def traverse_betting(self, parent_seq1, parent_seq2, last_raise):
         min_stack = min(self.stacks[0], self.stacks[1])
@@ -252,15 +309,10 @@ class GameState:
     def handle_leaf(self, seq1, seq2):
         assert seq1 >= 0
         assert seq2 >= 0
-        if self.showdown_winner == 1 or (len(self.actions) % 2 == 0 and self.actions[-1] == 'f'):
-            self.payoff[seq1, seq2] = -self.amount_won() #  p1 is minimizing
-        elif self.showdown_winner == -1 or (len(self.actions) % 2 == 1 and self.actions[-1] == 'f'):
-            self.payoff[seq1, seq2] = self.amount_won()
-
-
-def _dict_to_csr(term_dict):
-    term_dict_v = list(term_dict.itervalues())
-    term_dict_k = list(term_dict.iterkeys())
-    shape = list(np.repeat(np.asarray(term_dict_k).max() + 1, 2))
-    csr = csr_matrix((term_dict_v, zip(*term_dict_k)), shape=shape)
-    return csr
+        self.leaves[0].append(seq1)
+        self.leaves[1].append(seq2)
+        self.leaf_amount.append(self.amount_won())
+        if self.actions[-1] == 'f':
+            self.leaf_folder.append((len(self.actions) - 1) % 2)
+        else:
+            self.leaf_folder.append(-1)
@@ -3,7 +3,8 @@
 # 3: doing suits (the fast way)
 
 from extensive_form_game import extensive_form_game as efg
-from scipy.sparse import lil_matrix
+import numpy as np
+from poker.matrix_assembly import coo_to_csr, entries_to_csr
 import json
 import pickle
 
@@ -36,6 +37,8 @@ def init_efg(num_ranks=3,
 	payoff = []
 	reach = []
 	next_s = [1, 1]
+	# chance outcome seen at each sequence: private card and board cards
+	chance_labels = ([-1], [-1])
 	# below only used for outputting a payoff-shifted constant-sum game when
 	# all_negative is True
 	payoff_shift = 0
@@ -205,6 +208,14 @@ def init_efg(num_ranks=3,
 			begin[actor].append(next_s[actor])
 			next_s[actor] += num_actions
 			end[actor].append(next_s[actor])
+			# the board cards are digits base deck_size + 1 (0 for a card
+			# not dealt yet), above the private card
+			board_label = 0
+			for card in reversed(board):
+				board_id = 0 if card == -1 else get_card_id(card) + 1
+				board_label = board_label * (deck_size + 1) + board_id
+			chance_labels[actor].extend(
+				[i + deck_size * board_label] * num_actions)
 
 			
 			
@@ -321,24 +332,19 @@ def init_efg(num_ranks=3,
 	# we construct it so that it is positive for each player for them winning
 	# and flip them at the end
 	def utility_payoff(change, alpha, initial = 100):
-		if abs(change) > initial:
-			assert(1==0)
+		assert np.all(np.abs(change) <= initial)
 		return ((initial + change)**alpha)/alpha - (initial**alpha)/alpha
 	alpha = [1/3,1/3]
 
-	if integer:
-		payoff_matrix[0] = lil_matrix((next_s[0], next_s[1]), dtype=int)
-		payoff_matrix[1] = lil_matrix((next_s[0], next_s[1]), dtype=int)
-	else:
-		payoff_matrix[0] = lil_matrix((next_s[0], next_s[1]))
-		payoff_matrix[1] = lil_matrix((next_s[0], next_s[1]))
+	dtype = int if integer else float
 	#payoff value is negative for p1 winning, p2 for p2 winning by default
-	for i, j, chance, payoff_value in payoff:
-		payoff_matrix[0][i, j] += -1 * chance * utility_payoff(-payoff_value,alpha[0])
-		payoff_matrix[1][i, j] += chance * utility_payoff(payoff_value, alpha[1])
-		diff = payoff_matrix[1][i,j] - payoff_matrix[0][i,j]
-		# if diff:
-		# 	print(diff)
+	rows, cols, chance, payoff_value = (np.array(column) for column in zip(*payoff))
+	payoff_matrix[0] = coo_to_csr(
+		rows, cols, -1 * chance * utility_payoff(-payoff_value, alpha[0]),
+		(next_s[0], next_s[1]), dtype)
+	payoff_matrix[1] = coo_to_csr(
+		rows, cols, chance * utility_payoff(payoff_value, alpha[1]),
+		(next_s[0], next_s[1]), dtype)
 	#sign adjust p0 back
 	# payoff_matrix[0] = payoff_matrix[0] * -1
 	# #unused
@@ -350,12 +356,7 @@ def init_efg(num_ranks=3,
 	print("Passing into Algorithm")
 
 	if all_negative:
-		if integer:
-			payoff_p1_matrix = lil_matrix((next_s[0], next_s[1]), dtype=int)
-		else:
-			payoff_p1_matrix = lil_matrix((next_s[0], next_s[1]))
-		for i, j, payoff_value in payoff_p1:
-			payoff_p1_matrix[i, j] += payoff_value
+		payoff_p1_matrix = entries_to_csr(payoff_p1, (next_s[0], next_s[1]), dtype)
 		return efg.ExtensiveFormGame(
 			'RI-%d' % num_ranks,
 			payoff_matrix[0],
@@ -367,6 +368,7 @@ def init_efg(num_ranks=3,
 			prox_scalar=prox_scalar,
 			reach=None, # changed because unused
 			B=payoff_p1_matrix,
+			chance=chance_labels,
 			offset=2 * payoff_shift * (deck_size * (deck_size - 1) *
 									   (deck_size - 2)))
 	else:
@@ -379,4 +381,5 @@ def init_efg(num_ranks=3,
 			parent,
 			prox_infoset_weights=prox_infoset_weights,
 			prox_scalar=prox_scalar,
-			reach=None) # changed because unused
+			reach=None, # changed because unused
+			chance=chance_labels)
@@ -9,7 +9,8 @@ import numpy as np
 import csv
 
 from extensive_form_game import blsp_reader
-from extensive_form_game import libef_reader # this line can be commented in in order to get the libgg reader
+from extensive_form_game import cfr
+from extensive_form_game import libef_reader
 from poker import kuhn
 from poker import leduc
 from poker import nlhe_river
@@ -33,25 +34,41 @@ algs = {
     'MP': lambda args: mp.mirror_prox_init(
         aggressive_stepsizes=args.aggressive_stepsizes),
     'HEDGE': lambda args: eqm_regret.regret_minimization_initializer(
-        matrix_regret.hedge_initializer(
-            1.0 / math.sqrt(num_iterations))),
+        cfr.flat_regret_minimizer_initializer(
+            'hedge', alpha=1.0 / math.sqrt(num_iterations),
+            threads=args.threads),
+        workspace=args.workspace, parallel=args.parallel),
     'RM': lambda args: eqm_regret.regret_minimization_initializer(
-        matrix_regret.regret_matching_initializer()),
+        cfr.flat_regret_minimizer_initializer('rm', threads=args.threads),
+        workspace=args.workspace, parallel=args.parallel),
     'RM+': lambda args: eqm_regret.regret_minimization_initializer(
-        matrix_regret.regret_matching_plus_initializer(),
-        alternate=False, linear_averaging=False),
+        cfr.flat_regret_minimizer_initializer('rm+', threads=args.threads),
+        alternate=False, linear_averaging=False, workspace=args.workspace,
+        parallel=args.parallel),
     'CFR+': lambda args: eqm_regret.regret_minimization_initializer(
-        matrix_regret.regret_matching_plus_initializer(),
-        alternate=True, linear_averaging=True, name='CFR+'),
+        cfr.flat_regret_minimizer_initializer('rm+', threads=args.threads),
+        alternate=True, linear_averaging=True, name='CFR+',
+        workspace=args.workspace),
+    'DCFR': lambda args: eqm_regret.regret_minimization_initializer(
+        cfr.flat_regret_minimizer_initializer('dcfr', threads=args.threads),
+        alternate=True, averaging_power=2.0, name='DCFR',
+        workspace=args.workspace),
+    'PCFR+': lambda args: eqm_regret.regret_minimization_initializer(
+        cfr.flat_regret_minimizer_initializer('pcfr+', threads=args.threads),
+        alternate=True, averaging_power=2.0, name='PCFR+',
+        workspace=args.workspace),
     'CBA+': lambda args: eqm_regret.regret_minimization_initializer(
         matrix_regret.conic_blackwell_plus_initializer(),
-        alternate=True, linear_averaging=True, name='CBA+'),
+        alternate=True, linear_averaging=True, name='CBA+',
+        workspace=args.workspace),
     'RM+_LINEAR': lambda args: eqm_regret.regret_minimization_initializer(
-        matrix_regret.regret_matching_plus_initializer(),
-        alternate=False, linear_averaging=True, name='CFR+'),
+        cfr.flat_regret_minimizer_initializer('rm+', threads=args.threads),
+        alternate=False, linear_averaging=True, name='CFR+',
+        workspace=args.workspace, parallel=args.parallel),
     'EGT_WARM': lambda args: egt.egt_warm_start_initializer(
         alg=eqm_regret.regret_minimization_initializer(
-            matrix_regret.regret_matching_plus_initializer(),
+            cfr.flat_regret_minimizer_initializer(
+                'rm+', threads=args.threads),
             alternate=True, linear_averaging=True),
         aggressive_stepsizes=args.aggressive_stepsizes),
 }
@@ -92,6 +109,26 @@ parser.add_argument(
     default=False,
     dest='aggressive_stepsizes',
     help='use aggressive stepsizing in EGT and Mirror Prox')
+parser.add_argument(
+    '--workspace',
+    action='store_true',
+    default=False,
+    dest='workspace',
+    help='run the regret minimization algorithms in preallocated arrays')
+parser.add_argument(
+    '--parallel',
+    action='store_true',
+    default=False,
+    dest='parallel',
+    help='update the two players concurrently in the non-alternating ' +
+    'regret minimization algorithms (HEDGE, RM, RM+, RM+_LINEAR)')
+parser.add_argument(
+    '--threads',
+    type=int,
+    default=1,
+    dest='threads',
+    help='number of threads for the CFR updates, each handling a group ' +
+    'of the subtrees below the root')
 
 # DGF params
 parser.add_argument(
@@ -217,7 +254,7 @@ elif '.blsp' in args.game:
         args.game,
         prox_infoset_weights=args.prox_infoset_weights,
         prox_scalar=args.prox_scalar)
-elif '.game' in args.game: # this if condition can be commented in for the libgg reader
+elif '.game' in args.game:
     game = libef_reader.make_efg_from_file(
         args.game,
         prox_infoset_weights=args.prox_infoset_weights,
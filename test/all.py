@@ -1,7 +1,15 @@
 import unittest
+from test_blsp_reader import TestBLSPReader
+from test_cfr import TestCFR
+from test_chance_sampling import TestChanceSampling
 from test_extensive_form_game import TestExtensiveFormGame
+from test_holdem_hands import TestHoldemHands
+from test_kronecker import TestKroneckerPayoff
 from test_kuhn import TestKuhn
 from test_leduc import TestLeduc
+from test_libef_reader import TestLibefReader
+from test_matrix_assembly import TestMatrixAssembly
+from test_nlhe_river import TestRiver
 from test_simplex import TestSimplex
 from test_treeplex import TestTreeplex
 
@@ -9,8 +17,16 @@ if __name__ == '__main__':
     alltests = unittest.TestSuite([
         unittest.TestLoader().loadTestsFromTestCase(TestKuhn),
         unittest.TestLoader().loadTestsFromTestCase(TestLeduc),
+        unittest.TestLoader().loadTestsFromTestCase(TestMatrixAssembly),
         unittest.TestLoader().loadTestsFromTestCase(TestSimplex),
         unittest.TestLoader().loadTestsFromTestCase(TestTreeplex),
         unittest.TestLoader().loadTestsFromTestCase(TestExtensiveFormGame),
+        unittest.TestLoader().loadTestsFromTestCase(TestCFR),
+        unittest.TestLoader().loadTestsFromTestCase(TestBLSPReader),
+        unittest.TestLoader().loadTestsFromTestCase(TestLibefReader),
+        unittest.TestLoader().loadTestsFromTestCase(TestHoldemHands),
+        unittest.TestLoader().loadTestsFromTestCase(TestRiver),
+        unittest.TestLoader().loadTestsFromTestCase(TestKroneckerPayoff),
+        unittest.TestLoader().loadTestsFromTestCase(TestChanceSampling),
     ])
     unittest.TextTestRunner(verbosity=2).run(alltests)
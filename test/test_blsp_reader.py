@@ -0,0 +1,52 @@
+import io
+import os
+import unittest
+import numpy as np
+from extensive_form_game import blsp_reader
+from poker import leduc
+
+BLSP_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'blsp')
+
+class TestBLSPReader(unittest.TestCase):
+    def test_read_array(self):
+        line = ' '.join(str(i) for i in range(1000)) + ' \n'
+        for chunk_size in [1, 7, 64, blsp_reader.CHUNK_SIZE]:
+            blsp_file = io.StringIO(line + '2.5 -1e3\n')
+            values = blsp_reader._read_array(blsp_file, 1000, np.int32,
+                                             chunk_size)
+            assert np.array_equal(values, np.arange(1000))
+            assert np.array_equal(
+                blsp_reader._read_array(blsp_file, 2, float, chunk_size),
+                [2.5, -1000.0])
+        with self.assertRaises(AssertionError):
+            blsp_reader._read_array(io.StringIO(line), 999, np.int32)
+
+    def test_leduc(self):
+        game = blsp_reader.make_efg_from_file(
+            os.path.join(BLSP_DIR, 'leduc.blsp'))
+        expected = leduc.init_efg()
+        for player in range(2):
+            domain = game.domain(player)
+            assert domain.dimension() == expected.domain(player).dimension()
+            assert domain.num_information_sets() == \
+                expected.domain(player).num_information_sets()
+            assert domain.is_behavioral_form(domain.center())
+        assert game._A_0.nnz == 1116
+        x = game.domain(0).center()
+        y = game.domain(1).center()
+        epsilon = game.profile_epsilon(x, y)
+        assert epsilon[0] > 0
+        assert np.isclose(epsilon[3], -epsilon[4])
+
+    def test_search5(self):
+        game = blsp_reader.make_efg_from_file(
+            os.path.join(BLSP_DIR, 'search5_zero_sum.blsp'))
+        assert game.zero_sum
+        assert game._A_0.shape == (69, 11830)
+        assert game._A_0.nnz == 61084
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestBLSPReader)
+    unittest.TextTestRunner(verbosity=2).run(suite)
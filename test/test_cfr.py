@@ -0,0 +1,185 @@
+import unittest
+import tracemalloc
+import numpy as np
+from poker import kuhn
+from poker import leduc
+from extensive_form_game import cfr
+from extensive_form_game import kernels
+from extensive_form_game import treeplex
+from matrix_game import regret as matrix_regret
+from eqm import regret as eqm_regret
+
+class TestCFR(unittest.TestCase):
+    def setUp(self):
+        self.kuhn = kuhn.init_efg()
+        self.leduc = leduc.init_efg()
+
+    def tearDown(self):
+        pass
+
+    def assert_same_iterates(self, game, mode, rm, **kwargs):
+        flat = eqm_regret.regret_minimization_initializer(
+            cfr.flat_regret_minimizer_initializer(mode, alpha=0.5),
+            **kwargs)(game)
+        per_infoset = eqm_regret.regret_minimization_initializer(
+            rm, **kwargs)(game)
+        for _ in range(10):
+            flat.iterate()
+            per_infoset.iterate()
+            assert np.allclose(flat._rm_x.strategy,
+                               per_infoset._rm_x.strategy)
+            assert np.allclose(flat._rm_y.strategy,
+                               per_infoset._rm_y.strategy)
+        for flat_avg, avg in zip(flat.profile(), per_infoset.profile()):
+            assert np.allclose(flat_avg, avg)
+        assert str(flat) == str(per_infoset)
+
+    def test_regret_matching(self):
+        self.assert_same_iterates(
+            self.leduc, 'rm', matrix_regret.regret_matching_initializer())
+
+    def test_regret_matching_plus(self):
+        self.assert_same_iterates(
+            self.leduc, 'rm+',
+            matrix_regret.regret_matching_plus_initializer(),
+            alternate=True, linear_averaging=True)
+
+    def test_hedge(self):
+        self.assert_same_iterates(
+            self.kuhn, 'hedge', matrix_regret.hedge_initializer(0.5))
+
+    def test_discounted_regret_matching(self):
+        self.assert_same_iterates(
+            self.leduc, 'dcfr',
+            matrix_regret.discounted_regret_matching_initializer(),
+            alternate=True, averaging_power=2.0)
+
+    def test_predictive_cfr_plus(self):
+        # PCFR+ straight from its definition: bottom-up, each infoset
+        # regret-matches+ on its regrets plus the predicted instantaneous
+        # regret, with the children's values under their new strategies
+        domain = self.leduc.domain(0)
+        flat = cfr.FlatCounterfactualRegretMinimizer(domain, 'pcfr+')
+        regret = np.zeros(domain.dimension())
+        strategy = domain.center()
+        for _ in range(10):
+            utility = np.random.randn(domain.dimension())
+            flat(utility.copy())
+
+            new_strategy = strategy.copy()
+            prediction = np.zeros(domain.dimension())
+            for info_set in domain.infoset_traversal():
+                begin = domain.information_set_first_sequence(info_set)
+                end = domain.information_set_last_sequence(info_set)
+                parent = domain.information_set_parent_sequence(info_set)
+                x = strategy[begin:end]
+                u = utility[begin:end]
+                m = u + prediction[begin:end]
+                regret[begin:end] = np.maximum(
+                    regret[begin:end] + u - np.dot(x, u), 0)
+                theta = np.maximum(regret[begin:end] + m - np.dot(x, m), 0)
+                if np.sum(theta) > 0:
+                    new_strategy[begin:end] = theta / np.sum(theta)
+                else:
+                    new_strategy[begin:end] = 1.0 / (end - begin)
+                utility[parent] += np.dot(x, u)
+                prediction[parent] += np.dot(new_strategy[begin:end], m) - \
+                    np.dot(x, u)
+            strategy = new_strategy
+            assert np.allclose(flat.strategy, strategy)
+            assert np.allclose(flat.regret, regret)
+
+    def test_power_averaging(self):
+        step = eqm_regret.power_step_size_generator(2.0)
+        assert [next(step) for _ in range(4)] == [1.0, 4.0, 9.0, 16.0]
+
+    @unittest.skipUnless(kernels.available, 'numba is not installed')
+    def test_backends_agree(self):
+        for mode in ['rm', 'rm+', 'hedge', 'dcfr', 'pcfr+']:
+            rms = [
+                cfr.FlatCounterfactualRegretMinimizer(
+                    treeplex.TreeplexDomain(
+                        domain.dimension(), domain._begin, domain._end,
+                        domain._parent, backend=backend), mode, alpha=0.5)
+                for domain in [self.leduc.domain(0)]
+                for backend in ['numpy', 'numba']
+            ]
+            for _ in range(10):
+                utility = np.random.randn(self.leduc.domain(0).dimension())
+                for rm in rms:
+                    rm(utility.copy())
+                assert np.allclose(rms[0].strategy, rms[1].strategy)
+                assert np.allclose(rms[0].regret, rms[1].regret)
+
+    def test_subtree_threads(self):
+        domain = self.leduc.domain(0)
+        subtrees = domain.subtrees(4)
+        assert len(subtrees) == 3  # one group per private card
+        infosets = np.concatenate([s.infosets.infosets for s in subtrees])
+        assert np.array_equal(np.sort(infosets),
+                              np.flatnonzero(domain._sizes > 0))
+        for backend in ['numpy', 'numba'] if kernels.available else ['numpy']:
+            domain = treeplex.TreeplexDomain(
+                domain.dimension(), domain._begin, domain._end,
+                domain._parent, backend=backend)
+            for mode in ['rm', 'rm+', 'hedge', 'dcfr', 'pcfr+']:
+                rms = [
+                    cfr.FlatCounterfactualRegretMinimizer(
+                        domain, mode, alpha=0.5, threads=threads)
+                    for threads in [1, 3]
+                ]
+                for _ in range(10):
+                    utility = np.random.randn(domain.dimension())
+                    utilities = [utility.copy(), utility.copy()]
+                    for rm, u in zip(rms, utilities):
+                        rm(u)
+                    assert np.allclose(utilities[0], utilities[1])
+                    assert np.allclose(rms[0].strategy, rms[1].strategy)
+                    assert np.allclose(rms[0].regret, rms[1].regret)
+
+    def test_workspace(self):
+        init = eqm_regret.regret_minimization_initializer(
+            cfr.flat_regret_minimizer_initializer('rm+'),
+            alternate=True, linear_averaging=True)
+        init_workspace = eqm_regret.regret_minimization_initializer(
+            cfr.flat_regret_minimizer_initializer('rm+'),
+            alternate=True, linear_averaging=True, workspace=True)
+        for game in [self.kuhn, self.leduc]:
+            opt = init(game)
+            opt_workspace = init_workspace(game)
+            opt.iterate(20)
+            opt_workspace.iterate(20)
+            for avg, avg_workspace in zip(opt.profile(),
+                                          opt_workspace.profile()):
+                assert np.allclose(avg, avg_workspace)
+
+        # steady-state iterations do not allocate any arrays; what remains
+        # are small Python objects
+        tracemalloc.start()
+        opt_workspace.iterate(5)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert peak < 8 * self.leduc.domain(0).dimension()
+
+    def test_parallel(self):
+        for workspace in [False, True]:
+            for game in [self.kuhn, self.leduc]:
+                opts = [
+                    eqm_regret.regret_minimization_initializer(
+                        cfr.flat_regret_minimizer_initializer('rm+'),
+                        linear_averaging=True, workspace=workspace,
+                        parallel=parallel)(game)
+                    for parallel in [False, True]
+                ]
+                for opt in opts:
+                    opt.iterate(20)
+                for avg, avg_parallel in zip(opts[0].profile(),
+                                             opts[1].profile()):
+                    assert np.allclose(avg, avg_parallel)
+                assert opts[0].gradient_computations() == \
+                    opts[1].gradient_computations()
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestCFR)
+    unittest.TextTestRunner(verbosity=2).run(suite)
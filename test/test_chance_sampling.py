@@ -0,0 +1,91 @@
+import unittest
+import numpy as np
+from poker import kuhn
+from poker import leduc
+from poker import nlhe_river
+from extensive_form_game import cfr
+from extensive_form_game import extensive_form_game as efg
+from extensive_form_game.chance_sampling import ChanceSampledGame
+from extensive_form_game.kronecker import KroneckerPayoff
+from eqm import regret as eqm_regret
+
+
+class TestChanceSampling(unittest.TestCase):
+    def setUp(self):
+        self.kuhn = kuhn.init_efg()
+        self.leduc = leduc.init_efg()
+
+    def test_labels(self):
+        # private rank and board card, plus the root sequence
+        labels = self.leduc.chance_labels()
+        assert len(np.unique(labels[0])) == 3 * 4 + 1
+        rebuilt = efg.from_arrays(self.leduc.to_arrays())
+        for player in range(2):
+            assert np.array_equal(rebuilt.chance_labels()[player],
+                                  labels[player])
+        # without labels, the subtrees below the root: one per card
+        roots = self.kuhn.chance_labels()[0]
+        assert len(np.unique(roots[roots >= 0])) == 3
+
+    def test_all_outcomes(self):
+        sampled = ChanceSampledGame(self.leduc, seed=0)
+        num_outcomes = len(sampled._probability)
+        x = self.leduc.domain(0).center()
+        y = self.leduc.domain(1).center()
+        for player, strategy in [(0, y), (1, x)]:
+            seq = self.leduc.domain(1 - player).sequence_form(strategy)
+            u = sampled._product(player, np.arange(num_outcomes),
+                                 np.ones(num_outcomes), seq, None)
+            assert np.allclose(u, self.leduc.utility_for(player, strategy))
+
+    def test_unbiased(self):
+        sampled = ChanceSampledGame(self.leduc, num_samples=10, seed=0)
+        x = self.leduc.domain(0).center()
+        y = self.leduc.domain(1).center()
+        u_x, u_y = self.leduc.utilities(x, y)
+        samples = np.array([np.concatenate(sampled.utilities(x, y))
+                            for _ in range(5000)])
+        error = np.abs(samples.mean(axis=0) - np.concatenate((u_x, u_y)))
+        stderr = samples.std(axis=0) / np.sqrt(len(samples))
+        assert np.all(error <= 5 * stderr + 1e-12)
+        # one outcome reaches a small part of the game
+        u_x = ChanceSampledGame(self.leduc, seed=0).utility_for(0, y)
+        assert np.count_nonzero(u_x) < len(u_x) / 4
+
+    def test_kronecker(self):
+        game = nlhe_river.init_efg_big(kronecker=True)
+        explicit = nlhe_river.init_efg_big()
+        x = game.domain(0).center()
+        y = game.domain(1).center()
+
+        # the outcomes come from the factors, not from the explicit matrix
+        def tocsr(operator):
+            raise AssertionError('the explicit payoff matrix was built')
+        original_tocsr = KroneckerPayoff.tocsr
+        KroneckerPayoff.tocsr = tocsr
+        try:
+            sampled = ChanceSampledGame(game, seed=0)
+            num_outcomes = len(sampled._probability)
+            for player, strategy in [(0, y), (1, x)]:
+                seq = game.domain(1 - player).sequence_form(strategy)
+                u = sampled._product(player, np.arange(num_outcomes),
+                                     np.ones(num_outcomes), seq, None)
+                assert np.allclose(u, explicit.utility_for(player, strategy))
+            # one outcome, a pair of hands, reaches one block
+            u_x = sampled.utility_for(0, y)
+            assert np.count_nonzero(u_x) <= len(u_x) / 3
+
+            alg = eqm_regret.regret_minimization_initializer(
+                cfr.flat_regret_minimizer_initializer('rm'),
+                alternate=True, num_samples=1, seed=0)(game)
+            alg.iterate(10)
+        finally:
+            KroneckerPayoff.tocsr = original_tocsr
+
+    def test_mccfr(self):
+        alg = eqm_regret.regret_minimization_initializer(
+            cfr.flat_regret_minimizer_initializer('rm'), alternate=True,
+            num_samples=2, seed=0)(self.kuhn)
+        alg.iterate(2000)
+        eps, _ = alg.epsilon()
+        assert eps < 0.05
@@ -1,6 +1,16 @@
+import json
+import os
+import tempfile
 import unittest
+from unittest import mock
 import numpy as np
+from scipy.sparse import isspmatrix_csr, lil_matrix
+from extensive_form_game import game_cache
+from extensive_form_game import shared_arrays
+from extensive_form_game.extensive_form_game import ExtensiveFormGame, \
+    from_arrays
 from poker import kuhn
+from poker import leduc
 
 class TestExtensiveFormGame(unittest.TestCase):
     def setUp(self):
@@ -43,6 +53,129 @@ class TestExtensiveFormGame(unittest.TestCase):
         uniform_reach_p2 = self.kuhn.reach(1, self.p1_uniform_strat)
         assert np.array_equal(uniform_expected_reach_p2, uniform_reach_p2)
 
+    def test_profile_epsilon_many(self):
+        xs = [self.p1_uniform_strat, self.p1_pure_strat, self.p1_uniform_strat]
+        ys = [self.p2_uniform_strat, self.p2_uniform_strat, self.p2_pure_strat]
+        batched = self.kuhn.profile_epsilon_many(xs, ys)
+        for k, (x, y) in enumerate(zip(xs, ys)):
+            expected = self.kuhn.profile_epsilon(x, y)
+            for batched_value, value in zip(batched, expected):
+                assert np.isclose(batched_value[k], value)
+
+    def test_utilities(self):
+        profiles = [(self.p1_uniform_strat, self.p2_pure_strat),
+                    (self.p1_pure_strat, self.p2_uniform_strat)]
+        out = np.empty(self.kuhn.domain(0).dimension() +
+                       self.kuhn.domain(1).dimension())
+        for x, y in profiles:
+            for u_x, u_y in [self.kuhn.utilities(x, y),
+                             self.kuhn.utilities(x, y, out=out)]:
+                assert np.allclose(u_x, self.kuhn.utility_for(0, y))
+                assert np.allclose(u_y, self.kuhn.utility_for(1, x))
+            value_x = np.dot(self.kuhn.domain(0).sequence_form(x), u_x)
+            assert np.isclose(self.kuhn.profile_epsilon(x, y)[3], value_x)
+
+    def test_payoff_layouts(self):
+        # leduc passes the same payoff matrix for both players, which is
+        # then stored once
+        game = leduc.init_efg()
+        assert np.shares_memory(game._A_1_T.data, game._A_0.data)
+        # kuhn passes a separate A_1, whose transpose is stored as CSR
+        assert isspmatrix_csr(self.kuhn._A_1_T)
+        assert not np.shares_memory(self.kuhn._A_1_T.data,
+                                    self.kuhn._A_0.data)
+
+    def test_zero_sum(self):
+        game = leduc.init_efg()
+        assert game.zero_sum
+        assert not self.kuhn.zero_sum
+        x = game.domain(0).center()
+        y = game.domain(1).center()
+        assert np.isclose(game.profile_value_y(x, y),
+                          -game.profile_value_x(x, y))
+        seq_y = game.domain(1).sequence_form(y)
+        assert np.isclose(game.profile_epsilon(x, y)[4],
+                          np.dot(seq_y, game.utility_for(1, x)))
+
+        A = lil_matrix((2, 2))
+        A[1, 1] = 1.0
+        B = lil_matrix((2, 2))
+        treeplex = (([1], [1]), ([2], [2]), ([0], [0]))
+        with self.assertRaises(ValueError):
+            ExtensiveFormGame('not zero-sum', A, B, *treeplex,
+                              zero_sum=True)
+        # equal matrices are detected unless the flag is given
+        assert ExtensiveFormGame('zero-sum', A, A.copy(), *treeplex).zero_sum
+        assert not ExtensiveFormGame('general-sum', A, A.copy(), *treeplex,
+                                     zero_sum=False).zero_sum
+
+    def test_arrays(self):
+        # kuhn is not zero-sum, leduc is
+        assert not self.kuhn.zero_sum
+        for game in [self.kuhn, leduc.init_efg()]:
+            blocks, spec = shared_arrays.share(game.to_arrays())
+            attached_blocks, shared = shared_arrays.attach(spec)
+            for arrays in [game.to_arrays(), shared]:
+                # the stored flag is trusted, the matrices are not compared
+                with mock.patch('extensive_form_game.extensive_form_game.'
+                                '_same_matrix') as same_matrix:
+                    copy = from_arrays(arrays)
+                assert not same_matrix.called
+                assert str(copy) == str(game)
+                assert copy.zero_sum == game.zero_sum
+                x = game.domain(0).center()
+                y = game.domain(1).center()
+                assert np.allclose(copy.profile_epsilon(x, y),
+                                   game.profile_epsilon(x, y))
+                assert np.allclose(copy.reach(0, y), game.reach(0, y))
+                # the payoff matrices are the given arrays, not copies
+                assert np.shares_memory(copy._A_0.data, arrays['A_0_data'])
+                if not game.zero_sum:
+                    assert np.shares_memory(copy._A_1_T.data,
+                                            arrays['A_1_T_data'])
+                    assert np.shares_memory(copy._A_1_T.indices,
+                                            arrays['A_1_T_indices'])
+            # the arrays must be gone before their blocks are closed
+            del arrays, shared, copy
+            shared_arrays.release(attached_blocks)
+            shared_arrays.release(blocks, unlink=True)
+
+    def test_game_cache(self):
+        game = leduc.init_efg(num_ranks=4)
+        x = game.domain(0).center()
+        y = game.domain(1).center()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for _ in range(2):
+                cached = game_cache.load(leduc.init_efg, cache_dir,
+                                         num_ranks=4)
+                assert str(cached) == str(game)
+                assert np.allclose(cached.profile_epsilon(x, y),
+                                   game.profile_epsilon(x, y))
+            # the second load is memory-mapped from the first one's files
+            assert not cached._A_0.data.flags.writeable
+            assert os.listdir(cache_dir) == [
+                game_cache.entry_name(leduc.init_efg, {'num_ranks': 4})]
+            assert game_cache.entry_name(leduc.init_efg, {'num_ranks': 3}) \
+                not in os.listdir(cache_dir)
+            # a new version of the generator does not find the old entry
+            with mock.patch.object(leduc, 'GAME_VERSION', 1, create=True):
+                assert game_cache.entry_name(leduc.init_efg,
+                                             {'num_ranks': 4}) \
+                    not in os.listdir(cache_dir)
+            # the chance labels survive the round trip
+            assert np.array_equal(cached.chance_labels()[0],
+                                  game.chance_labels()[0])
+
+            # entries written with another layout are not loaded
+            path = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+            meta['version'] = game_cache.FORMAT_VERSION - 1
+            with open(os.path.join(path, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+            with self.assertRaises(ValueError):
+                game_cache.load(leduc.init_efg, cache_dir, num_ranks=4)
+
 
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestExtensiveFormGame)
@@ -0,0 +1,51 @@
+import unittest
+from itertools import combinations
+import numpy as np
+from poker import holdem_hands
+
+
+class TestHoldemHands(unittest.TestCase):
+    def test_hands(self):
+        holdem_hands._test_hands()
+
+    def test_best_five_of_seven(self):
+        rng = np.random.RandomState(0)
+        hands = np.array([rng.permutation(52)[:7] for _ in range(500)])
+        scores = holdem_hands.evaluate(hands)
+        for hand, score in zip(hands, scores):
+            best = holdem_hands.evaluate(list(combinations(hand, 5))).max()
+            assert score == best
+
+    def test_categories(self):
+        cards = holdem_hands.card_index
+        # royal flush, quads, full house, flush, wheel, two pair
+        hands = np.array([
+            cards([14, 13, 12, 11, 10, 2, 3], [0, 0, 0, 0, 0, 1, 2]),
+            cards([9, 9, 9, 9, 14, 2, 3], [0, 1, 2, 3, 0, 1, 2]),
+            cards([9, 9, 9, 5, 5, 5, 3], [0, 1, 2, 0, 1, 2, 3]),
+            cards([2, 7, 9, 11, 13, 14, 12], [1, 1, 1, 1, 1, 0, 2]),
+            cards([14, 2, 3, 4, 5, 9, 9], [0, 1, 2, 3, 0, 1, 2]),
+            cards([8, 8, 4, 4, 2, 2, 13], [0, 1, 2, 3, 0, 1, 2]),
+        ])
+        scores = holdem_hands.evaluate(hands)
+        assert scores[0] >> 20 == holdem_hands.STRAIGHT_FLUSH >> 20
+        assert scores[1] >> 20 == holdem_hands.QUADS >> 20
+        assert scores[2] >> 20 == holdem_hands.FULL_HOUSE >> 20
+        assert scores[3] >> 20 == holdem_hands.FLUSH >> 20
+        assert scores[4] >> 20 == holdem_hands.STRAIGHT >> 20
+        assert scores[5] >> 20 == holdem_hands.TWO_PAIR >> 20
+        assert all(np.diff(scores) < 0)
+
+    def test_ranges(self):
+        hands = np.array(list(combinations(range(52), 2)))
+        board = holdem_hands.card_index([14, 10, 7, 7, 3], [0, 1, 2, 3, 1])
+        scores = holdem_hands.evaluate_range(hands, board)
+        assert scores.shape == (1326, )
+
+        outcomes = holdem_hands.compare_ranges(hands[:40], hands[-40:], board)
+        for i, j in [(0, 0), (3, 17), (39, 5), (21, 39)]:
+            hole_cards = [[hands[i] // 4 + 2, hands[i] % 4],
+                          [hands[-40 + j] // 4 + 2, hands[-40 + j] % 4]]
+            board_cards = [board // 4 + 2, board % 4]
+            assert outcomes[i, j] == holdem_hands.compute_winner(
+                hole_cards, board_cards)
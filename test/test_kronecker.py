@@ -0,0 +1,76 @@
+import unittest
+import numpy as np
+import scipy.sparse as sparse
+from extensive_form_game import extensive_form_game as efg
+from extensive_form_game.kronecker import KroneckerPayoff
+from poker import nlhe_river
+
+
+class TestKroneckerPayoff(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.terms = [
+            (rng.uniform(-1, 1, size=(3, 4)),
+             sparse.random(5, 2, density=0.5, random_state=rng,
+                           format='csr')),
+            (sparse.random(3, 4, density=0.5, random_state=rng,
+                           format='csr'),
+             sparse.random(5, 2, density=0.5, random_state=rng,
+                           format='csr')),
+        ]
+        self.A = KroneckerPayoff(self.terms, padding=(1, 2))
+        self.dense = np.zeros((16, 10))
+        self.dense[1:, 2:] = sum(sparse.kron(H, L).toarray()
+                                 for H, L in self.terms)
+
+    def test_products(self):
+        rng = np.random.RandomState(1)
+        x = rng.uniform(size=10)
+        y = rng.uniform(size=16)
+        assert self.A.shape == (16, 10)
+        assert np.allclose(self.A.dot(x), self.dense.dot(x))
+        assert np.allclose(self.A.transpose().dot(y), self.dense.T.dot(y))
+        out = np.full(16, np.nan)
+        assert self.A.dot(x, out=out) is out
+        assert np.allclose(out, self.dense.dot(x))
+        X = rng.uniform(size=(10, 3))
+        assert np.allclose(self.A.dot(X), self.dense.dot(X))
+        assert np.allclose(self.A.tocsr().toarray(), self.dense)
+
+    def test_extremes(self):
+        # the random L factors overlap, so the extremes come from tocsr
+        assert self.A.max() == self.dense.max()
+        assert self.A.min() == self.dense.min()
+        top = np.zeros((5, 2))
+        top[:3] = 1
+        (H_0, L_0), (H_1, L_1) = self.terms
+        disjoint = KroneckerPayoff([(H_0, L_0.multiply(top)),
+                                    (-H_1, L_1.multiply(1 - top))])
+        assert disjoint._disjoint()
+        dense = disjoint.tocsr()
+        assert np.isclose(disjoint.max(), dense.max())
+        assert np.isclose(disjoint.min(), dense.min())
+
+    def test_river(self):
+        explicit = nlhe_river.init_efg_big()
+        game = nlhe_river.init_efg_big(kronecker=True)
+        assert isinstance(game._A_0, KroneckerPayoff)
+        assert game.zero_sum
+        x = game.domain(0).center()
+        y = game.domain(1).center()
+        for player, strategy in [(0, y), (1, x)]:
+            out = np.empty(game.domain(player).dimension())
+            assert np.allclose(game.utility_for(player, strategy, out=out),
+                               explicit.utility_for(player, strategy))
+        assert np.allclose(game.profile_epsilon(x, y),
+                           explicit.profile_epsilon(x, y))
+        assert np.allclose(game.profile_epsilon_many([x, x], [y, y]),
+                           explicit.profile_epsilon_many([x, x], [y, y]))
+        assert game.payoff_max_norm() == explicit.payoff_max_norm()
+
+        arrays = game.to_arrays()
+        assert 'A_0_data' not in arrays
+        rebuilt = efg.from_arrays(arrays)
+        assert isinstance(rebuilt._A_0, KroneckerPayoff)
+        assert np.allclose(rebuilt.utility_for(0, y),
+                           explicit.utility_for(0, y))
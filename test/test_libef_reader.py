@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+import numpy as np
+from extensive_form_game import libef_reader
+
+
+def _infoset(start, end, parent):
+    # the schema's end sequence is inclusive
+    return SimpleNamespace(startSequenceId=start, endSequenceId=end,
+                           parentSequenceId=parent)
+
+
+def _entry(p1, p2, chance, payoff):
+    return SimpleNamespace(sequences=[p1, p2], chanceFactor=chance,
+                           payoffs=[-payoff, payoff])
+
+
+class _FakeSchema:
+    """
+    Stands in for the compiled game.capnp schema. Game.read returns a small
+    game in which player 1's last sequences come after its last parent
+    sequence.
+    """
+
+    def __init__(self):
+        self.reads = 0
+        self.Game = self
+
+    def read(self, game_file, traversal_limit_in_words):
+        self.reads += 1
+        assert traversal_limit_in_words > 0
+        treeplexes = [
+            # P1: 0 /(1, 2), 2 /(3, 4)
+            SimpleNamespace(infosets=[_infoset(1, 2, 0), _infoset(3, 4, 2)]),
+            # P2: 0 /(1, 2)
+            SimpleNamespace(infosets=[_infoset(1, 2, 0)]),
+        ]
+        entries = [_entry(1, 1, 0.5, 1.0), _entry(3, 2, 0.5, -2.0),
+                   _entry(4, 2, 0.25, 4.0), _entry(4, 2, 0.25, 4.0)]
+        return SimpleNamespace(treeplexes=treeplexes,
+                               payoffMatrix=SimpleNamespace(entries=entries))
+
+
+class TestLibefReader(unittest.TestCase):
+    def setUp(self):
+        self.schema = _FakeSchema()
+        self._load_schema = libef_reader._load_schema
+        libef_reader._load_schema = lambda: self.schema
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, 'fake.game')
+        with open(self.filename, 'wb') as f:
+            f.write(b'\0' * 64)
+
+    def tearDown(self):
+        libef_reader._load_schema = self._load_schema
+        self.dir.cleanup()
+
+    def assert_fake_game(self, game):
+        assert game.zero_sum
+        assert game._A_0.shape == (5, 3)
+        assert game.domain(0).dimension() == 5
+        assert game.domain(1).dimension() == 3
+        assert game.domain(0).num_information_sets() == 2
+        expected = np.zeros((5, 3))
+        expected[1, 1] = 0.5
+        expected[3, 2] = -1.0
+        # duplicate entries are summed
+        expected[4, 2] = 2.0
+        assert np.allclose(game._A_0.toarray(), expected)
+
+    def test_read_game(self):
+        self.assert_fake_game(libef_reader.make_efg_from_file(self.filename))
+        assert self.schema.reads == 1
+
+    def test_cache_dir(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for _ in range(2):
+                self.assert_fake_game(libef_reader.make_efg_from_file(
+                    self.filename, cache_dir=cache_dir))
+            # the second call is memory-mapped from the first one's entry
+            assert self.schema.reads == 1
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestLibefReader)
+    unittest.TextTestRunner(verbosity=2).run(suite)
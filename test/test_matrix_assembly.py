@@ -0,0 +1,40 @@
+import unittest
+from unittest import mock
+import numpy as np
+from poker import leduc
+from poker.matrix_assembly import coo_to_csr, entries_to_csr
+
+class TestMatrixAssembly(unittest.TestCase):
+    def test_entries_to_csr(self):
+        A = entries_to_csr([(0, 1, 1.0), (2, 0, 0.5), (0, 1, 2.0)], (3, 2))
+        assert np.array_equal(A.toarray(), [[0, 3.0], [0, 0], [0.5, 0]])
+        assert entries_to_csr([], (2, 2), int).nnz == 0
+        assert entries_to_csr([], (2, 2), int).dtype == int
+
+    def test_coo_to_csr(self):
+        A = coo_to_csr([1, 1, 0], [2, 2, 0], [1, 2, 3], (2, 3), int)
+        assert A.has_canonical_format
+        assert np.array_equal(A.toarray(), [[3, 0, 0], [0, 0, 3]])
+
+    def test_leduc(self):
+        # the entries leduc.init_efg assembles, captured on the way in
+        with mock.patch('poker.leduc.entries_to_csr',
+                        wraps=entries_to_csr) as assemble:
+            game = leduc.init_efg()
+
+        # the first assembled matrix is the payoff matrix; its entries are
+        # summed over chance outcomes one at a time
+        entries, shape = assemble.call_args_list[0][0][:2]
+        expected = np.zeros(shape)
+        for row, col, value in entries:
+            expected[row, col] += value
+        assert game._A_0.shape == shape
+        assert np.allclose(game._A_0.toarray(), expected)
+        # one stored entry per position
+        assert game._A_0.nnz == len(set((row, col)
+                                        for row, col, _ in entries))
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestMatrixAssembly)
+    unittest.TextTestRunner(verbosity=2).run(suite)
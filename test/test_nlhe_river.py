@@ -0,0 +1,64 @@
+import unittest
+import numpy as np
+import scipy.sparse as sparse
+from poker import nlhe_river
+from poker.holdem_hands import card_index
+
+
+class TestRiver(unittest.TestCase):
+    def setUp(self):
+        self.board = np.array([[2, 7, 4, 5, 6], [2, 3, 0, 0, 1]])
+        self.game = nlhe_river.init_efg_big()
+
+    def test_treeplex(self):
+        tree = nlhe_river.BettingTree(100, [100, 100], 2,
+                                      [0.33, 0.5, 0.66, 1])
+        assert self.game._A_0.shape == (1 + 3 * tree.num_sequences[0],
+                                        1 + 3 * tree.num_sequences[1])
+        names = self.game.domain(0).seq_to_str()
+        assert len(names) == 3 * tree.num_sequences[0]
+        assert names[1] == '[[14, 14], [0, 1]]/r0.33'
+        # each hand's first infoset follows the empty sequence
+        first, end, parent = tree.treeplex(0, 3)
+        roots = np.isin(first, 1 + np.arange(3) * tree.num_sequences[0])
+        assert roots.sum() == 3 and np.all(parent[roots] == 0)
+
+    def test_leaves(self):
+        names = [self.game.domain(p).seq_to_str() for p in range(2)]
+        index = [{name: seq for seq, name in names[p].items()}
+                 for p in range(2)]
+        A = self.game._A_0
+        # AA bets half the pot and KK folds, AA folds to or calls KK's
+        # all-in
+        aces_bet = index[0]['[[14, 14], [0, 1]]/r0.5']
+        kings_fold = index[1]['[[13, 13], [0, 1]]/r0.5f']
+        assert abs(A[aces_bet, kings_fold] + 100 / 2.0 / 6) < 1e-12
+        aces_fold = index[0]['[[14, 14], [0, 1]]/c/af']
+        kings_shove = index[1]['[[13, 13], [0, 1]]/ca']
+        assert abs(A[aces_fold, kings_shove] - 100 / 2.0 / 6) < 1e-12
+        aces_call = index[0]['[[14, 14], [0, 1]]/c/ac']
+        assert A[aces_call, kings_shove] < 0
+        # blocked pairs never meet
+        aces_check = index[0]['[[14, 14], [0, 1]]/c']
+        aces_shove = index[1]['[[14, 14], [0, 1]]/ca']
+        assert A[aces_call, aces_shove] == 0
+        assert A[aces_check, aces_shove] == 0
+
+    def test_full_range(self):
+        hands = nlhe_river.full_range(self.board)
+        assert len(hands[0]) == 47 * 46 // 2
+        cards = card_index(np.array(hands[0]), np.array(hands[1]))
+        assert len(np.unique(cards, axis=0)) == len(cards)
+        assert not np.isin(cards, card_index(*self.board)).any()
+
+        game = nlhe_river.init_efg(hands=[hands[:2], hands[:2]],
+                                   board=self.board)
+        tree = nlhe_river.BettingTree(2, [1, 1], 1, [0.33, 0.5, 0.66, 1])
+        ranges = [nlhe_river._range_cards(hands)] * 2
+        terms = nlhe_river.payoff_factors(tree, ranges[0], ranges[1],
+                                          card_index(*self.board))
+        A = sum(sparse.kron(H, L) for H, L in terms)
+        assert abs(game._A_0[1:, 1:] - A).max() < 1e-12
+        # every p1 hand meets opponents with total probability 1 / n
+        H = terms[0][0]
+        assert np.allclose(H.sum(axis=1), 1.0 / len(hands[0]))
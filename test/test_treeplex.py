@@ -1,10 +1,12 @@
 import unittest
 import numpy as np
 from poker import kuhn
+from extensive_form_game import kernels
 from extensive_form_game import treeplex
 from matrix_game import simplex
+from eqm.eqm import SequenceFormAverage
 
-def large_test_domain():
+def large_test_domain(backend='auto'):
     """ Makes a small Treeplex for testing purposes. This treeplex has:
     1 Root infoset with 2 actions (1,2)
       Action 1 at root leads to 2 infosets, with actions (3,4) and (5,6,7)
@@ -17,9 +19,10 @@ def large_test_domain():
     begin     = np.array([1, 3, 5, 8, 11, 15, 17, 20])
     end      = np.array([3, 5, 8, 11, 15, 17, 20, 22])
     parent    = np.array([0, 1, 1, 5, 5, 7, 7, 2])
-    return treeplex.TreeplexDomain(dimension, begin, end, parent)
+    return treeplex.TreeplexDomain(dimension, begin, end, parent,
+                                   backend=backend)
 
-def small_test_domain():
+def small_test_domain(backend='auto'):
     """ Makes a small Treeplex for testing purposes. This treeplex has:
     1 Root infoset with 2 actions (1,2)
     Action 0 at root leads to 2 infosets, each with 2 actions (3,4) and (5,6)
@@ -30,7 +33,29 @@ def small_test_domain():
     begin     = np.array([1, 3, 5, 7])
     end      = np.array([3, 5, 7, 9])
     parent    = np.array([0, 1, 1, 2])
-    return treeplex.TreeplexDomain(dimension, begin, end, parent)
+    return treeplex.TreeplexDomain(dimension, begin, end, parent,
+                                   backend=backend)
+
+def forward_test_domain(backend='auto'):
+    """ The small test treeplex with its sequences numbered in reverse, so that
+    parents come after their children and the root sequence is the last one.
+
+    """
+    dimension = 9
+    begin     = np.array([0, 2, 4, 6])
+    end       = np.array([2, 4, 6, 8])
+    parent    = np.array([7, 7, 6, 8])
+    return treeplex.TreeplexDomain(dimension, begin, end, parent,
+                                   backend=backend)
+
+def random_behavioral_strategy(tp):
+    x = np.random.rand(tp.dimension())
+    x[tp.root_sequence()] = 1.0
+    for i in range(tp.num_information_sets()):
+        begin = tp._begin[i]
+        end = tp._end[i]
+        x[begin: end] /= sum(x[begin: end])
+    return x
 
 
 class TestTreeplex(unittest.TestCase):
@@ -89,6 +114,189 @@ class TestTreeplex(unittest.TestCase):
         assert np.array_equal(expected_strat, strat)
         assert np.array_equal(expected_regrets, regrets)
 
+    def test_sequence_form(self):
+        for tp in [self.small_treeplex, self.large_treeplex,
+                   forward_test_domain(), self.kuhn.domain(1)]:
+            for _ in range(10):
+                x = random_behavioral_strategy(tp)
+                seq = tp.sequence_form(x)
+                assert np.allclose(seq, sequence_form_by_infoset(tp, x))
+                assert np.allclose(tp.behavioral_form(seq), x)
+                assert tp.is_behavioral_form(tp.behavioral_form(seq))
+
+    def test_out_arguments(self):
+        for tp in [self.large_treeplex, forward_test_domain(),
+                   self.kuhn.domain(0)]:
+            x = random_behavioral_strategy(tp)
+            y = random_behavioral_strategy(tp)
+            out = np.empty(tp.dimension())
+            seq = tp.sequence_form(x)
+            assert tp.sequence_form(x, out=out) is out
+            assert np.allclose(out, seq)
+            assert np.allclose(tp.behavioral_form(seq, out=out), x)
+            expected = tp.combine(y, 0.3, x)
+            x_before = x.copy()
+            assert tp.combine(y, 0.3, x, out=y) is y
+            assert np.allclose(y, expected)
+            assert np.array_equal(x, x_before)
+
+    def test_sequence_form_cache(self):
+        tp = treeplex.TreeplexDomain(
+            self.large_treeplex.dimension(), self.large_treeplex._begin,
+            self.large_treeplex._end, self.large_treeplex._parent,
+            sequence_form_cache_size=2)
+        x = random_behavioral_strategy(tp)
+        expected = tp.sequence_form(x)
+        assert tp.sequence_form(x) is not tp.sequence_form(x)
+        x = tp.freeze(x)
+        seq = tp.sequence_form(x)
+        assert np.allclose(seq, expected)
+        assert not seq.flags.writeable
+        assert tp.sequence_form(x) is seq
+        out = np.empty(tp.dimension())
+        assert np.allclose(tp.sequence_form(x, out=out), expected)
+        # a frozen strategy cannot be made writeable again
+        try:
+            x.setflags(write=True)
+            assert False
+        except ValueError:
+            pass
+        # least recently used entries are evicted
+        others = [tp.freeze(random_behavioral_strategy(tp))
+                  for _ in range(2)]
+        for other in others:
+            tp.sequence_form(other)
+        assert tp.sequence_form(others[0]) is tp.sequence_form(others[0])
+        assert tp.sequence_form(x) is not seq
+        assert np.allclose(tp.sequence_form(x), expected)
+        # a read-only view sees changes to its base, so it is not cached
+        base = random_behavioral_strategy(tp)
+        view = base.view()
+        view.setflags(write=False)
+        tp.sequence_form(view)
+        base[:] = x
+        assert np.allclose(tp.sequence_form(view), expected)
+        # nor is an array that was made read-only by its owner, since it
+        # can be unfrozen, changed and frozen again
+        y = tp.center()
+        y.setflags(write=False)
+        tp.sequence_form(y)
+        y.setflags(write=True)
+        y[:] = x
+        y.setflags(write=False)
+        assert np.allclose(tp.sequence_form(y), expected)
+
+    def test_sequence_form_average(self):
+        domains = [
+            (self.large_treeplex, random_behavioral_strategy),
+            (forward_test_domain(), random_behavioral_strategy),
+            (simplex.SimplexDomain(5), lambda _: np.random.dirichlet(
+                np.ones(5))),
+        ]
+        for tp, random_strategy in domains:
+            average = SequenceFormAverage(tp, tp.center(), 1.0)
+            expected = tp.center()
+            weight = 1.0
+            for t in range(1, 10):
+                x = random_strategy(tp)
+                average.add(x, t)
+                weight += t
+                expected = tp.combine(expected, t / weight, x)
+                assert np.allclose(average.strategy(), expected)
+
+    @unittest.skipUnless(kernels.available, 'numba is not installed')
+    def test_backends_agree(self):
+        for make_domain in [large_test_domain, forward_test_domain]:
+            numpy_tp = make_domain(backend='numpy')
+            numba_tp = make_domain(backend='numba')
+            for _ in range(10):
+                x = random_behavioral_strategy(numpy_tp)
+                x[1] = 0.0  # leave part of the tree unreached
+                g = np.random.randn(numpy_tp.dimension())
+                seq = numpy_tp.sequence_form(x)
+                assert np.allclose(numba_tp.sequence_form(x), seq)
+                assert np.allclose(numba_tp.behavioral_form(seq),
+                                   numpy_tp.behavioral_form(seq))
+                for (value, response), (test_value, test_response) in [
+                        (numba_tp.support(g), numpy_tp.support(g)),
+                        (numba_tp.infoset_regrets(g, x),
+                         numpy_tp.infoset_regrets(g, x))]:
+                    assert np.allclose(value, test_value)
+                    assert np.array_equal(response, test_response)
+                y = random_behavioral_strategy(numpy_tp)
+                for alpha, y in [(-1.0, None), (1.0, y)]:
+                    value, z = numba_tp.prox()(alpha, g, 0.5, y)
+                    test_value, test_z = numpy_tp.prox()(alpha, g, 0.5, y)
+                    assert np.isclose(value, test_value)
+                    assert np.allclose(z, test_z)
+
+    def test_compact_layout(self):
+        begin = [1, 3, 5, 8, 11, 15, 17, 20]
+        end = [3, 5, 8, 11, 15, 17, 20, 22]
+        parent = [0, 1, 1, 5, 5, 7, 7, 2]
+        names = {1: 'a', 2: 'b'}
+        tp = treeplex.TreeplexDomain(22, map(int, begin), iter(end), parent,
+                                     seq_to_str=lambda: names)
+        for array in [tp._begin, tp._end, tp._parent, tp._sizes,
+                      tp._seq_to_infoset, tp._children, tp._children_indptr]:
+            assert array.dtype == np.int32
+            assert array.flags.c_contiguous
+        assert np.array_equal(tp._sizes, [2, 2, 3, 3, 4, 2, 3, 2])
+        assert np.array_equal(tp.sequence_children(1), [1, 2])
+        assert np.array_equal(tp.sequence_children(5), [3, 4])
+        assert len(tp.sequence_children(3)) == 0
+        assert np.allclose(tp.center(), self.large_treeplex.center())
+        assert callable(tp._seq_to_str)
+        assert tp.seq_to_str() is names
+        assert tp.seq_to_str() is names
+
+    def test_behavioral_form_unreached_infoset(self):
+        x = random_behavioral_strategy(self.large_treeplex)
+        x[1] = 0.0
+        seq = self.large_treeplex.sequence_form(x)
+        behavioral = self.large_treeplex.behavioral_form(seq)
+        assert np.allclose(behavioral[3:20], 0.0)
+        assert np.allclose(behavioral[20:22], x[20:22])
+
+    def test_support_many(self):
+        for tp in [self.large_treeplex, forward_test_domain(),
+                   self.kuhn.domain(0)]:
+            G = np.random.randn(6, tp.dimension())
+            G[0, :] = 0.0  # ties resolve to the first action
+            G_before = G.copy()
+            values, responses = tp.support_many(G)
+            assert np.array_equal(G, G_before)
+            for g, value, response in zip(G, values, responses):
+                test_value, test_response = support_by_infoset(tp, g.copy())
+                assert np.isclose(value, test_value)
+                assert np.array_equal(response, test_response)
+            # on the Numba backend support() sums in another order
+            value, response = tp.support(G[1])
+            assert np.isclose(value, values[1])
+            assert np.array_equal(response, responses[1])
+
+    def test_distance_generating_function(self):
+        for tp in [self.large_treeplex, forward_test_domain()]:
+            prox = tp.prox()
+            assert np.isclose(prox.distance_generating_function(tp.center()), 0)
+            for _ in range(10):
+                x = random_behavioral_strategy(tp)
+                # keep y away from the boundary for the finite difference
+                y = tp.combine(tp.center(), 0.5, random_behavioral_strategy(tp))
+                assert np.isclose(prox.bregman_divergence(x, x), 0)
+                assert prox.bregman_divergence(x, y) > 0
+                # the gradient is the derivative of the DGF along the
+                # sequence-form direction from y to x
+                step = 1e-6
+                seq_mid = (1 - step) * tp.sequence_form(y) + \
+                    step * tp.sequence_form(x)
+                mid = tp.behavioral_form(seq_mid)
+                derivative = (prox.distance_generating_function(mid) -
+                              prox.distance_generating_function(y)) / step
+                expected = prox.gradient(y).dot(
+                    tp.sequence_form(x) - tp.sequence_form(y))
+                assert abs(derivative - expected) < 1e-4
+
     def test_prox(self):
         prox_weight = 9.0
         ent = lambda x: prox_weight * (-entropy(x) + np.log(len(x)))
@@ -100,7 +308,7 @@ class TestTreeplex(unittest.TestCase):
         val, z = self.small_treeplex.prox()(-1.0, g, beta)
         g = np.array([0.0,1.0,0.0,1.0,0.0,1.0,0.0,1.0,0.0])
         test_val, test_z = treeplex_prox_by_simplex_prox(self.small_treeplex, -1.0, g, beta)
-        assert val == test_val
+        assert np.isclose(val, test_val)
         assert np.allclose(z, test_z)
 
         # test with y
@@ -109,7 +317,7 @@ class TestTreeplex(unittest.TestCase):
         val, z = self.small_treeplex.prox()(-1.0, g, beta, y)
         g = np.array([0.0,1.0,0.0,1.0,0.0,1.0,0.0,1.0,0.0])
         test_val, test_z = treeplex_prox_by_simplex_prox(self.small_treeplex, -1.0, g, beta, y)
-        assert val == test_val
+        assert np.isclose(val, test_val)
         assert np.allclose(z, test_z)
 
         for _ in range(20):
@@ -130,6 +338,32 @@ class TestTreeplex(unittest.TestCase):
 
 
 
+def sequence_form_by_infoset(tp, x):
+    seq = np.array(x, dtype=float)
+    for i in tp.reverse_infoset_traversal():
+        begin = tp._begin[i]
+        end = tp._end[i]
+        seq[begin: end] *= seq[tp._parent[i]] / sum(seq[begin: end])
+    return seq
+
+
+def support_by_infoset(tp, g):
+    response = np.zeros(tp.dimension())
+    response[tp.root_sequence()] = 1
+    value = 0
+    for i in tp.infoset_traversal():
+        begin = tp._begin[i]
+        end = tp._end[i]
+        parent = tp._parent[i]
+        idx = np.argmax(g[begin: end])
+        response[begin + idx] = 1.0
+        if parent == tp.root_sequence():
+            value += g[begin + idx]
+        else:
+            g[parent] += g[begin + idx]
+    return value, response
+
+
 def treeplex_prox_by_simplex_prox(tp, alpha, g, beta, y=None):
     z = np.zeros(tp.dimension())
     z[0] = 1.0